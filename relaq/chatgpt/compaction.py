@@ -0,0 +1,246 @@
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+from django.conf import settings
+
+from chatgpt.services import GPTModelEnum
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken 為選用套件
+    tiktoken = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter:
+    """計算文字的 token 數量
+
+    有安裝 tiktoken 時使用模型對應的編碼，否則以字元數估算
+    (CJK 字元約 1 token，其餘字元約 4 個字元 1 token)。
+    """
+    CJK_REGEX = re.compile(r'[\u3400-\u9fff\uf900-\ufaff\u3000-\u303f\uff00-\uffef]')
+    FALLBACK_ENCODING = "o200k_base"
+
+    def __init__(self, model: str = GPTModelEnum.GPT_4O_MINI.value):
+        self.encoding = self._load_encoding(model)
+
+    def _load_encoding(self, model: str):
+        if tiktoken is None:
+            return None
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except Exception:
+            pass
+
+        try:
+            return tiktoken.get_encoding(self.FALLBACK_ENCODING)
+        except Exception as e:
+            logger.warning(f"[Compaction] 無法載入 tiktoken 編碼，改用估算: {str(e)}")
+            return None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+
+        cjk_count = len(self.CJK_REGEX.findall(text))
+        other_count = len(text) - cjk_count
+        return cjk_count + math.ceil(other_count / 4)
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    kept_reviews: int = 0
+    duplicate_reviews: int = 0
+    dropped_reviews: int = 0
+    truncated_sections: List[str] = field(default_factory=list)
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.original_tokens - self.compacted_tokens, 0)
+
+    def __str__(self):
+        return (
+            f"tokens {self.original_tokens} -> {self.compacted_tokens} "
+            f"(節省 {self.saved_tokens}), "
+            f"保留評論 {self.kept_reviews}, "
+            f"重複評論 {self.duplicate_reviews}, "
+            f"捨棄評論 {self.dropped_reviews}"
+        )
+
+
+class PromptCompactor:
+    """在送出 LLM 前壓縮店家資訊，讓每間店的 prompt 大小固定在預算內"""
+    NORMALIZE_REGEX = re.compile(r'[\W_]+')
+    SHINGLE_SIZE = 2
+    # 價格與服務最多佔用剩餘預算的比例，其餘留給評論
+    PRICE_BUDGET_RATIO = 0.4
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        similarity_threshold: Optional[float] = None,
+        model: str = GPTModelEnum.GPT_4O_MINI.value,
+    ):
+        self.token_budget = settings.PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+        self.similarity_threshold = (
+            settings.REVIEW_SIMILARITY_THRESHOLD if similarity_threshold is None else similarity_threshold
+        )
+        self.token_counter = TokenCounter(model)
+
+    def _shingles(self, text: str) -> Set[str]:
+        normalized = self.NORMALIZE_REGEX.sub('', text.lower())
+        if len(normalized) <= self.SHINGLE_SIZE:
+            return {normalized} if normalized else set()
+
+        return {
+            normalized[i:i + self.SHINGLE_SIZE]
+            for i in range(len(normalized) - self.SHINGLE_SIZE + 1)
+        }
+
+    @staticmethod
+    def _similarity(a: Set[str], b: Set[str]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    def _truncate_lines(self, text: str, budget: int) -> str:
+        """以行為單位截斷文字，保留預算內的前段內容"""
+        kept_lines = []
+        used = 0
+
+        for line in text.splitlines():
+            line_tokens = self.token_counter.count(line) + 1
+            if used + line_tokens > budget:
+                break
+            kept_lines.append(line)
+            used += line_tokens
+
+        return "\n".join(kept_lines)
+
+    def dedupe_reviews(self, reviews: List[str]) -> List[str]:
+        """移除空白與近似重複的評論 (以 Jaccard 相似度判斷)"""
+        unique_reviews = []
+        unique_shingles = []
+
+        for review in reviews:
+            review = review.strip()
+            shingles = self._shingles(review)
+            if not shingles:
+                continue
+
+            if any(
+                self._similarity(shingles, other) >= self.similarity_threshold
+                for other in unique_shingles
+            ):
+                continue
+
+            unique_reviews.append(review)
+            unique_shingles.append(shingles)
+
+        return unique_reviews
+
+    def select_reviews(self, reviews: List[str], budget: int) -> List[str]:
+        """在預算內挑選資訊量最高的評論
+
+        每輪挑選「新增最多尚未涵蓋內容」的評論，直到預算用完或沒有新資訊為止，
+        回傳時維持評論原本的順序。
+        """
+        candidates = [
+            (index, review, self._shingles(review), self.token_counter.count(review) + 1)
+            for index, review in enumerate(reviews)
+        ]
+        covered: Set[str] = set()
+        selected = []
+        used = 0
+
+        while candidates:
+            best = None
+            best_gain = 0
+
+            for candidate in candidates:
+                _, _, shingles, tokens = candidate
+                if used + tokens > budget:
+                    continue
+
+                gain = len(shingles - covered)
+                if gain > best_gain:
+                    best, best_gain = candidate, gain
+
+            if best is None:
+                break
+
+            candidates.remove(best)
+            selected.append(best)
+            covered |= best[2]
+            used += best[3]
+
+        return [review for _, review, _, _ in sorted(selected, key=lambda c: c[0])]
+
+    def compact_shop_info(
+        self,
+        basic_info: str,
+        reviews: List[str],
+        price_and_service: str,
+    ) -> CompactionResult:
+        """壓縮店家資訊並組成 prompt
+
+        Args:
+            basic_info: 店家基本資訊 (一律完整保留)
+            reviews: 評論列表
+            price_and_service: 價格與服務文字
+
+        Returns:
+            CompactionResult: 壓縮後的 prompt 與 token 統計
+        """
+        original_text = self.gen_shop_info(basic_info, "\n".join(reviews), price_and_service)
+        original_tokens = self.token_counter.count(original_text)
+
+        result = CompactionResult(
+            text=original_text,
+            original_tokens=original_tokens,
+            compacted_tokens=original_tokens,
+        )
+
+        unique_reviews = self.dedupe_reviews(reviews)
+        result.duplicate_reviews = len(reviews) - len(unique_reviews)
+
+        remaining = self.token_budget - self.token_counter.count(
+            self.gen_shop_info(basic_info, "", "")
+        )
+
+        price_budget = int(max(remaining, 0) * self.PRICE_BUDGET_RATIO)
+        if self.token_counter.count(price_and_service) > price_budget:
+            price_and_service = self._truncate_lines(price_and_service, price_budget)
+            result.truncated_sections.append("price_and_service")
+
+        remaining -= self.token_counter.count(price_and_service)
+        selected_reviews = self.select_reviews(unique_reviews, max(remaining, 0))
+        result.dropped_reviews = len(unique_reviews) - len(selected_reviews)
+        result.kept_reviews = len(selected_reviews)
+        if result.dropped_reviews:
+            result.truncated_sections.append("reviews")
+
+        result.text = self.gen_shop_info(basic_info, "\n".join(selected_reviews), price_and_service)
+        result.compacted_tokens = self.token_counter.count(result.text)
+
+        return result
+
+    @staticmethod
+    def gen_shop_info(basic_info: str, shop_review: str, price_and_service: str) -> str:
+        return f"""
+                店家基本資訊:{basic_info},
+                店家評論:{shop_review},
+                店家價格與服務:{price_and_service},
+            """
@@ -1,10 +1,13 @@
 import logging
 from enum import Enum
+from typing import Iterator, List
 
 from django.conf import settings
 from openai import OpenAI
 from openai.types.chat import ChatCompletion
 
+from core.metrics import crawl_metrics
+
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +41,53 @@ class ChatGPTHelper:
         system_setting: str,
         model: str =GPTModelEnum.GPT_4O_MINI.value
     ) -> str:
-        messages = [
+        with crawl_metrics.request("OPENAI"):
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=self._gen_messages(user_input, system_setting),
+                n=1,
+            )
+
+        if response.usage:
+            crawl_metrics.llm_usage(model, response.usage.prompt_tokens, response.usage.completion_tokens)
+
+        return self.convert_gpt_response(response)
+
+    def chat_stream(
+        self,
+        user_input: str,
+        system_setting: str,
+        model: str = GPTModelEnum.GPT_4O_MINI.value
+    ) -> Iterator[str]:
+        """以串流方式呼叫 GPT，逐段回傳產生中的文字
+
+        Args:
+            user_input: 使用者輸入
+            system_setting: 系統設定 (prompt)
+            model: GPT 模型名稱
+
+        Yields:
+            str: 每次收到的文字片段
+        """
+        with crawl_metrics.request("OPENAI"):
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=self._gen_messages(user_input, system_setting),
+                n=1,
+                stream=True,
+                # 最後一個 chunk 會帶 token 用量 (choices 為空)
+                stream_options={"include_usage": True},
+            )
+
+            for chunk in stream:
+                if chunk.usage:
+                    crawl_metrics.llm_usage(model, chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                for choice in chunk.choices:
+                    if choice.delta and choice.delta.content:
+                        yield choice.delta.content
+
+    def _gen_messages(self, user_input: str, system_setting: str) -> List[dict]:
+        return [
             {
                 "role": GPTChatRoleEnum.USER.value,
                 "content": user_input
@@ -49,14 +98,6 @@ class ChatGPTHelper:
             }
         ]
 
-        response = self.client.chat.completions.create(
-            model=model,
-            messages=messages,
-            n=1,
-        )
-
-        return self.convert_gpt_response(response)
-
 
     def convert_gpt_response(self, gpt_response: ChatCompletion):
         result_list = [
@@ -75,54 +116,92 @@ class ChatGPTHelper:
         Returns:
             list[dict]: 轉換後的標籤列表，每個標籤包含 name, type, emoji, description
         """
-        tags = []
-        current_type = None
+        parser = TagResponseParser()
+        tags = parser.feed(gpt_response)
+        tags.extend(parser.close())
         
-        # 處理多個店家的分隔
-        responses = gpt_response.split('======')
-        for response in responses:
-            for line in response.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # 處理類型標題
-                if '一、' in line:
-                    current_type = 'STYLE'
-                elif '二、' in line:
-                    current_type = 'TECHNIQUE'
-                elif '三、' in line:
-                    current_type = 'PRICE'
-                elif '四、' in line:
-                    current_type = 'ENVIRONMENT'
-                elif '五、' in line:
-                    current_type = 'TRANSPORTATION'
-                elif '六、' in line:
-                    current_type = 'TARGET_AUDIENCE'
-                # 處理標籤內容
-                elif current_type and ('：' in line or ':' in line):
-                    try:
-                        # 分割 emoji、名稱和描述
-                        parts = line.split('：' if '：' in line else ':')
-                        if len(parts) == 2:
-                            name_with_emoji = parts[0].strip()
-                            description = parts[1].strip()
-                            
-                            # 找出 emoji（通常是第一個字元組）
-                            words = name_with_emoji.split()
-                            if len(words) >= 2:
-                                emoji = words[0].strip()
-                                name = ' '.join(words[1:]).strip()
-                                
-                                if emoji and name:  # 確保都有值
-                                    tags.append({
-                                        'name': name,
-                                        'type': current_type,
-                                        'emoji': emoji,
-                                        'description': description
-                                    })
-                    except Exception as e:
-                        logger.warning(f"解析標籤失敗: {line}, 錯誤: {str(e)}")
-                        continue
+        return tags
+
+
+class TagResponseParser:
+    """逐行解析 GPT 的標籤回應，可搭配 chat_stream 邊收邊解析"""
+    TYPE_HEADERS = (
+        ('一、', 'STYLE'),
+        ('二、', 'TECHNIQUE'),
+        ('三、', 'PRICE'),
+        ('四、', 'ENVIRONMENT'),
+        ('五、', 'TRANSPORTATION'),
+        ('六、', 'TARGET_AUDIENCE'),
+    )
+    SHOP_SEPARATOR = '======'
+
+    def __init__(self):
+        self.buffer = ""
+        self.current_type = None
+
+    def feed(self, chunk: str) -> list[dict]:
+        """餵入一段文字，回傳這段文字中已完整的標籤"""
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split('\n')
         
-        return tags
\ No newline at end of file
+        tags = []
+        for line in lines:
+            tags.extend(self._parse_line(line))
+        return tags
+
+    def close(self) -> list[dict]:
+        """處理最後一行 (沒有換行結尾) 的內容"""
+        line, self.buffer = self.buffer, ""
+        return self._parse_line(line)
+
+    def _parse_line(self, line: str) -> list[dict]:
+        # 處理多個店家的分隔
+        tags = []
+        for part in line.split(self.SHOP_SEPARATOR):
+            tag = self._parse_part(part.strip())
+            if tag:
+                tags.append(tag)
+        return tags
+
+    def _parse_part(self, line: str):
+        if not line:
+            return None
+            
+        # 處理類型標題
+        for header, tag_type in self.TYPE_HEADERS:
+            if header in line:
+                self.current_type = tag_type
+                return None
+                
+        # 處理標籤內容
+        if not self.current_type or ('：' not in line and ':' not in line):
+            return None
+            
+        try:
+            # 分割 emoji、名稱和描述
+            parts = line.split('：' if '：' in line else ':')
+            if len(parts) != 2:
+                return None
+                
+            name_with_emoji = parts[0].strip()
+            description = parts[1].strip()
+            
+            # 找出 emoji（通常是第一個字元組）
+            words = name_with_emoji.split()
+            if len(words) < 2:
+                return None
+                
+            emoji = words[0].strip()
+            name = ' '.join(words[1:]).strip()
+            
+            if emoji and name:  # 確保都有值
+                return {
+                    'name': name,
+                    'type': self.current_type,
+                    'emoji': emoji,
+                    'description': description
+                }
+        except Exception as e:
+            logger.warning(f"解析標籤失敗: {line}, 錯誤: {str(e)}")
+            
+        return None
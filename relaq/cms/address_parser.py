@@ -0,0 +1,148 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cms.constants import TAIWAN_LOCALITIES
+from cms.localities import DISTRICT_CODES
+
+
+@dataclass(frozen=True)
+class ParsedAddress:
+    city: str = ""
+    district: str = ""
+    city_code: Optional[str] = None
+    district_code: Optional[str] = None
+
+
+EMPTY_ADDRESS = ParsedAddress()
+
+
+def build_trie_pattern(names: Iterable[str]) -> str:
+    """將名稱建成 trie 後轉成正規表示式
+
+    共同前綴只比對一次 (例如「臺北市|臺中市」變成「臺(?:北市|中市)」)，
+    名稱在某一層結束時，「結束」排在繼續往下比對的分支之後，較長的名稱優先比對成功。
+    """
+    trie: Dict = {}
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def to_pattern(node: Dict) -> str:
+        branches = [
+            re.escape(char) + to_pattern(child)
+            for char, child in node.items()
+            if char
+        ]
+        branches.sort(key=len, reverse=True)
+        if "" in node:
+            branches.append("")
+
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return to_pattern(trie)
+
+
+class AddressParser:
+    """以地名表 trie 解析地址的縣市與行政區
+
+    所有縣市、鄉鎮市區與「縣市 + 行政區」名稱預先建成 trie 形式的正規表示式並編譯，
+    每個地址只需正規化一次、由左到右掃描一次即可依序取得地名：
+    - 一般地址的行政區緊接在縣市之後，trie 優先比對較長的「縣市 + 行政區」，一次比對即得到結果
+    - 否則取第一個縣市，行政區取縣市之後第一個屬於該縣市的名稱
+    - 沒有縣市時，行政區名稱只屬於單一縣市 (例如竹北市) 才反推縣市
+    郵遞區號、「臺灣」等前綴不在地名表中，掃描時自然略過。
+    解析結果皆為預先建立的 ParsedAddress，解析時不需要再建立物件。
+    """
+
+    def __init__(self):
+        self.city_codes: Dict[str, str] = {}
+        self.cities: Dict[str, ParsedAddress] = {}
+        for city_code, locality in TAIWAN_LOCALITIES.items():
+            self.city_codes[locality["name"]] = city_code
+            self.cities[city_code] = ParsedAddress(locality["name"], "", city_code, None)
+
+        district_cities: Dict[str, List[str]] = {}
+        self.localities: Dict[str, ParsedAddress] = {}
+        for (city_code, district), district_code in DISTRICT_CODES.items():
+            district_cities.setdefault(district, []).append(city_code)
+            city = self.cities[city_code].city
+            self.localities[city + district] = ParsedAddress(city, district, city_code, district_code)
+        # 與縣市同名的行政區一律視為縣市
+        self.district_cities = {
+            district: tuple(city_codes)
+            for district, city_codes in district_cities.items()
+            if district not in self.city_codes
+        }
+
+        self.pattern = re.compile(
+            build_trie_pattern([*self.localities, *self.city_codes, *self.district_cities])
+        )
+
+    def parse(self, address: Optional[str]) -> ParsedAddress:
+        if not address:
+            return EMPTY_ADDRESS
+
+        city, city_code = "", None
+        fallback = EMPTY_ADDRESS
+
+        # 「台」一律轉為正式寫法「臺」，與 TAIWAN_LOCALITIES 一致
+        for match in self.pattern.finditer(address.replace("台", "臺")):
+            name = match.group()
+
+            locality = self.localities.get(name)
+            if locality is not None:
+                if city_code is None:
+                    return locality
+                # 前面已出現其他縣市時，行政區仍以第一個縣市判斷
+                name = locality.district
+            elif name in self.city_codes:
+                if city_code is None:
+                    city, city_code = name, self.city_codes[name]
+                continue
+
+            city_codes = self.district_cities[name]
+            if city_code is None:
+                if fallback is EMPTY_ADDRESS and len(city_codes) == 1:
+                    # 沒有縣市時，只屬於單一縣市的行政區可以反推縣市
+                    fallback = self.localities[self.cities[city_codes[0]].city + name]
+            elif city_code in city_codes:
+                return self.localities[city + name]
+
+        if city_code:
+            return self.cities[city_code]
+        return fallback
+
+    def parse_many(self, addresses: Iterable[Optional[str]]) -> List[ParsedAddress]:
+        """批次解析，重複的地址只解析一次"""
+        cache: Dict[Optional[str], ParsedAddress] = {}
+        results = []
+
+        for address in addresses:
+            if address not in cache:
+                cache[address] = self.parse(address)
+            results.append(cache[address])
+
+        return results
+
+
+address_parser = AddressParser()
+
+
+def parse_address(address: str) -> Tuple[str, str]:
+    """解析地址，將其分為縣市和行政區 (皆為正式名稱)。
+
+    Args:
+        address: 完整地址字串，例如：
+                "106231台灣台北市大安區信義路四段265巷24號"
+                "106台灣台北市大安區敦化南路二段11巷7號1樓"
+
+    Returns:
+        Tuple[str, str]: (縣市, 行政區)，若無法解析則返回空字串
+    """
+    parsed = address_parser.parse(address)
+    return parsed.city, parsed.district
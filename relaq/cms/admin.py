@@ -1,6 +1,11 @@
-from django.contrib import admin
-from django.db.models import Count
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.admin import SimpleListFilter
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import reverse
 from django.utils.html import format_html
 from cms.models import (
     Shop,
@@ -8,8 +13,12 @@ from cms.models import (
     Article,
     ArticleImage,
     HomePageBanner,
-    ShopPhoto
+    ShopPhoto,
+    ShopFacetCount,
+    ShopFacetType,
 )
+from core.models import CrawlStage, CrawlTask
+from core.queue import CrawlQueue
 
 
 class HomePageBannerAdmin(admin.ModelAdmin):
@@ -50,10 +59,42 @@ class ShopAdmin(admin.ModelAdmin):
     list_filter = ("rating", "created_at", "updated_at")
     filter_horizontal = ("tags",)
     inlines = [ShopPhotoInline]
+    actions = ["regenerate_summary"]
     
     def get_queryset(self, request):
         return Shop.with_weighted_rating(super().get_queryset(request))
     
+    @admin.action(description="重新產生 AI 摘要")
+    def regenerate_summary(self, request, queryset):
+        """確認後排入爬蟲佇列，由 crawl_worker 依照既有資料重新產生摘要 (會呼叫 OpenAI)
+
+        排入後導向只列出這些任務的爬蟲任務列表，可在該頁查看執行狀態與錯誤
+        """
+        if request.POST.get("post"):
+            queued = sum(CrawlQueue.enqueue_summary_regeneration(shop) for shop in queryset)
+            self.message_user(
+                request,
+                f"已將 {queued} 間店家排入重新產生摘要的佇列，其餘 {len(queryset) - queued} 間已在佇列中",
+                messages.SUCCESS,
+            )
+            task_ids = CrawlTask.objects.filter(
+                dedupe_key__in=[f"{CrawlStage.REGENERATE_SUMMARY}:{shop.id}" for shop in queryset]
+            ).values_list("id", flat=True)
+            return HttpResponseRedirect(
+                f"{reverse('admin:core_crawltask_changelist')}"
+                f"?stage={CrawlStage.REGENERATE_SUMMARY}&id__in={','.join(map(str, task_ids))}"
+            )
+        
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "確認重新產生 AI 摘要",
+            "opts": self.model._meta,
+            "shops": queryset,
+            "action_name": "regenerate_summary",
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, "admin/cms/shop/regenerate_summary_confirmation.html", context)
+    
     def display_tags(self, obj):
         return ", ".join([tag.name for tag in obj.tags.all()])
     display_tags.short_description = "標籤"
@@ -76,8 +117,7 @@ class UsageCountFilter(SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
-        queryset = queryset.annotate(usage_count=Count('shops'))
-        
+        # usage_count 由 ShopTagAdmin.get_queryset 從聚合表帶入
         if self.value() == '0':
             return queryset.filter(usage_count=0)
         elif self.value() == '1-5':
@@ -96,7 +136,11 @@ class ShopTagAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        queryset = queryset.annotate(usage_count=Count('shops'))
+        usage_count = ShopFacetCount.objects.filter(
+            facet=ShopFacetType.TAG,
+            tag=OuterRef('pk'),
+        ).values('count')[:1]
+        queryset = queryset.annotate(usage_count=Coalesce(Subquery(usage_count), Value(0)))
         return queryset
     
     def get_usage_count(self, obj):
@@ -0,0 +1,199 @@
+"""CMS 唯讀 API 的 async 版本 (settings.CMS_ASYNC_VIEWS 啟用)
+
+與 cms/views.py 的 DRF views 使用相同的請求 serializer 與回應格式，差別在於：
+- 以 async ORM 查詢，在 ASGI (relaq.asgi + UvicornWorker) 下等待資料庫或慢速客戶端時不佔用執行緒
+- 首頁、文章與店家詳情以 CmsCache (async cache API) 快取，資料異動時由 signals 失效
+- 分頁在資料庫中進行 (COUNT + LIMIT / OFFSET)，不序列化全部資料
+
+回應不經過 DRF，Swagger 文件仍以 cms/views.py 為準。
+"""
+import json
+from typing import List, Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Page, Paginator
+from django.db.models import QuerySet
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.serializers import Serializer
+from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
+
+from cms.bitmap_index import RankedShopRows
+from cms.cache import CmsCache
+from cms.cards import CardRow, ShopCardService
+from cms.models import Article, HomePageBanner, Shop
+from cms.serializers.objs import ArticleObjSerializer, ShopObjSerializer
+from cms.serializers.requests import (
+    ArticleListReqSerializer,
+    ArticleReqSerializer,
+    ShopListReqSerializer,
+    ShopReqSerializer,
+)
+from cms.serializers.response import ArticleListRespSerializer, ArticleRespSerializer
+from cms.views import ShopFilterMixin
+from core.constants import ResponseCode
+from core.utils import APIUtils
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """async views 共用的請求解析與驗證，錯誤格式與 DRF 預設的 exception handler 相同"""
+    serializer_class = None
+
+    @staticmethod
+    def get_data(request: HttpRequest) -> dict:
+        if request.content_type == "application/json":
+            return json.loads(request.body or b"{}")
+        return request.POST
+
+    def validate(self, request: HttpRequest) -> Tuple[Optional[dict], Optional[JsonResponse]]:
+        try:
+            data = self.get_data(request)
+        except ValueError as e:
+            return None, JsonResponse({"detail": f"JSON parse error - {e}"}, status=HTTP_400_BAD_REQUEST)
+
+        serializer: Serializer = self.serializer_class(data=data)
+        if not serializer.is_valid():
+            return None, JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST, json_dumps_params={"ensure_ascii": False})
+        return serializer.validated_data, None
+
+    @staticmethod
+    async def paginate(queryset: Union[QuerySet, RankedShopRows, List[CardRow]], page: int, page_size: int) -> Tuple[Paginator, Page, list]:
+        """在資料庫中分頁，超出頁數時與 Paginator 相同拋出 EmptyPage"""
+        paginator = Paginator(queryset, per_page=page_size)
+        if not isinstance(queryset, QuerySet):
+            # 位元索引或附近店家的結果在記憶體中分頁，不需查詢資料庫
+            page_obj = paginator.page(page)
+            return paginator, page_obj, list(page_obj.object_list)
+
+        # count 是 cached_property，先以 async 查詢填入，page() 就不會再同步查詢
+        paginator.count = await queryset.acount()
+        page_obj = paginator.page(page)
+        return paginator, page_obj, [obj async for obj in page_obj.object_list]
+
+
+class AsyncHomePageBannerAPIView(AsyncAPIView):
+    async def get(self, request: HttpRequest) -> JsonResponse:
+        response_data = await CmsCache.aget(CmsCache.ARTICLE, "homepage")
+        if response_data is None:
+            banner = await HomePageBanner.objects.afirst()
+            if not banner:
+                return APIUtils.gen_json_response(
+                    ResponseCode.NO_DATA,
+                    msg="找不到 Banner 圖片"
+                )
+
+            articles = [article async for article in Article.objects.order_by("-created_at")[:3]]
+            response_data = {
+                "banner": banner.image_path,
+                "articles": ArticleObjSerializer(articles, many=True).data
+            }
+            await CmsCache.aset(CmsCache.ARTICLE, "homepage", response_data)
+
+        return APIUtils.gen_json_response(ResponseCode.SUCCESS, data=response_data)
+
+
+class AsyncArticleListAPIView(AsyncAPIView):
+    serializer_class = ArticleListReqSerializer
+
+    async def post(self, request: HttpRequest) -> JsonResponse:
+        validated_data, error_response = self.validate(request)
+        if error_response:
+            return error_response
+
+        page, page_size = validated_data.get("page"), validated_data.get("page_size")
+        cache_key = f"list:{page}:{page_size}"
+        response_data = await CmsCache.aget(CmsCache.ARTICLE, cache_key)
+        if response_data is None:
+            paginator, _, articles = await self.paginate(
+                Article.objects.order_by("-created_at"), page, page_size
+            )
+            response_data = {
+                "total_pages": paginator.num_pages,
+                "total_count": paginator.count,
+                "items": ArticleListRespSerializer(articles, many=True).data
+            }
+            await CmsCache.aset(CmsCache.ARTICLE, cache_key, response_data)
+
+        return APIUtils.gen_json_response(ResponseCode.SUCCESS, data=response_data)
+
+
+class AsyncArticleAPIView(AsyncAPIView):
+    serializer_class = ArticleReqSerializer
+
+    async def post(self, request: HttpRequest) -> JsonResponse:
+        validated_data, error_response = self.validate(request)
+        if error_response:
+            return error_response
+
+        article_id = validated_data.get("id")
+        article_data = await CmsCache.aget(CmsCache.ARTICLE, f"detail:{article_id}")
+        if article_data is None:
+            try:
+                article = await Article.objects.select_related("created_by").aget(id=article_id)
+            except Article.DoesNotExist:
+                return APIUtils.gen_json_response(
+                    ResponseCode.NO_DATA,
+                    msg="找不到文章",
+                    status=HTTP_404_NOT_FOUND
+                )
+
+            article_data = ArticleRespSerializer(article).data
+            await CmsCache.aset(CmsCache.ARTICLE, f"detail:{article_id}", article_data)
+
+        return APIUtils.gen_json_response(ResponseCode.SUCCESS, data=article_data)
+
+
+class AsyncShopListAPIView(ShopFilterMixin, AsyncAPIView):
+    """篩選條件組合太多不快取，標籤條件由記憶體中的位元索引處理，卡片內容讀取 ShopCard"""
+    serializer_class = ShopListReqSerializer
+
+    async def post(self, request: HttpRequest) -> JsonResponse:
+        validated_data, error_response = self.validate(request)
+        if error_response:
+            return error_response
+
+        # 位元索引首次載入與附近店家的候選距離計算是同步的，交給執行緒處理
+        rows = await sync_to_async(self._get_card_rows)(validated_data)
+        paginator, _, rows = await self.paginate(
+            rows,
+            validated_data.get("page"),
+            validated_data.get("page_size"),
+        )
+
+        return APIUtils.gen_json_response(
+            ResponseCode.SUCCESS,
+            data={
+                "total_pages": paginator.num_pages,
+                "total_count": paginator.count,
+                "items": await ShopCardService.aget_cards(rows)
+            }
+        )
+
+
+class AsyncShopAPIView(AsyncAPIView):
+    serializer_class = ShopReqSerializer
+
+    async def post(self, request: HttpRequest) -> JsonResponse:
+        validated_data, error_response = self.validate(request)
+        if error_response:
+            return error_response
+
+        shop_id = validated_data.get("id")
+        shop_data = await CmsCache.aget(CmsCache.SHOP, f"detail:{shop_id}")
+        if shop_data is None:
+            try:
+                shop = await Shop.objects.prefetch_related("photos", "tags").aget(id=shop_id)
+            except Shop.DoesNotExist:
+                return APIUtils.gen_json_response(
+                    ResponseCode.NO_DATA,
+                    msg="找不到店家",
+                    status=HTTP_404_NOT_FOUND
+                )
+
+            shop_data = ShopObjSerializer(shop).data
+            await CmsCache.aset(CmsCache.SHOP, f"detail:{shop_id}", shop_data)
+
+        return APIUtils.gen_json_response(ResponseCode.SUCCESS, data=shop_data)
@@ -0,0 +1,262 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from cms.localities import resolve_city_codes, resolve_district_codes
+from cms.models import Shop, TagMatchMode
+from core.metrics import api_metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+# 每個 byte 值中為 1 的位元位置，bitset 轉回店家 ID 時查表，不逐一移位
+BYTE_BIT_POSITIONS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(position for position in range(8) if value >> position & 1)
+    for value in range(256)
+)
+
+
+class RankedShopRows:
+    """bitset 篩選結果，依 weighted_rating 排序的 (店家 ID, 距離) 列
+
+    提供 count() 與切片給 Paginator 使用：總數直接 popcount，
+    只展開需要的那一頁，不需要把全部店家 ID 以 id__in 送回資料庫。
+    """
+
+    def __init__(self, ranked_ids: List[int], bits: int):
+        self.ranked_ids = ranked_ids
+        self.bits = bits
+
+    def count(self) -> int:
+        return self.bits.bit_count()
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index: slice) -> List[Tuple[int, None]]:
+        start, stop, _ = index.indices(self.count())
+        contains = ShopBitmapIndex.contains(self.bits)
+        rows = []
+        skipped = 0
+        for shop_id in self.ranked_ids:
+            if len(rows) >= stop - start:
+                break
+            if not contains(shop_id):
+                continue
+            if skipped < start:
+                skipped += 1
+                continue
+            rows.append((shop_id, None))
+        return rows
+
+
+class ShopBitmapIndex:
+    """常駐記憶體的店家位元索引
+
+    每個標籤、縣市代碼、行政區代碼各有一個以店家 ID 為位元位置的 bitset (Python int)，
+    載入時先寫入 bytearray 再一次轉成 int。價格依不同的價格值預先算好累積的 bitset
+    (price_min >= 價格、price_max <= 價格)，查詢時二分搜尋即可取得。
+    篩選條件各自轉成 bitset 後以 & / | 組合，多標籤查詢不需要 JOIN 店家與標籤的關聯表，
+    列表依載入時的 weighted_rating 順序在記憶體中分頁 (RankedShopRows)。
+
+    與 ShopTagRegistry 相同，店家或標籤異動時 (signals / 批次寫入) 失效，
+    其他 process 的異動則在 SHOP_BITMAP_INDEX_TTL_SECONDS 後重新載入。
+    """
+    _instance: Optional["ShopBitmapIndex"] = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.city_names: Dict[str, str] = {}
+        self.district_names: Dict[str, str] = {}
+
+        # 與列表 API 相同的排序，標籤條件的列表直接依此順序分頁
+        self.ranked_ids: List[int] = []
+        city_ids: Dict[str, List[int]] = {}
+        district_ids: Dict[str, List[int]] = {}
+        price_min_ids: Dict[int, List[int]] = {}
+        price_max_ids: Dict[int, List[int]] = {}
+        shops = Shop.with_weighted_rating(Shop.objects.all()).values_list(
+            "id", "city", "district", "city_code", "district_code", "price_min", "price_max"
+        )
+        for shop_id, city, district, city_code, district_code, price_min, price_max in shops:
+            self.ranked_ids.append(shop_id)
+            if city_code:
+                city_ids.setdefault(city_code, []).append(shop_id)
+                self.city_names[city_code] = city
+            if district_code:
+                district_ids.setdefault(district_code, []).append(shop_id)
+                self.district_names[district_code] = district
+            if price_min is not None:
+                price_min_ids.setdefault(price_min, []).append(shop_id)
+            if price_max is not None:
+                price_max_ids.setdefault(price_max, []).append(shop_id)
+
+        tag_ids: Dict[int, List[int]] = {}
+        for shop_id, tag_id in Shop.tags.through.objects.values_list("shop_id", "shoptag_id"):
+            tag_ids.setdefault(tag_id, []).append(shop_id)
+
+        self.all_bits = self.to_bits(self.ranked_ids)
+        self.tag_bits: Dict[int, int] = {tag_id: self.to_bits(ids) for tag_id, ids in tag_ids.items()}
+        self.city_bits: Dict[str, int] = {code: self.to_bits(ids) for code, ids in city_ids.items()}
+        self.district_bits: Dict[str, int] = {code: self.to_bits(ids) for code, ids in district_ids.items()}
+
+        # price_min_bits[i]: price_min >= price_min_levels[i] 的店家
+        self.price_min_levels = sorted(price_min_ids)
+        self.price_min_bits: List[int] = []
+        bits = 0
+        for price in reversed(self.price_min_levels):
+            bits |= self.to_bits(price_min_ids[price])
+            self.price_min_bits.append(bits)
+        self.price_min_bits.reverse()
+
+        # price_max_bits[i]: price_max <= price_max_levels[i] 的店家
+        self.price_max_levels = sorted(price_max_ids)
+        self.price_max_bits: List[int] = []
+        bits = 0
+        for price in self.price_max_levels:
+            bits |= self.to_bits(price_max_ids[price])
+            self.price_max_bits.append(bits)
+
+        logger.info(
+            f"[Bitmap] 載入 {self.all_bits.bit_count()} 間店家、{len(self.tag_bits)} 個標籤的位元索引"
+        )
+
+    @classmethod
+    def get(cls) -> "ShopBitmapIndex":
+        instance = cls._instance
+        if instance is None or time.monotonic() - instance.loaded_at > settings.SHOP_BITMAP_INDEX_TTL_SECONDS:
+            with cls._lock:
+                instance = cls._instance
+                if instance is None or time.monotonic() - instance.loaded_at > settings.SHOP_BITMAP_INDEX_TTL_SECONDS:
+                    instance = cls._instance = cls()
+                    api_metrics.cache_lookup("shop_bitmap_index", hit=False)
+                    return instance
+        api_metrics.cache_lookup("shop_bitmap_index", hit=True)
+        return instance
+
+    @classmethod
+    def invalidate(cls) -> None:
+        cls._instance = None
+
+    @staticmethod
+    def to_bits(shop_ids: Iterable[int]) -> int:
+        """將店家 ID 轉成 bitset，先寫入 bytearray 再一次轉成 int"""
+        shop_ids = list(shop_ids)
+        if not shop_ids:
+            return 0
+
+        buffer = bytearray((max(shop_ids) >> 3) + 1)
+        for shop_id in shop_ids:
+            buffer[shop_id >> 3] |= 1 << (shop_id & 7)
+        return int.from_bytes(buffer, "little")
+
+    @staticmethod
+    def to_ids(bits: int) -> List[int]:
+        """將 bitset 轉回店家 ID 列表 (由小到大)"""
+        shop_ids = []
+        for index, value in enumerate(bits.to_bytes((bits.bit_length() + 7) >> 3, "little")):
+            if value:
+                base = index << 3
+                shop_ids.extend(base + position for position in BYTE_BIT_POSITIONS[value])
+        return shop_ids
+
+    @staticmethod
+    def contains(bits: int) -> Callable[[int], bool]:
+        """回傳判斷店家 ID 是否在 bitset 中的函式，大量判斷時不需要每次對整個 int 移位"""
+        data = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+        size = len(data)
+
+        def contains_shop(shop_id: int) -> bool:
+            index = shop_id >> 3
+            return index < size and bool(data[index] >> (shop_id & 7) & 1)
+
+        return contains_shop
+
+    def ranked(self, bits: int) -> RankedShopRows:
+        return RankedShopRows(self.ranked_ids, bits)
+
+    def tags(self, tag_ids: Iterable[int], mode: str = TagMatchMode.ALL) -> int:
+        tag_bits = [self.tag_bits.get(tag_id, 0) for tag_id in set(tag_ids)]
+        if not tag_bits:
+            return self.all_bits
+
+        bits = tag_bits[0]
+        for other in tag_bits[1:]:
+            bits = bits | other if mode == TagMatchMode.ANY else bits & other
+        return bits
+
+    @staticmethod
+    def _union(bits_by_code: Dict[str, int], codes: Iterable[str]) -> int:
+        bits = 0
+        for code in codes:
+            bits |= bits_by_code.get(code, 0)
+        return bits
+
+    def city(self, city_codes: Iterable[str]) -> int:
+        return self._union(self.city_bits, city_codes)
+
+    def district(self, district_codes: Iterable[str]) -> int:
+        return self._union(self.district_bits, district_codes)
+
+    def price_at_least(self, price: int) -> int:
+        """price_min >= price 的店家"""
+        index = bisect.bisect_left(self.price_min_levels, price)
+        return self.price_min_bits[index] if index < len(self.price_min_bits) else 0
+
+    def price_at_most(self, price: int) -> int:
+        """price_max <= price 的店家"""
+        index = bisect.bisect_right(self.price_max_levels, price) - 1
+        return self.price_max_bits[index] if index >= 0 else 0
+
+    def filter(
+        self,
+        tag_ids: Optional[Iterable[int]] = None,
+        tag_mode: str = TagMatchMode.ALL,
+        city: Optional[str] = None,
+        township: Optional[str] = None,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+    ) -> int:
+        """依條件取得符合的店家 bitset，條件之間為 AND"""
+        bits = self.all_bits
+
+        if tag_ids:
+            bits &= self.tags(tag_ids, tag_mode)
+        city_codes = resolve_city_codes(city) if city else None
+        if city_codes is not None:
+            bits &= self.city(city_codes)
+        if township:
+            bits &= self.district(resolve_district_codes(township, city_codes))
+        if isinstance(price_min, (int, float)):
+            bits &= self.price_at_least(price_min)
+        if isinstance(price_max, (int, float)):
+            bits &= self.price_at_most(price_max)
+
+        return bits
+
+    def count_by_tag(self, bits: int) -> Dict[int, int]:
+        """計算 bitset 中各標籤的店家數量 (popcount)"""
+        return {
+            tag_id: (tag_bits & bits).bit_count()
+            for tag_id, tag_bits in self.tag_bits.items()
+        }
+
+    def count_by_city(self, bits: int) -> Dict[str, int]:
+        return {
+            self.city_names[city_code]: (city_bits & bits).bit_count()
+            for city_code, city_bits in self.city_bits.items()
+        }
+
+    def count_by_district(self, bits: int) -> Dict[str, int]:
+        # 不同縣市可能有同名行政區 (例如東區)，以名稱合併計算
+        counts: Dict[str, int] = {}
+        for district_code, district_bits in self.district_bits.items():
+            district = self.district_names[district_code]
+            counts[district] = counts.get(district, 0) + (district_bits & bits).bit_count()
+        return counts
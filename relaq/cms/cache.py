@@ -0,0 +1,40 @@
+import time
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class CmsCache:
+    """CMS 唯讀 API 的回應快取 (async views 使用)
+
+    以命名空間區分 (article: 首頁與文章，shop: 店家詳情)，每個命名空間有一個版本號，
+    資料異動時 (cms/signals.py) 更新版本號，舊的快取自然失效，不需要逐一刪除 key。
+    預設的 LocMemCache 每個 process 各自一份，其他 worker 的舊資料最多保留 CMS_CACHE_SECONDS 秒。
+    """
+    PREFIX = "cms"
+    ARTICLE = "article"
+    SHOP = "shop"
+
+    @classmethod
+    def _version_key(cls, namespace: str) -> str:
+        return f"{cls.PREFIX}:{namespace}:version"
+
+    @classmethod
+    async def aget(cls, namespace: str, key: str) -> Optional[Any]:
+        if settings.CMS_CACHE_SECONDS <= 0:
+            return None
+        version = await cache.aget(cls._version_key(namespace), 0)
+        return await cache.aget(f"{cls.PREFIX}:{namespace}:{version}:{key}")
+
+    @classmethod
+    async def aset(cls, namespace: str, key: str, value: Any) -> None:
+        if settings.CMS_CACHE_SECONDS <= 0:
+            return
+        version = await cache.aget(cls._version_key(namespace), 0)
+        await cache.aset(f"{cls.PREFIX}:{namespace}:{version}:{key}", value, settings.CMS_CACHE_SECONDS)
+
+    @classmethod
+    def invalidate(cls, namespace: str) -> None:
+        # 以時間當版本號，cache 被清空後也不會回到舊版本
+        cache.set(cls._version_key(namespace), time.time_ns(), None)
@@ -0,0 +1,118 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Prefetch
+
+from cms.models import Shop, ShopCard, ShopPhoto
+from cms.serializers.objs import ShopListObjSerializer
+
+
+logger = logging.getLogger(__name__)
+
+# (店家 ID, 距離)，由 ShopFilterMixin._get_card_rows 查詢
+CardRow = Tuple[int, Optional[float]]
+
+
+class ShopCardService:
+    """維護與讀取 ShopCard
+
+    店家 / 照片異動 (signals / 批次寫入) 時重建受影響店家的卡片，
+    照片網址含 settings.DOMAIN，變更 DOMAIN 後需執行 rebuild_shop_cards。
+    """
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def _get_shops(shop_ids: List[int]):
+        return (
+            Shop.objects
+            .filter(id__in=shop_ids)
+            .only("id", "name", "address", "price_min")
+            .prefetch_related(
+                Prefetch("photos", queryset=ShopPhoto.objects.only("shop_id", "image_path").order_by("id"))
+            )
+        )
+
+    @staticmethod
+    def build_payload(shop: Shop) -> dict:
+        payload = dict(ShopListObjSerializer(shop).data)
+        # 距離依每次查詢的位置計算，讀取時才補上
+        payload.pop("distance_m", None)
+        return payload
+
+    @classmethod
+    def refresh(cls, shop_ids: Iterable[int]) -> None:
+        """重建指定店家的卡片，已刪除的店家其卡片由 cascade 刪除"""
+        shop_ids = sorted({shop_id for shop_id in shop_ids if shop_id})
+        for start in range(0, len(shop_ids), cls.BATCH_SIZE):
+            shops = cls._get_shops(shop_ids[start:start + cls.BATCH_SIZE])
+            ShopCard.objects.bulk_create(
+                [ShopCard(shop_id=shop.id, payload=cls.build_payload(shop)) for shop in shops],
+                update_conflicts=True,
+                unique_fields=["shop"],
+                update_fields=["payload", "updated_at"],
+            )
+
+    @classmethod
+    def refresh_on_commit(cls, shop_ids: Iterable[int]) -> None:
+        """交易提交後一次重建，同一個交易中多次異動 (例如逐筆刪除照片) 只會重建一次
+
+        待重建的 ID 記在連線上，交易回滾時留下的 ID 會在下一次提交時一起重建，不影響結果。
+        """
+        connection = transaction.get_connection()
+        if not hasattr(connection, "_shop_card_pending"):
+            connection._shop_card_pending = set()
+        connection._shop_card_pending.update(shop_ids)
+
+        def run():
+            pending, connection._shop_card_pending = connection._shop_card_pending, set()
+            if pending:
+                cls.refresh(pending)
+
+        transaction.on_commit(run)
+
+    @classmethod
+    def rebuild(cls) -> int:
+        shop_ids = list(Shop.objects.order_by("id").values_list("id", flat=True))
+        cls.refresh(shop_ids)
+        return len(shop_ids)
+
+    @classmethod
+    def _merge(cls, rows: List[CardRow], payloads: Dict[int, dict]) -> List[dict]:
+        missing = [shop_id for shop_id, _ in rows if shop_id not in payloads]
+        if missing:
+            # 不應發生 (寫入時都會維護)，直接由店家資料產生，不在讀取時寫入
+            logger.warning(f"[Card] {len(missing)} 間店家沒有列表卡片，請執行 rebuild_shop_cards")
+            payloads.update({shop.id: cls.build_payload(shop) for shop in cls._get_shops(missing)})
+
+        return [
+            {**payloads[shop_id], "distance_m": distance}
+            for shop_id, distance in rows
+            if shop_id in payloads
+        ]
+
+    @classmethod
+    def get_cards(cls, rows: Iterable[CardRow]) -> List[dict]:
+        """依 rows 的順序回傳卡片資料 (含 distance_m)"""
+        rows = list(rows)
+        payloads = dict(
+            ShopCard.objects
+            .filter(shop_id__in=[shop_id for shop_id, _ in rows])
+            .values_list("shop_id", "payload")
+        )
+        return cls._merge(rows, payloads)
+
+    @classmethod
+    async def aget_cards(cls, rows: Iterable[CardRow]) -> List[dict]:
+        rows = list(rows)
+        payloads = {
+            shop_id: payload
+            async for shop_id, payload in ShopCard.objects
+            .filter(shop_id__in=[shop_id for shop_id, _ in rows])
+            .values_list("shop_id", "payload")
+        }
+        if any(shop_id not in payloads for shop_id, _ in rows):
+            # 補產生卡片需要同步查詢店家
+            return await sync_to_async(cls._merge)(rows, payloads)
+        return cls._merge(rows, payloads)
@@ -0,0 +1,170 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Count, QuerySet
+
+from cms.bitmap_index import ShopBitmapIndex
+from cms.models import Shop, ShopTag, ShopFacetCount, ShopFacetType
+
+
+logger = logging.getLogger(__name__)
+
+
+class ShopFacetService:
+    """維護與查詢 ShopFacetCount
+
+    寫入 (m2m_changed / 店家異動 / 批次寫入) 時只重算受影響的值，
+    沒有篩選條件的查詢直接讀取聚合表。
+    """
+
+    @staticmethod
+    def _upsert(facet: str, counts: Dict[str, int], tag_ids: Optional[Dict[str, int]] = None) -> None:
+        ShopFacetCount.objects.bulk_create(
+            [
+                ShopFacetCount(
+                    facet=facet,
+                    value=value,
+                    tag_id=(tag_ids or {}).get(value),
+                    count=count,
+                )
+                for value, count in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["facet", "value"],
+            update_fields=["count"],
+        )
+
+    @classmethod
+    def refresh_tags(cls, tag_ids: Optional[Iterable[int]] = None) -> None:
+        """重算標籤的店家數量，未指定時重算全部標籤"""
+        tags = ShopTag.objects.all()
+        if tag_ids is not None:
+            tags = tags.filter(id__in=list(tag_ids))
+
+        all_tag_ids = {str(tag_id): tag_id for tag_id in tags.values_list("id", flat=True)}
+        if not all_tag_ids:
+            return
+
+        counts = {value: 0 for value in all_tag_ids}
+        rows = (
+            Shop.tags.through.objects
+            .filter(shoptag_id__in=all_tag_ids.values())
+            .values("shoptag_id")
+            .annotate(count=Count("shop_id"))
+        )
+        for row in rows:
+            counts[str(row["shoptag_id"])] = row["count"]
+
+        cls._upsert(ShopFacetType.TAG, counts, all_tag_ids)
+
+    @classmethod
+    def _refresh_locality(cls, facet: str, field: str, values: Optional[Iterable[str]]) -> None:
+        shops = Shop.objects.exclude(**{f"{field}__isnull": True}).exclude(**{field: ""})
+        if values is not None:
+            values = {value for value in values if value}
+            if not values:
+                return
+            shops = shops.filter(**{f"{field}__in": values})
+
+        counts = {value: 0 for value in values or []}
+        for row in shops.values(field).order_by().annotate(count=Count("id")):
+            counts[row[field]] = row["count"]
+
+        if values is None:
+            # 全部重算時，已經沒有店家的值歸零
+            ShopFacetCount.objects.filter(facet=facet).exclude(value__in=counts).update(count=0)
+
+        cls._upsert(facet, counts)
+
+    @classmethod
+    def refresh_localities(
+        cls,
+        cities: Optional[Iterable[str]] = None,
+        districts: Optional[Iterable[str]] = None,
+    ) -> None:
+        """重算縣市 / 行政區的店家數量，未指定時重算全部"""
+        cls._refresh_locality(ShopFacetType.CITY, "city", cities)
+        cls._refresh_locality(ShopFacetType.DISTRICT, "district", districts)
+
+    @classmethod
+    def rebuild(cls) -> None:
+        with transaction.atomic():
+            cls.refresh_tags()
+            cls.refresh_localities()
+        logger.info("[Facet] 重建店家分面數量完成")
+
+    @staticmethod
+    def _format(tag_counts: Dict[int, int], city_counts: Dict[str, int], district_counts: Dict[str, int]) -> Dict[str, List[Dict]]:
+        tags = ShopTag.objects.filter(id__in=[tag_id for tag_id, count in tag_counts.items() if count])
+
+        return {
+            "tags": sorted(
+                [
+                    {
+                        "id": tag.id,
+                        "name": tag.name,
+                        "emoji": tag.emoji,
+                        "type": tag.type,
+                        "count": tag_counts[tag.id],
+                    }
+                    for tag in tags
+                ],
+                key=lambda item: (-item["count"], item["id"]),
+            ),
+            "cities": [
+                {"name": name, "count": count}
+                for name, count in sorted(city_counts.items(), key=lambda item: (-item[1], item[0]))
+                if name and count
+            ],
+            "districts": [
+                {"name": name, "count": count}
+                for name, count in sorted(district_counts.items(), key=lambda item: (-item[1], item[0]))
+                if name and count
+            ],
+        }
+
+    @classmethod
+    def get_counts(cls, shops: Optional[QuerySet[Shop]] = None) -> Dict[str, List[Dict]]:
+        """取得分面數量
+
+        Args:
+            shops: 篩選後的店家，None 表示沒有篩選條件，直接讀取聚合表
+        """
+        if shops is None:
+            tag_counts, city_counts, district_counts = {}, {}, {}
+            for facet, value, tag_id, count in ShopFacetCount.objects.values_list("facet", "value", "tag_id", "count"):
+                if facet == ShopFacetType.TAG:
+                    tag_counts[tag_id] = count
+                elif facet == ShopFacetType.CITY:
+                    city_counts[value] = count
+                else:
+                    district_counts[value] = count
+            return cls._format(tag_counts, city_counts, district_counts)
+
+        shop_ids = shops.order_by().values("id")
+        tag_counts = dict(
+            Shop.tags.through.objects
+            .filter(shop_id__in=shop_ids)
+            .values("shoptag_id")
+            .annotate(count=Count("shop_id"))
+            .values_list("shoptag_id", "count")
+        )
+        city_counts = dict(
+            Shop.objects.filter(id__in=shop_ids).exclude(city__isnull=True)
+            .values("city").order_by().annotate(count=Count("id")).values_list("city", "count")
+        )
+        district_counts = dict(
+            Shop.objects.filter(id__in=shop_ids).exclude(district__isnull=True)
+            .values("district").order_by().annotate(count=Count("id")).values_list("district", "count")
+        )
+        return cls._format(tag_counts, city_counts, district_counts)
+
+    @classmethod
+    def get_bitmap_counts(cls, bitmap_index: ShopBitmapIndex, shop_bits: int) -> Dict[str, List[Dict]]:
+        """以位元索引計算篩選後店家的分面數量，不需查詢資料庫的關聯表"""
+        return cls._format(
+            bitmap_index.count_by_tag(shop_bits),
+            bitmap_index.count_by_city(shop_bits),
+            bitmap_index.count_by_district(shop_bits),
+        )
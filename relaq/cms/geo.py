@@ -0,0 +1,136 @@
+import math
+from functools import reduce
+from operator import or_
+from typing import Callable, List, Optional, Set, Tuple
+
+from django.db.models import Q, QuerySet
+
+from cms.cards import CardRow
+from cms.models import Shop
+
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# 店家儲存的 geohash 長度，9 碼約 4.8m x 4.8m
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_M = 6371000
+# 每度緯度的公尺數
+METERS_PER_LAT_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    is_lng = True
+
+    while len(chars) < precision:
+        value, value_range = (lng, lng_range) if is_lng else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+
+        is_lng = not is_lng
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """geohash 格子的 (緯度, 經度) 跨度 (度)"""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lng_bits
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """兩點之間的球面距離 (公尺)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def get_geohash(lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+    if lat is None or lng is None:
+        return None
+    return geohash_encode(lat, lng)
+
+
+class GeohashGrid:
+    """以 geohash 前綴做為空間索引
+
+    geohash 相同前綴的點落在同一個格子內，選擇格子邊長不小於搜尋半徑的精度後，
+    中心格子加上周圍 8 格必定涵蓋整個搜尋圓，每一格都是 geohash 欄位上的
+    範圍查詢 (>= prefix AND < prefix + "~")，SQLite 與 PostgreSQL 的 B-tree 索引都能使用。
+    """
+
+    @staticmethod
+    def precision_for_radius(lat: float, radius_m: float) -> int:
+        lng_meters = METERS_PER_LAT_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+
+        for precision in range(GEOHASH_PRECISION, 0, -1):
+            lat_span, lng_span = geohash_cell_size(precision)
+            if min(lat_span * METERS_PER_LAT_DEGREE, lng_span * lng_meters) >= radius_m:
+                return precision
+        return 1
+
+    @classmethod
+    def covering_cells(cls, lat: float, lng: float, radius_m: float) -> Set[str]:
+        """涵蓋以 (lat, lng) 為圓心、radius_m 為半徑的圓的 geohash 前綴"""
+        precision = cls.precision_for_radius(lat, radius_m)
+        lat_span, lng_span = geohash_cell_size(precision)
+
+        cells = set()
+        for lat_offset in (-1, 0, 1):
+            for lng_offset in (-1, 0, 1):
+                cell_lat = min(max(lat + lat_offset * lat_span, -90.0), 90.0)
+                cell_lng = (lng + lng_offset * lng_span + 180) % 360 - 180
+                cells.add(geohash_encode(cell_lat, cell_lng, precision))
+        return cells
+
+    @classmethod
+    def nearest(
+        cls,
+        shops: QuerySet[Shop],
+        lat: float,
+        lng: float,
+        radius_m: float,
+        include: Optional[Callable[[int], bool]] = None,
+    ) -> List[CardRow]:
+        """篩選半徑內的店家，回傳由近到遠排序的 (店家 ID, 距離)
+
+        距離只在記憶體中排序與分頁，不再以 CASE 送回資料庫，
+        每家店約需 3 個 SQL 參數，範圍大時會超過 SQLite 的參數上限。
+
+        Args:
+            include: 額外在記憶體中篩選候選店家 ID (例如位元索引的結果)
+        """
+        cell_filter = reduce(or_, [
+            Q(geohash__gte=cell, geohash__lt=f"{cell}~")
+            for cell in cls.covering_cells(lat, lng, radius_m)
+        ])
+        candidates = shops.filter(cell_filter).values_list("id", "latitude", "longitude")
+
+        distances: List[Tuple[float, int]] = []
+        for shop_id, shop_lat, shop_lng in candidates:
+            if include is not None and not include(shop_id):
+                continue
+            distance = haversine_m(lat, lng, shop_lat, shop_lng)
+            if distance <= radius_m:
+                distances.append((distance, shop_id))
+
+        distances.sort()
+        return [(shop_id, round(distance, 1)) for distance, shop_id in distances]
@@ -0,0 +1,67 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cms.constants import TAIWAN_LOCALITIES
+
+
+# 正式名稱 -> 代碼
+CITY_CODES: Dict[str, str] = {
+    locality["name"]: city_code
+    for city_code, locality in TAIWAN_LOCALITIES.items()
+}
+# (縣市代碼, 正式名稱) -> 代碼
+DISTRICT_CODES: Dict[Tuple[str, str], str] = {
+    (city_code, district): f"{city_code}-{district}"
+    for city_code, locality in TAIWAN_LOCALITIES.items()
+    for district in locality["districts"]
+}
+
+
+def normalize_locality_name(name: Optional[str]) -> str:
+    """統一「台 / 臺」寫法，回傳正式名稱使用的「臺」"""
+    return (name or "").strip().replace("台", "臺")
+
+
+def get_city_code(city: Optional[str]) -> Optional[str]:
+    return CITY_CODES.get(normalize_locality_name(city))
+
+
+def get_district_code(city_code: Optional[str], district: Optional[str]) -> Optional[str]:
+    if not city_code:
+        return None
+    return DISTRICT_CODES.get((city_code, normalize_locality_name(district)))
+
+
+def get_locality_codes(city: Optional[str], district: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """由縣市 / 行政區名稱取得 (縣市代碼, 行政區代碼)，不在對照表中時為 None"""
+    city_code = get_city_code(city)
+    return city_code, get_district_code(city_code, district)
+
+
+def resolve_city_codes(keyword: str) -> List[str]:
+    """將查詢條件對應到縣市代碼
+
+    接受代碼 (TPE)、正式或異體名稱 (臺北市 / 台北市) 與部分名稱 (台北、新竹)，
+    部分名稱可能對應多個縣市，與原本 icontains 的比對結果一致。
+    """
+    keyword = normalize_locality_name(keyword)
+    if keyword.upper() in TAIWAN_LOCALITIES:
+        return [keyword.upper()]
+
+    return [
+        city_code
+        for city_code, locality in TAIWAN_LOCALITIES.items()
+        if keyword in locality["name"]
+    ]
+
+
+def resolve_district_codes(keyword: str, city_codes: Optional[Iterable[str]] = None) -> List[str]:
+    """將查詢條件對應到行政區代碼，可限定在指定的縣市內"""
+    keyword = normalize_locality_name(keyword)
+    city_codes = set(city_codes) if city_codes is not None else None
+
+    return [
+        district_code
+        for (city_code, district), district_code in DISTRICT_CODES.items()
+        if (city_codes is None or city_code in city_codes)
+        and (keyword in district or keyword == district_code)
+    ]
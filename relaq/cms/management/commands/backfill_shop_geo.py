@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from cms.geo import get_geohash
+from cms.models import Shop
+from googlemap.services import GoogleMapHelper
+
+
+class Command(BaseCommand):
+    help = "補齊店家的經緯度與 geohash (以地址向 Google Geocoding API 查詢)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rehash",
+            action="store_true",
+            help="只依既有經緯度重新計算 geohash，不呼叫 Google API",
+        )
+
+    def handle(self, *args, **options):
+        if options["rehash"]:
+            shops = list(Shop.objects.filter(latitude__isnull=False, longitude__isnull=False))
+            for shop in shops:
+                shop.geohash = get_geohash(shop.latitude, shop.longitude)
+            Shop.objects.bulk_update(shops, ["geohash"], batch_size=500)
+            self.stdout.write(self.style.SUCCESS(f"重新計算 {len(shops)} 間店家的 geohash 完成"))
+            return
+
+        google_map_helper = GoogleMapHelper()
+        updated_shops = []
+        shops = Shop.objects.filter(latitude__isnull=True).exclude(address="")
+
+        for shop in shops:
+            try:
+                location = google_map_helper.geocode(shop.address)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"店家 {shop.name} 查詢經緯度失敗: {str(e)}"))
+                continue
+
+            if location is None:
+                self.stdout.write(self.style.WARNING(f"店家 {shop.name} 找不到經緯度"))
+                continue
+
+            shop.latitude, shop.longitude = location
+            shop.geohash = get_geohash(shop.latitude, shop.longitude)
+            updated_shops.append(shop)
+
+        Shop.objects.bulk_update(updated_shops, ["latitude", "longitude", "geohash"], batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(f"補齊 {len(updated_shops)} 間店家的經緯度完成"))
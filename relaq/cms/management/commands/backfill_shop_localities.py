@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cms.bitmap_index import ShopBitmapIndex
+from cms.facets import ShopFacetService
+from cms.address_parser import address_parser
+from cms.localities import get_locality_codes, normalize_locality_name
+from cms.models import Shop
+
+
+class Command(BaseCommand):
+    help = "統一店家縣市 / 行政區名稱 (台 -> 臺) 並補齊縣市與行政區代碼"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reparse",
+            action="store_true",
+            help="一律由地址重新解析縣市與行政區，不沿用既有欄位",
+        )
+
+    def handle(self, *args, **options):
+        shops = list(Shop.objects.only("id", "address", "city", "district", "city_code", "district_code"))
+        updated_shops = []
+        unresolved = 0
+
+        parsed_addresses = address_parser.parse_many(shop.address for shop in shops)
+
+        for shop, parsed in zip(shops, parsed_addresses):
+            city = normalize_locality_name(shop.city)
+            district = normalize_locality_name(shop.district)
+            city_code, district_code = get_locality_codes(city, district)
+
+            if options["reparse"] or not (city_code and district_code):
+                city, district = parsed.city, parsed.district
+                city_code, district_code = parsed.city_code, parsed.district_code
+
+            if not district_code:
+                unresolved += 1
+
+            if (city, district, city_code, district_code) != (
+                shop.city, shop.district, shop.city_code, shop.district_code
+            ):
+                shop.city, shop.district = city, district
+                shop.city_code, shop.district_code = city_code, district_code
+                updated_shops.append(shop)
+
+        with transaction.atomic():
+            # bulk_update 不會觸發 signals，直接重算分面數量
+            Shop.objects.bulk_update(
+                updated_shops,
+                ["city", "district", "city_code", "district_code"],
+                batch_size=500,
+            )
+            ShopFacetService.rebuild()
+
+        ShopBitmapIndex.invalidate()
+
+        if unresolved:
+            self.stdout.write(self.style.WARNING(f"{unresolved} 間店家無法對應到行政區代碼"))
+        self.stdout.write(self.style.SUCCESS(f"更新 {len(updated_shops)} 間店家的縣市與行政區完成"))
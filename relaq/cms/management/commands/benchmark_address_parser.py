@@ -0,0 +1,120 @@
+import re
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from django.core.management.base import BaseCommand
+
+from cms.address_parser import address_parser
+from cms.constants import CITY_PATTERN, DISTRICT_PATTERN
+from cms.localities import normalize_locality_name
+from cms.models import Shop
+
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "fixtures" / "address_corpus.tsv"
+
+
+def legacy_parse_address(address: str) -> Tuple[str, str]:
+    """原本 CoreService._parse_address 的正規表示式版本，作為比較基準"""
+    clean_address = re.sub(r'^\d{3,6}|台灣', '', address)
+
+    city_match = re.search(CITY_PATTERN, clean_address)
+    city = city_match.group(1) if city_match else ""
+
+    if city:
+        clean_address = clean_address.replace(city, '')
+
+    district_match = re.search(DISTRICT_PATTERN, clean_address)
+    district = district_match.group(1) if district_match else ""
+
+    return normalize_locality_name(city), normalize_locality_name(district)
+
+
+class Command(BaseCommand):
+    help = "比較地名表解析器與原本正規表示式解析地址的速度與正確率"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corpus",
+            type=str,
+            default=str(DEFAULT_CORPUS),
+            help="地址語料 (tsv: 地址、預期縣市、預期行政區)",
+        )
+        parser.add_argument(
+            "--from-db",
+            action="store_true",
+            help="改用資料庫中店家的地址 (沒有預期結果，只比較速度與兩者差異)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="重複解析的次數",
+        )
+
+    def _load_corpus(self, path: str) -> List[Tuple[str, Optional[Tuple[str, str]]]]:
+        corpus = []
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            if not line.strip() or line.startswith("#"):
+                continue
+            columns = line.split("\t")
+            expected = (columns[1], columns[2]) if len(columns) >= 3 else None
+            corpus.append((columns[0], expected))
+        return corpus
+
+    def _time(self, name: str, func: Callable[[], List[Tuple[str, str]]], count: int) -> List[Tuple[str, str]]:
+        start = time.perf_counter()
+        results = func()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{name:<12} {elapsed * 1000:>9.1f} ms  {count / elapsed:>12,.0f} 筆/秒"
+        )
+        return results
+
+    def handle(self, *args, **options):
+        if options["from_db"]:
+            corpus = [(address, None) for address in Shop.objects.values_list("address", flat=True)]
+        else:
+            corpus = self._load_corpus(options["corpus"])
+
+        if not corpus:
+            self.stdout.write(self.style.WARNING("沒有可解析的地址"))
+            return
+
+        repeat = options["repeat"]
+        addresses = [address for address, _ in corpus]
+        # 每筆地址加上不同的樓層，避免 parse_many 略過重複地址，也不影響解析結果
+        workload = [f"{address}{index}樓" for index, address in enumerate(addresses * repeat)]
+        self.stdout.write(f"地址 {len(addresses)} 筆，重複 {repeat} 次，共 {len(workload)} 筆")
+
+        legacy_results = self._time(
+            "regex",
+            lambda: [legacy_parse_address(address) for address in workload],
+            len(workload),
+        )[:len(addresses)]
+        gazetteer_results = [
+            (parsed.city, parsed.district)
+            for parsed in self._time(
+                "gazetteer",
+                lambda: [address_parser.parse(address) for address in workload],
+                len(workload),
+            )[:len(addresses)]
+        ]
+        self._time("parse_many", lambda: address_parser.parse_many(workload), len(workload))
+
+        expected_results = [expected for _, expected in corpus]
+        if any(expected is not None for expected in expected_results):
+            for name, results in (("regex", legacy_results), ("gazetteer", gazetteer_results)):
+                correct = sum(
+                    1 for result, expected in zip(results, expected_results)
+                    if expected is not None and result == expected
+                )
+                total = sum(1 for expected in expected_results if expected is not None)
+                self.stdout.write(f"{name:<12} 正確率 {correct}/{total} ({correct / total:.1%})")
+
+        for address, legacy, gazetteer in zip(addresses, legacy_results, gazetteer_results):
+            if legacy != gazetteer:
+                self.stdout.write(f"  差異: {address} regex={legacy} gazetteer={gazetteer}")
+
+        self.stdout.write(self.style.SUCCESS("地址解析效能測試完成"))
@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+
+from cms.models import Shop
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "api_baseline.json"
+
+# (名稱, method, 路徑, body)，body 中的 "{shop_id}" 會換成資料庫中的店家 ID
+SCENARIOS: List[Tuple[str, str, str, Optional[dict]]] = [
+    ("shop_list", "POST", "/api/shop_list/", {"page": 1}),
+    ("shop_list_keyword", "POST", "/api/shop_list/", {"page": 1, "keyword": "凝膠"}),
+    ("shop_list_city", "POST", "/api/shop_list/", {"page": 1, "city": "臺北市"}),
+    ("shop_list_city_district", "POST", "/api/shop_list/", {"page": 1, "city": "臺北市", "township": "大安區"}),
+    ("shop_list_price", "POST", "/api/shop_list/", {"page": 1, "price_min": 500, "price_max": 1500}),
+    ("shop_list_deep_page", "POST", "/api/shop_list/", {"page": 200}),
+    ("shop_list_nearby", "POST", "/api/shop_list/", {"page": 1, "lat": 25.033, "lng": 121.565, "radius_m": 5000}),
+    ("shop", "POST", "/api/shop/", {"id": "{shop_id}"}),
+    ("article_list", "POST", "/api/article_list/", {"page": 1}),
+    ("homepage", "GET", "/api/homepage/", None),
+]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = "API 效能測試：依情境量測吞吐量與延遲分位數，並與基準值比較"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenarios",
+            nargs="+",
+            default=None,
+            help=f"只執行指定情境 ({', '.join(name for name, *_ in SCENARIOS)})",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=50,
+            help="每個情境的請求數",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="每個情境先送出、不計入結果的請求數",
+        )
+        parser.add_argument(
+            "--url",
+            type=str,
+            default=None,
+            help="對執行中的伺服器 (例如 http://127.0.0.1:8000) 測試，未指定時以 Django test client 在同一個 process 內測試",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="同時送出的請求數 (僅 --url 模式)",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=str,
+            default=str(DEFAULT_BASELINE),
+            help="基準值檔案",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="將這次結果寫入基準值檔案",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="p95 延遲或吞吐量比基準值差超過此比例時視為退步",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="有退步時以錯誤結束 (CI 使用)",
+        )
+
+    def _make_sender(self, url: Optional[str]) -> Callable[[str, str, Optional[dict]], int]:
+        if url is None:
+            client = Client(HTTP_HOST="localhost")
+
+            def send(method: str, path: str, body: Optional[dict]) -> int:
+                if method == "GET":
+                    return client.get(path).status_code
+                return client.post(path, body, content_type="application/json").status_code
+            return send
+
+        session = requests.Session()
+
+        def send(method: str, path: str, body: Optional[dict]) -> int:
+            return session.request(method, url.rstrip("/") + path, json=body).status_code
+        return send
+
+    def _run_scenario(self, method: str, path: str, body: Optional[dict], options: dict) -> Dict:
+        # requests.Session 與 test client 都不是執行緒安全的，每個執行緒各自建立
+        local = threading.local()
+
+        def timed_request(_) -> Tuple[float, int]:
+            if not hasattr(local, "send"):
+                local.send = self._make_sender(options["url"])
+            request_start = time.perf_counter()
+            status = local.send(method, path, body)
+            return time.perf_counter() - request_start, status
+
+        for _ in range(options["warmup"]):
+            timed_request(None)
+
+        concurrency = options["concurrency"] if options["url"] else 1
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(timed_request, range(options["requests"])))
+        else:
+            results = [timed_request(index) for index in range(options["requests"])]
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status >= 400)
+        return {
+            "requests": len(results),
+            "errors": errors,
+            "rps": round(len(results) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+
+    def _resolve_body(self, body: Optional[dict]) -> Optional[dict]:
+        if body is None or "{shop_id}" not in body.values():
+            return body
+
+        shop_id = Shop.objects.order_by("id").values_list("id", flat=True).first()
+        if shop_id is None:
+            raise CommandError("資料庫中沒有店家，請先執行 generate_bench_data")
+        return {key: shop_id if value == "{shop_id}" else value for key, value in body.items()}
+
+    def _compare(self, results: Dict[str, Dict], baseline: Dict, tolerance: float) -> List[str]:
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get("scenarios", {}).get(name)
+            if not base:
+                continue
+
+            p95_change = (result["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+            rps_change = (result["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0.0
+            line = f"{name:<26} p95 {base['p95_ms']:>9.2f} -> {result['p95_ms']:>9.2f} ms ({p95_change:+.0%})  " \
+                   f"rps {base['rps']:>8.2f} -> {result['rps']:>8.2f} ({rps_change:+.0%})"
+
+            if p95_change > tolerance or rps_change < -tolerance:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if options["scenarios"] is None or scenario[0] in options["scenarios"]
+        ]
+        if not scenarios:
+            raise CommandError("沒有符合的情境")
+
+        shop_count = Shop.objects.count()
+        self.stdout.write(f"店家 {shop_count} 間，每個情境 {options['requests']} 個請求")
+        self.stdout.write(f"{'情境':<24} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'錯誤':>4}")
+
+        results = {}
+        for name, method, path, body in scenarios:
+            result = self._run_scenario(method, path, self._resolve_body(body), options)
+            results[name] = result
+            self.stdout.write(
+                f"{name:<26} {result['rps']:>8.2f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                f"{result['p99_ms']:>9.2f} {result['max_ms']:>9.2f} {result['errors']:>4}"
+            )
+
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps({
+                "shop_count": shop_count,
+                "database": connections["default"].vendor,
+                "mode": "http" if options["url"] else "in-process",
+                "requests": options["requests"],
+                "scenarios": results,
+            }, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"基準值已寫入 {baseline_path}"))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"找不到基準值 {baseline_path}，以 --save-baseline 建立"))
+            return
+
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline.get("shop_count") != shop_count:
+            self.stdout.write(self.style.WARNING(
+                f"基準值的店家數 ({baseline.get('shop_count')}) 與目前 ({shop_count}) 不同，比較結果僅供參考"
+            ))
+
+        self.stdout.write("與基準值比較：")
+        regressions = self._compare(results, baseline, options["tolerance"])
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"效能退步: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("API 效能測試完成"))
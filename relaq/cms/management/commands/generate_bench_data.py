@@ -0,0 +1,209 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cms.bitmap_index import ShopBitmapIndex
+from cms.cards import ShopCardService
+from cms.constants import TAIWAN_LOCALITIES
+from cms.facets import ShopFacetService
+from cms.geo import get_geohash
+from cms.localities import DISTRICT_CODES
+from cms.models import Article, HomePageBanner, Shop, ShopCard, ShopPhoto, ShopTag
+from cms.tag_registry import ShopTagRegistry
+
+
+# 合成資料的店名前綴，--clear 依此刪除
+BENCH_PREFIX = "[bench]"
+BENCH_USERNAME = "bench"
+
+SHOP_WORDS = ["美甲", "光療", "指彩", "凝膠", "手足保養", "美睫", "霧面", "法式", "日系", "韓系"]
+SHOP_SUFFIXES = ["工作室", "沙龍", "Nail", "Studio", "Beauty", "小舖"]
+REVIEW_SENTENCES = [
+    "老闆娘很細心，指甲形狀修得很漂亮",
+    "環境乾淨舒適，預約準時不用等",
+    "價格透明，現場不會額外加價",
+    "光療維持了三週都沒有掉",
+    "凝膠顏色選擇很多，款式也跟得上流行",
+    "手繪圖案很精緻，朋友都問在哪裡做的",
+    "卸甲很溫和，不會傷到指甲",
+    "交通方便，捷運站走路五分鐘",
+    "停車比較不方便，建議搭大眾運輸",
+    "有提供飲料和雜誌，等待時不會無聊",
+]
+SERVICES = [("單色凝膠", 800, 1200), ("漸層凝膠", 1000, 1500), ("手繪彩繪", 1200, 2500), ("卸甲", 300, 500), ("手部保養", 500, 900)]
+
+
+class Command(BaseCommand):
+    help = "產生效能測試用的合成店家資料 (含評論、照片、標籤) 與文章、首頁 Banner"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=10000,
+            help="產生的店家數量",
+        )
+        parser.add_argument(
+            "--photos",
+            type=int,
+            default=3,
+            help="每間店家的照片數量",
+        )
+        parser.add_argument(
+            "--max-tags",
+            type=int,
+            default=5,
+            help="每間店家最多的標籤數量",
+        )
+        parser.add_argument(
+            "--articles",
+            type=int,
+            default=50,
+            help="產生的文章數量",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="每次 bulk_create 的筆數",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="亂數種子，相同種子會產生相同的資料",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="先刪除先前產生的合成資料",
+        )
+
+    def _gen_review(self, rng: random.Random) -> str:
+        return "".join(
+            f"<p>{'，'.join(rng.sample(REVIEW_SENTENCES, rng.randint(2, 4)))}。</p>"
+            for _ in range(rng.randint(3, 8))
+        )
+
+    def _gen_price_and_service(self, rng: random.Random) -> str:
+        services = rng.sample(SERVICES, rng.randint(2, len(SERVICES)))
+        return "".join(
+            f"<p>{name}：${rng.randrange(low, high, 50)}</p>"
+            for name, low, high in services
+        )
+
+    def _gen_shop(self, rng: random.Random, index: int) -> Shop:
+        (city_code, district), district_code = rng.choice(self.districts)
+        city = TAIWAN_LOCALITIES[city_code]["name"]
+        # 台灣本島範圍內的隨機座標 (與行政區不一定相符，只用於附近店家查詢的負載)
+        latitude = rng.uniform(22.0, 25.3)
+        longitude = rng.uniform(120.1, 121.9)
+        price_min = rng.randrange(300, 1500, 50)
+
+        return Shop(
+            name=f"{BENCH_PREFIX}{rng.choice(SHOP_WORDS)}{rng.choice(SHOP_SUFFIXES)} {index:07d}",
+            city=city,
+            district=district,
+            city_code=city_code,
+            district_code=district_code,
+            latitude=latitude,
+            longitude=longitude,
+            geohash=get_geohash(latitude, longitude),
+            address=f"{city}{district}測試路{rng.randint(1, 500)}號",
+            phone=f"09{rng.randint(10000000, 99999999)}",
+            review_count=rng.randint(0, 3000),
+            website=None,
+            rating=round(rng.uniform(3.0, 5.0), 1),
+            reviews=self._gen_review(rng),
+            price_and_service=self._gen_price_and_service(rng),
+            core_features=f"<p>{rng.choice(REVIEW_SENTENCES)}</p>",
+            review_summary=f"<p>{rng.choice(REVIEW_SENTENCES)}</p>",
+            recommended_uses=f"<p>{rng.choice(REVIEW_SENTENCES)}</p>",
+            price_min=price_min,
+            price_max=price_min + rng.randrange(200, 3000, 50),
+            business_hours="週一至週日 11:00-21:00",
+        )
+
+    def _create_shops(self, rng: random.Random, count: int, options: dict) -> None:
+        tag_ids = list(ShopTag.objects.values_list("id", flat=True))
+        if not tag_ids:
+            self.stdout.write(self.style.WARNING("沒有店家標籤，請先執行 init_shop_tags，店家將不會有標籤"))
+
+        ShopTagThrough = Shop.tags.through
+        batch_size = options["batch_size"]
+        start_index = Shop.objects.filter(name__startswith=BENCH_PREFIX).count()
+        created = 0
+
+        while created < count:
+            size = min(batch_size, count - created)
+            with transaction.atomic():
+                shops = Shop.objects.bulk_create(
+                    [self._gen_shop(rng, start_index + created + offset) for offset in range(size)]
+                )
+                ShopPhoto.objects.bulk_create([
+                    ShopPhoto(image_path=f"/media/place_photos/bench_{shop.id}_{photo}.jpg", shop=shop)
+                    for shop in shops
+                    for photo in range(options["photos"])
+                ])
+                ShopTagThrough.objects.bulk_create([
+                    ShopTagThrough(shop_id=shop.id, shoptag_id=tag_id)
+                    for shop in shops
+                    for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randint(0, options["max_tags"])))
+                ])
+                ShopCardService.refresh(shop.id for shop in shops)
+            created += size
+            self.stdout.write(f"已產生 {created}/{count} 間店家")
+
+    def _create_articles(self, rng: random.Random, count: int) -> None:
+        user, _ = get_user_model().objects.get_or_create(username=BENCH_USERNAME)
+        Article.objects.bulk_create([
+            Article(
+                thumbnail=f"/media/articles/bench_{index}.jpg",
+                title=f"{BENCH_PREFIX}美甲趨勢 {index}",
+                content="".join(f"<p>{sentence}</p>" for sentence in rng.sample(REVIEW_SENTENCES, 6)),
+                created_by=user,
+                url=f"https://example.com/articles/{index}",
+            )
+            for index in range(count)
+        ])
+        if not HomePageBanner.objects.exists():
+            HomePageBanner.objects.create(image_path="/media/banners/bench.jpg")
+
+    def _clear(self) -> None:
+        """刪除合成資料
+
+        Shop 的 delete signals 會逐筆更新分面數量，大量資料時太慢；
+        這裡先刪除照片、列表卡片與標籤關聯，再以 _raw_delete 直接刪除店家，最後一次重算分面。
+        """
+        shops = Shop.objects.filter(name__startswith=BENCH_PREFIX)
+        with transaction.atomic():
+            ShopCard.objects.filter(shop__in=shops).delete()
+            Shop.tags.through.objects.filter(shop__in=shops).delete()
+            ShopPhoto.objects.filter(shop__in=shops).delete()
+            deleted = shops._raw_delete(shops.db)
+            Article.objects.filter(title__startswith=BENCH_PREFIX).delete()
+        self.stdout.write(f"刪除 {deleted} 間合成店家")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.districts = list(DISTRICT_CODES.items())
+        start = time.perf_counter()
+
+        if options["clear"]:
+            self._clear()
+
+        self._create_shops(rng, options["count"], options)
+        self._create_articles(rng, options["articles"])
+
+        # bulk_create 不會觸發 signals，直接重算分面數量並清除記憶體索引
+        ShopFacetService.rebuild()
+        ShopBitmapIndex.invalidate()
+        ShopTagRegistry.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"產生 {options['count']} 間店家、{options['articles']} 篇文章完成，"
+            f"花費 {time.perf_counter() - start:.1f} 秒"
+        ))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from cms.models import ShopTag, ShopTagType
+from cms.tag_registry import ShopTagRegistry
 
 
 class Command(BaseCommand):
@@ -188,14 +189,17 @@ class Command(BaseCommand):
         }
         
         
+        # 只新增標籤表中還沒有的標籤，重複執行不會產生重複資料
+        tag_registry = ShopTagRegistry.get()
         bulk_create_list = []
         
         for tag_type, tags in tag_data.items():
             for tag in tags:
+                if tag_registry.get_tag(tag_type, tag["name"]):
+                    continue
                 bulk_create_list.append(ShopTag(**tag, type=tag_type))
         
         ShopTag.objects.bulk_create(bulk_create_list)
+        ShopTagRegistry.invalidate()
         
-        
-        
-        self.stdout.write(self.style.SUCCESS('初始化店家標籤資料完成'))
+        self.stdout.write(self.style.SUCCESS(f'初始化店家標籤資料完成，新增 {len(bulk_create_list)} 個標籤'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cms.cards import ShopCardService
+
+
+class Command(BaseCommand):
+    help = "重建店家列表卡片 (ShopCard)，變更 DOMAIN 或以 SQL 直接修改店家資料後執行"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = ShopCardService.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"重建 {count} 間店家的列表卡片完成，花費 {time.perf_counter() - start:.1f} 秒"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from cms.facets import ShopFacetService
+
+
+class Command(BaseCommand):
+    help = "重建店家分面數量 (標籤 / 縣市 / 行政區)"
+
+    def handle(self, *args, **options):
+        ShopFacetService.rebuild()
+
+        self.stdout.write(self.style.SUCCESS("重建店家分面數量完成"))
@@ -0,0 +1,99 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:46
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def _merge_relations(relation_model, db_alias, field, other_field, keep_id, duplicate_ids):
+    """把重複資料的關聯改指向保留的資料，保留的資料已有相同關聯時直接刪除"""
+    linked = set(
+        relation_model.objects.using(db_alias)
+        .filter(**{field: keep_id})
+        .values_list(other_field, flat=True)
+    )
+    move_ids, delete_ids = [], []
+    relations = (
+        relation_model.objects.using(db_alias)
+        .filter(**{f'{field}__in': duplicate_ids})
+        .order_by('id')
+        .values_list('id', other_field)
+    )
+    for relation_id, other_id in relations:
+        if other_id in linked:
+            delete_ids.append(relation_id)
+        else:
+            move_ids.append(relation_id)
+            linked.add(other_id)
+
+    relation_model.objects.using(db_alias).filter(id__in=delete_ids).delete()
+    relation_model.objects.using(db_alias).filter(id__in=move_ids).update(**{field: keep_id})
+
+
+def merge_duplicates(apps, schema_editor):
+    """合併重複的標籤 (type + name) 與店家 (name)，保留 ID 最小的一筆
+
+    舊版 init_shop_tags / init_shop_info 以 bulk_create 寫入，重複執行會產生重複資料，
+    需要先合併才能加上唯一限制。
+    """
+    Shop = apps.get_model('cms', 'Shop')
+    ShopTag = apps.get_model('cms', 'ShopTag')
+    ShopPhoto = apps.get_model('cms', 'ShopPhoto')
+    ShopTagRelation = Shop.tags.through
+    db_alias = schema_editor.connection.alias
+
+    duplicate_tags = (
+        ShopTag.objects.using(db_alias)
+        .values('type', 'name')
+        .order_by()
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicate_tags:
+        duplicate_ids = list(
+            ShopTag.objects.using(db_alias)
+            .filter(type=row['type'], name=row['name'])
+            .exclude(id=row['keep_id'])
+            .values_list('id', flat=True)
+        )
+        _merge_relations(ShopTagRelation, db_alias, 'shoptag_id', 'shop_id', row['keep_id'], duplicate_ids)
+        ShopTag.objects.using(db_alias).filter(id__in=duplicate_ids).delete()
+
+    duplicate_shops = (
+        Shop.objects.using(db_alias)
+        .values('name')
+        .order_by()
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicate_shops:
+        duplicate_ids = list(
+            Shop.objects.using(db_alias)
+            .filter(name=row['name'])
+            .exclude(id=row['keep_id'])
+            .values_list('id', flat=True)
+        )
+        _merge_relations(ShopTagRelation, db_alias, 'shop_id', 'shoptag_id', row['keep_id'], duplicate_ids)
+        ShopPhoto.objects.using(db_alias).filter(shop_id__in=duplicate_ids).update(shop_id=row['keep_id'])
+        Shop.objects.using(db_alias).filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+    # 合併資料在獨立的交易中先提交，PostgreSQL 才不會在同一個交易中修改資料表時出現 pending trigger events
+    atomic = False
+
+    dependencies = [
+        ('cms', '0009_alter_article_created_at_alter_article_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='shop',
+            name='name',
+            field=models.CharField(max_length=255, unique=True, verbose_name='店家名稱'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoptag',
+            constraint=models.UniqueConstraint(fields=('type', 'name'), name='unique_shop_tag_type_name'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_facet_counts(apps, schema_editor):
+    Shop = apps.get_model('cms', 'Shop')
+    ShopTag = apps.get_model('cms', 'ShopTag')
+    ShopFacetCount = apps.get_model('cms', 'ShopFacetCount')
+    db_alias = schema_editor.connection.alias
+
+    facet_counts = [
+        ShopFacetCount(facet='TAG', value=str(tag.id), tag_id=tag.id, count=tag.usage_count)
+        for tag in ShopTag.objects.using(db_alias).annotate(usage_count=Count('shops'))
+    ]
+    for facet, field in (('CITY', 'city'), ('DISTRICT', 'district')):
+        rows = (
+            Shop.objects.using(db_alias).exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .values(field).order_by().annotate(count=Count('id'))
+        )
+        facet_counts.extend(
+            ShopFacetCount(facet=facet, value=row[field], count=row['count'])
+            for row in rows
+        )
+
+    ShopFacetCount.objects.using(db_alias).bulk_create(facet_counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0010_alter_shop_name_shoptag_unique_shop_tag_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('TAG', '標籤'), ('CITY', '縣市'), ('DISTRICT', '行政區')], max_length=16, verbose_name='類型')),
+                ('value', models.CharField(help_text='標籤為 ShopTag ID，縣市與行政區為名稱', max_length=255, verbose_name='值')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='店家數量')),
+                ('tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='cms.shoptag', verbose_name='標籤')),
+            ],
+            options={
+                'verbose_name': '店家分面數量',
+                'verbose_name_plural': '店家分面數量',
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='unique_shop_facet_value')],
+            },
+        ),
+        migrations.RunPython(build_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0011_shopfacetcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, help_text='附近店家查詢用，由經緯度產生', max_length=12, null=True, verbose_name='Geohash'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='緯度'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='經度'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:21
+
+from django.db import migrations, models
+
+
+# 關鍵字查詢 (ShopFilterMixin) 以 icontains 比對的欄位，PostgreSQL 上會產生 UPPER(col::text) LIKE UPPER(%s)，
+# 索引需建立在相同的表達式上才會被使用
+TRIGRAM_INDEXES = [
+    ('cms_shop', 'name'),
+    ('cms_shop', 'address'),
+    ('cms_shop', 'phone'),
+    ('cms_shop', 'website'),
+    ('cms_shop', 'reviews'),
+    ('cms_shop', 'core_features'),
+    ('cms_shop', 'review_summary'),
+    ('cms_shop', 'recommended_uses'),
+    ('cms_shoptag', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """只在 PostgreSQL 建立 pg_trgm GIN 索引，SQLite 沒有對應的索引類型"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{column}_trgm '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在交易中執行，建立索引時不會鎖住寫入
+    atomic = False
+
+    dependencies = [
+        ('cms', '0013_shop_locality_codes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(condition=models.Q(('price_min__isnull', False)), fields=['price_min'], name='shop_price_min_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(condition=models.Q(('price_max__isnull', False)), fields=['price_max'], name='shop_price_max_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
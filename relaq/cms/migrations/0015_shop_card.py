@@ -0,0 +1,61 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:32
+
+from collections import defaultdict
+from urllib.parse import urljoin
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_shop_cards(apps, schema_editor):
+    """與 ShopListObjSerializer 相同格式 (不含 distance_m)，之後由 cms.cards.ShopCardService 維護"""
+    Shop = apps.get_model('cms', 'Shop')
+    ShopPhoto = apps.get_model('cms', 'ShopPhoto')
+    ShopCard = apps.get_model('cms', 'ShopCard')
+    db_alias = schema_editor.connection.alias
+
+    photos = defaultdict(list)
+    for shop_id, image_path in ShopPhoto.objects.using(db_alias).order_by('id').values_list('shop_id', 'image_path'):
+        photos[shop_id].append(urljoin(settings.DOMAIN, image_path))
+
+    shops = Shop.objects.using(db_alias).values_list('id', 'name', 'address', 'price_min')
+    ShopCard.objects.using(db_alias).bulk_create(
+        [
+            ShopCard(
+                shop_id=shop_id,
+                payload={
+                    'id': shop_id,
+                    'name': name,
+                    'address': address,
+                    'price_min': price_min,
+                    'photos': photos[shop_id],
+                },
+            )
+            for shop_id, name, address, price_min in shops.iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0014_shop_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopCard',
+            fields=[
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='cms.shop', verbose_name='店家')),
+                ('payload', models.JSONField(help_text='ShopListObjSerializer 的輸出 (不含 distance_m)，照片為含 DOMAIN 的完整網址', verbose_name='卡片資料')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+            ],
+            options={
+                'verbose_name': '店家列表卡片',
+                'verbose_name_plural': '店家列表卡片',
+            },
+        ),
+        migrations.RunPython(build_shop_cards, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from django.db.models import F, ExpressionWrapper, FloatField, QuerySet
+from django.db.models import F, ExpressionWrapper, FloatField, Q, QuerySet
 from django.contrib.auth import get_user_model
 from ckeditor.fields import RichTextField
 
@@ -13,6 +13,11 @@ class ShopTagType(models.TextChoices):
     ENVIRONMENT = ("ENVIRONMENT", "環境氛圍")
     TRANSPORTATION = ("TRANSPORTATION", "交通便利")
     TARGET_AUDIENCE = ("TARGET_AUDIENCE", "目標客群")
+
+
+class TagMatchMode(models.TextChoices):
+    ALL = ("AND", "符合全部標籤")
+    ANY = ("OR", "符合任一標籤")
     
     
 class ShopTag(TimeStamped):
@@ -34,6 +39,9 @@ class ShopTag(TimeStamped):
     class Meta:
         verbose_name = "店家標籤"
         verbose_name_plural = "店家標籤"
+        constraints = [
+            models.UniqueConstraint(fields=["type", "name"], name="unique_shop_tag_type_name"),
+        ]
         
     def __str__(self):
         return f"{self.emoji} {self.name}({self.get_type_display()})"
@@ -43,6 +51,7 @@ class Shop(TimeStamped):
     name = models.CharField(
         verbose_name="店家名稱",
         max_length=255,
+        unique=True,
     )
     # 查詢用欄位
     city = models.CharField(
@@ -61,6 +70,40 @@ class Shop(TimeStamped):
         null=True,
         blank=True,
     )
+    city_code = models.CharField(
+        verbose_name="縣市代碼",
+        max_length=8,
+        help_text="查詢用，ISO 3166-2:TW 代碼，例如：TPE、NWT",
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+    district_code = models.CharField(
+        verbose_name="行政區代碼",
+        max_length=32,
+        help_text="查詢用，縣市代碼加行政區名稱，例如：TPE-大安區",
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+    latitude = models.FloatField(
+        verbose_name="緯度",
+        null=True,
+        blank=True,
+    )
+    longitude = models.FloatField(
+        verbose_name="經度",
+        null=True,
+        blank=True,
+    )
+    geohash = models.CharField(
+        verbose_name="Geohash",
+        max_length=12,
+        help_text="附近店家查詢用，由經緯度產生",
+        db_index=True,
+        null=True,
+        blank=True,
+    )
     # 顯示用欄位
     address = models.TextField(
         verbose_name="完整地址",
@@ -145,18 +188,23 @@ class Shop(TimeStamped):
     @classmethod
     def with_weighted_rating(cls, queryset: QuerySet["Shop"]):
         """
-        返回按照評分權重（評分 * 評論數）排序的查詢集
+        返回按照評分權重（評分 * 評論數）排序的查詢集，同分時依 ID 排序讓分頁結果固定
         """
         return queryset.annotate(
             weighted_rating=ExpressionWrapper(
                 F('rating') * F('review_count'),
                 output_field=FloatField()
             )
-        ).order_by("-weighted_rating")
+        ).order_by("-weighted_rating", "id")
     
     class Meta:
         verbose_name = "店家資訊"
         verbose_name_plural = "店家資訊"
+        indexes = [
+            # 價格篩選用的部分索引，沒有價格資訊的店家不進索引
+            models.Index(fields=["price_min"], name="shop_price_min_idx", condition=Q(price_min__isnull=False)),
+            models.Index(fields=["price_max"], name="shop_price_max_idx", condition=Q(price_max__isnull=False)),
+        ]
         
     def __str__(self):
         return self.name
@@ -180,6 +228,35 @@ class ShopPhoto(TimeStamped):
         return f"{self.shop.name}_photo"
 
 
+class ShopCard(models.Model):
+    """店家列表卡片的預先序列化資料，寫入時由 cms.cards.ShopCardService 維護
+
+    列表 API 只讀這張窄表，不需要載入店家的評論 / 摘要等大型文字欄位，也不需要再查詢照片。
+    """
+    shop = models.OneToOneField(
+        Shop,
+        verbose_name="店家",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card",
+    )
+    payload = models.JSONField(
+        verbose_name="卡片資料",
+        help_text="ShopListObjSerializer 的輸出 (不含 distance_m)，照片為含 DOMAIN 的完整網址",
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="更新時間",
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = "店家列表卡片"
+        verbose_name_plural = "店家列表卡片"
+
+    def __str__(self):
+        return f"{self.shop_id}_card"
+
+
 class HomePageBanner(TimeStamped):
     image_path = models.TextField(
         verbose_name="圖片路徑",
@@ -240,3 +317,45 @@ class ArticleImage(TimeStamped):
     class Meta:
         verbose_name = "文章圖片"
         verbose_name_plural = "文章圖片"
+
+
+class ShopFacetType(models.TextChoices):
+    TAG = ("TAG", "標籤")
+    CITY = ("CITY", "縣市")
+    DISTRICT = ("DISTRICT", "行政區")
+
+
+class ShopFacetCount(models.Model):
+    """各標籤 / 縣市 / 行政區的店家數量，寫入時維護，讀取時不需 GROUP BY"""
+    facet = models.CharField(
+        verbose_name="類型",
+        max_length=16,
+        choices=ShopFacetType.choices,
+    )
+    value = models.CharField(
+        verbose_name="值",
+        max_length=255,
+        help_text="標籤為 ShopTag ID，縣市與行政區為名稱",
+    )
+    tag = models.ForeignKey(
+        ShopTag,
+        verbose_name="標籤",
+        on_delete=models.CASCADE,
+        related_name="facet_counts",
+        null=True,
+        blank=True,
+    )
+    count = models.PositiveIntegerField(
+        verbose_name="店家數量",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "店家分面數量"
+        verbose_name_plural = "店家分面數量"
+        constraints = [
+            models.UniqueConstraint(fields=["facet", "value"], name="unique_shop_facet_value"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_facet_display()} {self.value}: {self.count}"
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from rest_framework import serializers
 from django.conf import settings
 from urllib.parse import urljoin
@@ -52,10 +54,14 @@ class ShopListObjSerializer(serializers.ModelSerializer):
         label="照片",
         help_text="店家照片列表"
     )
+    distance_m = serializers.SerializerMethodField(
+        label="距離",
+        help_text="與目前位置的距離 (公尺)，未提供位置時為 null"
+    )
     
     class Meta:
         model = Shop
-        fields = ['id', 'name', 'address', 'price_min', 'photos']
+        fields = ['id', 'name', 'address', 'price_min', 'photos', 'distance_m']
         ref_name = "shop_list_obj"
         swagger_schema_fields = {
             "photos": {
@@ -72,6 +78,9 @@ class ShopListObjSerializer(serializers.ModelSerializer):
             for photo in obj.photos.all()
         ]
 
+    def get_distance_m(self, obj: Shop) -> Optional[float]:
+        return getattr(obj, "distance_m", None)
+
     
 class ShopObjSerializer(ShopListObjSerializer):    
     phone = serializers.CharField(
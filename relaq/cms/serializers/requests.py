@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from core.serializers.base import PaginationSerializer
 from cms.serializers.objs import ArticleObjSerializer
+from cms.models import TagMatchMode
 
 
 class ArticleListReqSerializer(PaginationSerializer):    
@@ -43,12 +44,93 @@ class ShopListReqSerializer(PaginationSerializer):
         required=False,
         allow_blank=True,
     )
+    tag_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        help_text="標籤ID列表",
+        required=False,
+        allow_empty=True,
+    )
+    tag_mode = serializers.ChoiceField(
+        choices=TagMatchMode.choices,
+        help_text="多個標籤的比對方式，AND: 符合全部標籤，OR: 符合任一標籤",
+        required=False,
+        default=TagMatchMode.ALL,
+    )
+    lat = serializers.FloatField(
+        help_text="目前位置緯度，與經度一起提供時只回傳半徑內的店家並由近到遠排序",
+        min_value=-90,
+        max_value=90,
+        allow_null=True,
+        required=False,
+    )
+    lng = serializers.FloatField(
+        help_text="目前位置經度",
+        min_value=-180,
+        max_value=180,
+        allow_null=True,
+        required=False,
+    )
+    radius_m = serializers.IntegerField(
+        help_text="搜尋半徑 (公尺)",
+        min_value=1,
+        max_value=50000,
+        required=False,
+        default=3000,
+    )
     
     
+    def validate(self, attrs):
+        if (attrs.get("lat") is None) != (attrs.get("lng") is None):
+            raise serializers.ValidationError("經緯度需同時提供")
+        return attrs
+
     class Meta:
         ref_name = "shop_list_req"
         
 
+class ShopFacetReqSerializer(serializers.Serializer):
+    city = serializers.CharField(
+        help_text="縣市",
+        required=False,
+        allow_blank=True,
+    )
+    township = serializers.CharField(
+        help_text="鄉鎮",
+        required=False,
+        allow_blank=True,
+    )
+    price_min = serializers.IntegerField(
+        help_text="價格最小值",
+        allow_null=True,
+        required=False
+    )
+    price_max = serializers.IntegerField(
+        help_text="價格最大值",
+        allow_null=True,
+        required=False,
+    )
+    keyword = serializers.CharField(
+        help_text="關鍵字",
+        required=False,
+        allow_blank=True,
+    )
+    tag_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        help_text="標籤ID列表",
+        required=False,
+        allow_empty=True,
+    )
+    tag_mode = serializers.ChoiceField(
+        choices=TagMatchMode.choices,
+        help_text="多個標籤的比對方式，AND: 符合全部標籤，OR: 符合任一標籤",
+        required=False,
+        default=TagMatchMode.ALL,
+    )
+    
+    class Meta:
+        ref_name = "shop_facet_req"
+        
+
 class ShopReqSerializer(serializers.Serializer):
     id = serializers.IntegerField(
         help_text="店家Model ID"
@@ -0,0 +1,110 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from cms.bitmap_index import ShopBitmapIndex
+from cms.cache import CmsCache
+from cms.cards import ShopCardService
+from cms.facets import ShopFacetService
+from cms.geo import get_geohash
+from cms.localities import get_locality_codes
+from cms.models import Article, HomePageBanner, Shop, ShopPhoto, ShopTag
+from cms.tag_registry import ShopTagRegistry
+
+
+@receiver([post_save, post_delete], sender=ShopTag)
+def invalidate_tag_registry(sender, **kwargs):
+    """標籤異動時讓記憶體中的標籤表重新載入"""
+    ShopTagRegistry.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Shop)
+@receiver(m2m_changed, sender=Shop.tags.through)
+def invalidate_bitmap_index(sender, **kwargs):
+    """店家或店家標籤異動時讓記憶體中的位元索引重新載入"""
+    ShopBitmapIndex.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Article)
+@receiver([post_save, post_delete], sender=HomePageBanner)
+def invalidate_article_cache(sender, **kwargs):
+    CmsCache.invalidate(CmsCache.ARTICLE)
+
+
+@receiver([post_save, post_delete], sender=Shop)
+@receiver([post_save, post_delete], sender=ShopPhoto)
+@receiver([post_save, post_delete], sender=ShopTag)
+@receiver(m2m_changed, sender=Shop.tags.through)
+def invalidate_shop_cache(sender, **kwargs):
+    CmsCache.invalidate(CmsCache.SHOP)
+
+
+@receiver(post_save, sender=Shop)
+def refresh_shop_card(sender, instance: Shop, **kwargs):
+    ShopCardService.refresh_on_commit([instance.id])
+
+
+@receiver([post_save, post_delete], sender=ShopPhoto)
+def refresh_photo_shop_card(sender, instance: ShopPhoto, **kwargs):
+    # 店家被刪除時照片由 cascade 刪除，提交後店家已不存在，不會重建卡片
+    ShopCardService.refresh_on_commit([instance.shop_id])
+
+
+@receiver(post_save, sender=ShopTag)
+def init_tag_facet(sender, instance: ShopTag, created: bool, **kwargs):
+    if created:
+        ShopFacetService.refresh_tags([instance.id])
+
+
+@receiver(m2m_changed, sender=Shop.tags.through)
+def refresh_tag_facets(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    """店家標籤異動時重算受影響標籤的數量"""
+    if action == "pre_clear":
+        # clear 之後就查不到原本的標籤，先記下來
+        instance._facet_cleared_tag_ids = (
+            [instance.id] if reverse else list(instance.tags.values_list("id", flat=True))
+        )
+        return
+
+    if action == "post_clear":
+        ShopFacetService.refresh_tags(getattr(instance, "_facet_cleared_tag_ids", []))
+    elif action in ("post_add", "post_remove"):
+        ShopFacetService.refresh_tags([instance.id] if reverse else pk_set)
+
+
+@receiver(pre_save, sender=Shop)
+def sync_shop_geohash(sender, instance: Shop, **kwargs):
+    instance.geohash = get_geohash(instance.latitude, instance.longitude)
+
+
+@receiver(pre_save, sender=Shop)
+def sync_shop_locality_codes(sender, instance: Shop, **kwargs):
+    instance.city_code, instance.district_code = get_locality_codes(instance.city, instance.district)
+
+
+@receiver(pre_save, sender=Shop)
+def remember_shop_locality(sender, instance: Shop, **kwargs):
+    instance._facet_old_locality = (
+        Shop.objects.filter(id=instance.id).values_list("city", "district").first()
+        if instance.id else None
+    )
+
+
+@receiver(post_save, sender=Shop)
+def refresh_shop_locality_facets(sender, instance: Shop, **kwargs):
+    old_city, old_district = getattr(instance, "_facet_old_locality", None) or (None, None)
+    ShopFacetService.refresh_localities(
+        cities=[instance.city, old_city],
+        districts=[instance.district, old_district],
+    )
+
+
+@receiver(pre_delete, sender=Shop)
+def remember_shop_tags(sender, instance: Shop, **kwargs):
+    # 刪除店家時關聯表由 cascade 刪除，不會觸發 m2m_changed
+    instance._facet_deleted_tag_ids = list(instance.tags.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Shop)
+def refresh_deleted_shop_facets(sender, instance: Shop, **kwargs):
+    ShopFacetService.refresh_tags(getattr(instance, "_facet_deleted_tag_ids", []))
+    ShopFacetService.refresh_localities(cities=[instance.city], districts=[instance.district])
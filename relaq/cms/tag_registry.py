@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from cms.models import ShopTag
+from core.metrics import api_metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_tag_name(name: str) -> str:
+    """統一全形 / 半形、大小寫並去除空白，只用來比對完全相同的名稱"""
+    return "".join(unicodedata.normalize("NFKC", name or "").split()).casefold()
+
+
+class ShopTagRegistry:
+    """常駐記憶體的店家標籤表
+
+    以 (type, 正規化後的 name) 為鍵，第一次使用時從資料庫載入，ShopTag 異動時 (signals)
+    或超過 TAG_REGISTRY_TTL_SECONDS 後重新載入。LLM 輸出的標籤只有類型與名稱
+    完全相同時才會對應到既有標籤，包含既有名稱或 emoji 相同的標籤 (例如「非可愛風」、
+    「日系極簡風」) 一律視為幻覺而捨棄，不會新增近似重複的標籤。
+    """
+    _instance: Optional["ShopTagRegistry"] = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.tags: Dict[Tuple[str, str], ShopTag] = {
+            (tag.type, normalize_tag_name(tag.name)): tag
+            for tag in ShopTag.objects.all()
+        }
+
+        logger.info(f"[TagRegistry] 載入 {len(self.tags)} 個標籤")
+
+    @classmethod
+    def get(cls) -> "ShopTagRegistry":
+        instance = cls._instance
+        if instance is None or time.monotonic() - instance.loaded_at > settings.TAG_REGISTRY_TTL_SECONDS:
+            with cls._lock:
+                instance = cls._instance
+                if instance is None or time.monotonic() - instance.loaded_at > settings.TAG_REGISTRY_TTL_SECONDS:
+                    instance = cls._instance = cls()
+                    api_metrics.cache_lookup("tag_registry", hit=False)
+                    return instance
+        api_metrics.cache_lookup("tag_registry", hit=True)
+        return instance
+
+    @classmethod
+    def invalidate(cls) -> None:
+        cls._instance = None
+
+    def get_tag(self, tag_type: str, name: str) -> Optional[ShopTag]:
+        """以類型與名稱 (忽略全形 / 半形、大小寫與空白) 取得既有標籤，不做部分比對"""
+        return self.tags.get((tag_type, normalize_tag_name(name)))
+
+    def match_tags(self, tags: List[Dict]) -> List[ShopTag]:
+        """將解析後的標籤列表對應到既有標籤，捨棄無法對應的標籤"""
+        matched = {}
+
+        for tag_data in tags:
+            tag = self.get_tag(tag_data['type'], tag_data['name'])
+            if tag is None:
+                logger.warning(f"[TagRegistry] 捨棄不存在的標籤: {tag_data['type']} {tag_data['name']}")
+                continue
+            matched[tag.id] = tag
+
+        return list(matched.values())
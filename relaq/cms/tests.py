@@ -1,3 +1,143 @@
+from itertools import combinations
+
 from django.test import TestCase
 
-# Create your tests here.
+from cms.bitmap_index import ShopBitmapIndex
+from cms.models import Shop, ShopTag, ShopTagType, TagMatchMode
+from cms.tag_registry import ShopTagRegistry
+
+
+class ShopTagRegistryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.natural = ShopTag.objects.create(type=ShopTagType.STYLE, name="自然風", emoji="🌿", description="")
+        cls.various = ShopTag.objects.create(type=ShopTagType.STYLE, name="多元風格", emoji="✨", description="")
+        cls.cute = ShopTag.objects.create(type=ShopTagType.STYLE, name="可愛風", emoji="🎀", description="")
+        cls.cheap = ShopTag.objects.create(type=ShopTagType.PRICE, name="經濟實惠", emoji="💰", description="")
+
+    def setUp(self):
+        ShopTagRegistry.invalidate()
+        self.registry = ShopTagRegistry.get()
+
+    def test_exact_name(self):
+        self.assertEqual(self.registry.get_tag(ShopTagType.STYLE, "自然風"), self.natural)
+        self.assertEqual(self.registry.get_tag(ShopTagType.PRICE, "經濟實惠"), self.cheap)
+
+    def test_normalized_name(self):
+        self.assertEqual(self.registry.get_tag(ShopTagType.STYLE, " 可愛 風 "), self.cute)
+
+    def test_same_name_other_type(self):
+        self.assertIsNone(self.registry.get_tag(ShopTagType.PRICE, "自然風"))
+
+    def test_rejects_hallucinated_tags(self):
+        hallucinated = [
+            {"type": ShopTagType.STYLE, "name": "日系極簡風", "emoji": "🌿"},
+            {"type": ShopTagType.STYLE, "name": "韓系", "emoji": "✨"},
+            {"type": ShopTagType.STYLE, "name": "非可愛風", "emoji": ""},
+            {"type": ShopTagType.PRICE, "name": "超值", "emoji": "💰"},
+        ]
+        with self.assertLogs("cms.tag_registry", level="WARNING") as logs:
+            self.assertEqual(self.registry.match_tags(hallucinated), [])
+        self.assertEqual(len(logs.output), len(hallucinated))
+
+    def test_match_tags_keeps_known_tags_once(self):
+        tags = [
+            {"type": ShopTagType.STYLE, "name": "可愛風", "emoji": "🎀"},
+            {"type": ShopTagType.STYLE, "name": "可愛風", "emoji": "🎀"},
+            {"type": ShopTagType.STYLE, "name": "可愛風格", "emoji": "🎀"},
+            {"type": ShopTagType.PRICE, "name": "經濟實惠", "emoji": "💰"},
+        ]
+        with self.assertLogs("cms.tag_registry", level="WARNING"):
+            self.assertEqual(self.registry.match_tags(tags), [self.cute, self.cheap])
+
+
+class ShopBitmapIndexTests(TestCase):
+    """位元索引的篩選結果需與資料庫查詢相同"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [
+            ShopTag.objects.create(type=ShopTagType.STYLE, name=name, emoji="", description="")
+            for name in ("自然風", "可愛風", "多元風格", "經濟實惠")
+        ]
+        localities = [
+            ("臺北市", "大安區", "TPE"),
+            ("臺北市", "信義區", "TPE"),
+            ("新北市", "板橋區", "NWT"),
+        ]
+        for index in range(12):
+            city, district, city_code = localities[index % len(localities)]
+            shop = Shop.objects.create(
+                name=f"店家 {index}",
+                address=f"{city}{district}",
+                phone=f"02{index:08d}",
+                city=city,
+                district=district,
+                city_code=city_code,
+                district_code=f"{city_code}-{district}",
+                rating=3 + index % 3,
+                review_count=index * 7 % 11,
+                price_min=None if index == 5 else 500 + index % 4 * 300,
+                price_max=None if index == 5 else 1000 + index % 4 * 300,
+            )
+            # 每間店家有不同的標籤組合，包含沒有標籤的店家
+            shop.tags.set([tag for bit, tag in enumerate(cls.tags) if index >> bit & 1])
+
+    def setUp(self):
+        ShopBitmapIndex.invalidate()
+        self.index = ShopBitmapIndex.get()
+
+    def tag_id_sets(self):
+        tag_ids = [tag.id for tag in self.tags]
+        return [list(ids) for size in (1, 2, 3) for ids in combinations(tag_ids, size)]
+
+    def assertBitsEqualQuerySet(self, bits, queryset):
+        self.assertEqual(self.index.to_ids(bits), sorted(queryset.values_list("id", flat=True).distinct()))
+
+    def test_tags_all_matches_orm(self):
+        for tag_ids in self.tag_id_sets():
+            with self.subTest(tag_ids=tag_ids):
+                shops = Shop.objects.all()
+                for tag_id in tag_ids:
+                    shops = shops.filter(tags=tag_id)
+                self.assertBitsEqualQuerySet(self.index.tags(tag_ids, TagMatchMode.ALL), shops)
+
+    def test_tags_any_matches_orm(self):
+        for tag_ids in self.tag_id_sets():
+            with self.subTest(tag_ids=tag_ids):
+                self.assertBitsEqualQuerySet(
+                    self.index.tags(tag_ids, TagMatchMode.ANY),
+                    Shop.objects.filter(tags__in=tag_ids),
+                )
+
+    def test_filter_with_locality_and_price_matches_orm(self):
+        cases = [
+            ({"city": "台北"}, {"city_code__in": ["TPE"]}),
+            ({"city": "臺北市", "township": "大安"}, {"district_code__in": ["TPE-大安區"]}),
+            ({"township": "板橋區"}, {"district_code__in": ["NWT-板橋區"]}),
+            ({"price_min": 800}, {"price_min__gte": 800}),
+            ({"price_max": 1300}, {"price_max__lte": 1300}),
+            ({"price_min": 700, "price_max": 1600}, {"price_min__gte": 700, "price_max__lte": 1600}),
+        ]
+        for tag_ids in self.tag_id_sets()[:4]:
+            for tag_mode in (TagMatchMode.ALL, TagMatchMode.ANY):
+                tag_shops = self.index.to_ids(self.index.tags(tag_ids, tag_mode))
+                for conditions, lookups in cases:
+                    with self.subTest(tag_ids=tag_ids, tag_mode=tag_mode, conditions=conditions):
+                        self.assertBitsEqualQuerySet(
+                            self.index.filter(tag_ids=tag_ids, tag_mode=tag_mode, **conditions),
+                            Shop.objects.filter(id__in=tag_shops, **lookups),
+                        )
+
+    def test_ranked_pages_follow_weighted_rating(self):
+        tag_ids = [self.tags[0].id, self.tags[1].id]
+        bits = self.index.tags(tag_ids, TagMatchMode.ANY)
+        rows = self.index.ranked(bits)
+        expected = list(
+            Shop.with_weighted_rating(Shop.objects.filter(tags__in=tag_ids).distinct()).values_list("id", flat=True)
+        )
+
+        self.assertEqual(rows.count(), len(expected))
+        pages = [rows[start:start + 3] for start in range(0, len(expected), 3)]
+        self.assertEqual([shop_id for page in pages for shop_id, _ in page], expected)
+        self.assertTrue(all(distance is None for page in pages for _, distance in page))
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include   
 from cms.views import (
     HomePageBannerAPIView,
@@ -5,10 +6,21 @@ from cms.views import (
     ArticleAPIView,
     ShopListAPIView,
     ShopAPIView,
+    ShopFacetAPIView,
 )
 
 app_name = 'cms'
 
+if settings.CMS_ASYNC_VIEWS:
+    # ASGI 部署時改用 async 版本 (cms/async_views.py)
+    from cms.async_views import (
+        AsyncHomePageBannerAPIView as HomePageBannerAPIView,
+        AsyncArticleListAPIView as ArticleListAPIView,
+        AsyncArticleAPIView as ArticleAPIView,
+        AsyncShopListAPIView as ShopListAPIView,
+        AsyncShopAPIView as ShopAPIView,
+    )
+
 
 api_patterns = [
     path('homepage/', HomePageBannerAPIView.as_view(), name='homepage'),
@@ -16,6 +28,7 @@ api_patterns = [
     path('article/', ArticleAPIView.as_view(), name='article'),
     path('shop_list/', ShopListAPIView.as_view(), name='shop_list'),
     path('shop/', ShopAPIView.as_view(), name='shop'),
+    path('shop_facets/', ShopFacetAPIView.as_view(), name='shop_facets'),
 ]
 
 
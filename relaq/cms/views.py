@@ -1,5 +1,7 @@
+from typing import List, Union
+
 from django.core.paginator import Paginator
-from django.db.models import Q, QuerySet, F
+from django.db.models import FloatField, Q, QuerySet, Value
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -13,12 +15,18 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from core.utils import APIUtils
+from cms.cards import CardRow, ShopCardService
+from cms.facets import ShopFacetService
+from cms.bitmap_index import RankedShopRows, ShopBitmapIndex
+from cms.geo import GeohashGrid
+from cms.localities import resolve_city_codes, resolve_district_codes
 from core.constants import ResponseCode
 from cms.serializers.requests import (
     ArticleListReqSerializer,
     ArticleReqSerializer,
     ShopListReqSerializer,
     ShopReqSerializer,
+    ShopFacetReqSerializer,
 )
 from cms.serializers.response import (
     HomePageResponseSerializer,
@@ -29,11 +37,11 @@ from cms.models import (
     HomePageBanner,
     Article,
     Shop,
+    TagMatchMode,
 )
 from cms.serializers.objs import (
     ArticleObjSerializer,
     ShopObjSerializer,
-    ShopListObjSerializer,
 )
 from core.constants import ResponseCode
 
@@ -210,13 +218,125 @@ class ArticleAPIView(GenericAPIView):
         return APIUtils.gen_response(ResponseCode.SUCCESS, data=article_data)
 
 
-class ShopListAPIView(GenericAPIView):
+class ShopFilterMixin:
+    """店家列表與分面共用的篩選條件"""
+    # 有標籤條件時，位元索引的結果在這個數量以下才以 id__in 限制關鍵字比對的範圍
+    KEYWORD_CANDIDATE_LIMIT = 1000
+
+    def _filter_shops(
+        self,
+        city=None,
+        township=None,
+        price_min=None,
+        price_max=None,
+        keyword=None,
+    ) -> QuerySet[Shop]:
+        """在資料庫中篩選，標籤條件由 _filter_shop_bits 在位元索引中處理"""
+        shops = Shop.objects.all()
+
+        # 地理位置篩選：名稱先對應到代碼，以完全比對查詢索引
+        city_codes = resolve_city_codes(city) if city else None
+        if city_codes is not None:
+            shops = shops.filter(city_code__in=city_codes)
+        if township:
+            shops = shops.filter(district_code__in=resolve_district_codes(township, city_codes))
+
+        # 價格範圍篩選
+        if isinstance(price_min, (int, float)):
+            shops = shops.filter(price_min__gte=price_min)
+        if isinstance(price_max, (int, float)):
+            shops = shops.filter(price_max__lte=price_max)
+
+        # 關鍵詞篩選
+        if keyword:
+            shops = shops.filter(
+                Q(reviews__icontains=keyword) |
+                Q(core_features__icontains=keyword) |
+                Q(review_summary__icontains=keyword) |
+                Q(recommended_uses__icontains=keyword) |
+                Q(tags__name__icontains=keyword) |
+                Q(name__icontains=keyword) |
+                Q(address__icontains=keyword) |
+                Q(phone__icontains=keyword) |
+                Q(website__icontains=keyword)
+            )
+            # 比對標籤名稱會 JOIN 關聯表，需要去除重複
+            shops = shops.distinct()
+
+        return shops
+
+    def _filter_shop_bits(
+        self,
+        bitmap_index: ShopBitmapIndex,
+        tag_ids,
+        tag_mode=TagMatchMode.ALL,
+        city=None,
+        township=None,
+        price_min=None,
+        price_max=None,
+        keyword=None,
+    ) -> int:
+        """有標籤條件時，標籤 / 地理位置 / 價格都在位元索引中取交集，不 JOIN 關聯表
+
+        關鍵字只能在資料庫中比對，取得符合的店家 ID 後在記憶體中取交集，
+        不會把大量的位元索引結果以 id__in 送回資料庫。
+        """
+        shop_bits = bitmap_index.filter(
+            tag_ids=tag_ids,
+            tag_mode=tag_mode,
+            city=city,
+            township=township,
+            price_min=price_min,
+            price_max=price_max,
+        )
+        if keyword and shop_bits:
+            keyword_shops = self._filter_shops(keyword=keyword)
+            if shop_bits.bit_count() <= self.KEYWORD_CANDIDATE_LIMIT:
+                # 候選店家不多時只比對候選店家，比全表比對快，送回資料庫的 ID 數量也有上限
+                keyword_shops = keyword_shops.filter(id__in=bitmap_index.to_ids(shop_bits))
+            shop_bits &= bitmap_index.to_bits(keyword_shops.values_list("id", flat=True))
+        return shop_bits
+
+    def _get_card_rows(self, validated_data: dict) -> Union[QuerySet, RankedShopRows, List[CardRow]]:
+        """依列表條件篩選與排序的 (店家 ID, 距離)，卡片內容由 ShopCardService 讀取"""
+        filters = {
+            "city": validated_data.get("city"),
+            "township": validated_data.get("township"),
+            "price_min": validated_data.get("price_min"),
+            "price_max": validated_data.get("price_max"),
+            "keyword": validated_data.get("keyword"),
+        }
+        tag_ids = validated_data.get("tag_ids")
+        lat, lng = validated_data.get("lat"), validated_data.get("lng")
+        nearby = lat is not None and lng is not None
+
+        if tag_ids:
+            bitmap_index = ShopBitmapIndex.get()
+            shop_bits = self._filter_shop_bits(bitmap_index, tag_ids, validated_data.get("tag_mode"), **filters)
+            if not nearby:
+                # 依位元索引中的排序分頁，只展開需要的頁面
+                return bitmap_index.ranked(shop_bits)
+            return GeohashGrid.nearest(
+                Shop.objects.all(), lat, lng, validated_data.get("radius_m"),
+                include=bitmap_index.contains(shop_bits),
+            )
+        if nearby:
+            # 附近店家模式：以 geohash 格子縮小範圍後計算距離，由近到遠排序
+            return GeohashGrid.nearest(self._filter_shops(**filters), lat, lng, validated_data.get("radius_m"))
+
+        shops = Shop.with_weighted_rating(self._filter_shops(**filters)).annotate(
+            distance_m=Value(None, output_field=FloatField())
+        )
+        return shops.values_list("id", "distance_m")
+
+
+class ShopListAPIView(ShopFilterMixin, GenericAPIView):
     serializer_class = ShopListReqSerializer
     permission_classes = [AllowAny]
 
     @swagger_auto_schema(
         operation_summary="店家列表",
-        operation_description="獲取店家列表，支持分頁、過濾和排序",
+        operation_description="獲取店家列表，支持分頁、過濾和排序，提供經緯度時回傳半徑內由近到遠的店家",
         request_body=ShopListReqSerializer,
         responses={
             HTTP_200_OK: openapi.Response(
@@ -240,6 +360,7 @@ class ShopListAPIView(GenericAPIView):
                                             'name': openapi.Schema(type=openapi.TYPE_STRING, description="店家名稱"),
                                             'address': openapi.Schema(type=openapi.TYPE_STRING, description="店家地址"),
                                             'price_min': openapi.Schema(type=openapi.TYPE_INTEGER, description="最低價格"),
+                                            'distance_m': openapi.Schema(type=openapi.TYPE_NUMBER, description="與目前位置的距離 (公尺)"),
                                             'pictures': openapi.Schema(
                                                 type=openapi.TYPE_ARRAY,
                                                 items=openapi.Schema(type=openapi.TYPE_STRING),
@@ -261,71 +382,22 @@ class ShopListAPIView(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
 
-        shops = self._filter_shops(
-            city=validated_data.get("city"),
-            township=validated_data.get("township"),
-            price_min=validated_data.get("price_min"),
-            price_max=validated_data.get("price_max"),
-            keyword=validated_data.get("keyword")
-        )
-
-        shops = Shop.with_weighted_rating(shops)
-
+        # 只在資料庫中分頁取得這一頁的店家 ID，卡片內容不需載入店家的大型文字欄位與照片
         paginator = Paginator(
-            object_list=ShopListObjSerializer(shops, many=True).data,
+            object_list=self._get_card_rows(validated_data),
             per_page=validated_data.get("page_size")
         )
+        page = paginator.page(validated_data.get("page"))
 
         return APIUtils.gen_response(
             ResponseCode.SUCCESS,
             data={
                 "total_pages": paginator.num_pages,
                 "total_count": paginator.count,
-                "items": paginator.page(validated_data.get("page")).object_list
+                "items": ShopCardService.get_cards(page.object_list)
             }
         )
 
-    def _filter_shops(
-        self,
-        city=None,
-        township=None,
-        price_min=None,
-        price_max=None,
-        keyword=None
-    ) -> QuerySet[Shop]:
-        shops = Shop.objects.all()
-
-        # 地理位置篩選
-        if city:
-            shops = shops.filter(city__icontains=city)
-        if township:
-            shops = shops.filter(district__icontains=township)
-
-        # 價格範圍篩選
-        if isinstance(price_min, (int, float)):
-            shops = shops.filter(price_min__gte=price_min)
-        if isinstance(price_max, (int, float)):
-            shops = shops.filter(price_max__lte=price_max)
-
-        # 關鍵詞篩選
-        if keyword:
-            shops = shops.filter(
-                Q(reviews__icontains=keyword) |
-                Q(core_features__icontains=keyword) |
-                Q(review_summary__icontains=keyword) |
-                Q(recommended_uses__icontains=keyword) |
-                Q(tags__name__icontains=keyword) |
-                Q(name__icontains=keyword) |
-                Q(address__icontains=keyword) |
-                Q(phone__icontains=keyword) |
-                Q(website__icontains=keyword)
-            )
-            
-        shops = shops.distinct()
-
-        return shops
-
-
 class ShopAPIView(GenericAPIView):
     serializer_class = ShopReqSerializer
     permission_classes = [AllowAny]
@@ -375,3 +447,105 @@ class ShopAPIView(GenericAPIView):
         shop_data = ShopObjSerializer(shop).data
 
         return APIUtils.gen_response(ResponseCode.SUCCESS, data=shop_data)
+
+
+class ShopFacetAPIView(ShopFilterMixin, GenericAPIView):
+    serializer_class = ShopFacetReqSerializer
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_summary="店家分面數量",
+        operation_description="依目前的篩選條件取得各標籤、縣市、行政區的店家數量",
+        request_body=ShopFacetReqSerializer,
+        responses={
+            HTTP_200_OK: openapi.Response(
+                description="成功",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'code': openapi.Schema(type=openapi.TYPE_STRING, description="響應代碼"),
+                        'msg': openapi.Schema(type=openapi.TYPE_STRING, description="響應消息"),
+                        'data': openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'tags': openapi.Schema(
+                                    type=openapi.TYPE_ARRAY,
+                                    items=openapi.Schema(
+                                        type=openapi.TYPE_OBJECT,
+                                        properties={
+                                            'id': openapi.Schema(type=openapi.TYPE_INTEGER, description="標籤ID"),
+                                            'name': openapi.Schema(type=openapi.TYPE_STRING, description="標籤名稱"),
+                                            'emoji': openapi.Schema(type=openapi.TYPE_STRING, description="標籤Emoji"),
+                                            'type': openapi.Schema(type=openapi.TYPE_STRING, description="標籤類型"),
+                                            'count': openapi.Schema(type=openapi.TYPE_INTEGER, description="店家數量"),
+                                        }
+                                    )
+                                ),
+                                'cities': openapi.Schema(
+                                    type=openapi.TYPE_ARRAY,
+                                    items=openapi.Schema(
+                                        type=openapi.TYPE_OBJECT,
+                                        properties={
+                                            'name': openapi.Schema(type=openapi.TYPE_STRING, description="縣市"),
+                                            'count': openapi.Schema(type=openapi.TYPE_INTEGER, description="店家數量"),
+                                        }
+                                    )
+                                ),
+                                'districts': openapi.Schema(
+                                    type=openapi.TYPE_ARRAY,
+                                    items=openapi.Schema(
+                                        type=openapi.TYPE_OBJECT,
+                                        properties={
+                                            'name': openapi.Schema(type=openapi.TYPE_STRING, description="行政區"),
+                                            'count': openapi.Schema(type=openapi.TYPE_INTEGER, description="店家數量"),
+                                        }
+                                    )
+                                ),
+                            }
+                        )
+                    }
+                )
+            )
+        },
+        tags=["店家"]
+    )
+    def post(self, request: Request) -> Response:
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        validated_data = serializer.validated_data
+
+        filters = {
+            "city": validated_data.get("city"),
+            "township": validated_data.get("township"),
+            "price_min": validated_data.get("price_min"),
+            "price_max": validated_data.get("price_max"),
+        }
+        keyword = validated_data.get("keyword")
+        tag_ids = validated_data.get("tag_ids")
+
+        if tag_ids:
+            # 標籤與結構化條件以位元索引取交集後直接 popcount，關鍵字比對結果在記憶體中取交集
+            bitmap_index = ShopBitmapIndex.get()
+            shop_bits = self._filter_shop_bits(
+                bitmap_index,
+                tag_ids,
+                validated_data.get("tag_mode"),
+                keyword=keyword,
+                **filters
+            )
+            counts = ShopFacetService.get_bitmap_counts(bitmap_index, shop_bits)
+        elif keyword:
+            # 關鍵字需要全文比對，只能在資料庫中計算
+            counts = ShopFacetService.get_counts(self._filter_shops(keyword=keyword, **filters))
+        elif any(value not in (None, "") for value in filters.values()):
+            # 結構化條件以位元索引取交集後直接 popcount
+            bitmap_index = ShopBitmapIndex.get()
+            counts = ShopFacetService.get_bitmap_counts(bitmap_index, bitmap_index.filter(**filters))
+        else:
+            # 沒有篩選條件時直接讀取聚合表
+            counts = ShopFacetService.get_counts()
+
+        return APIUtils.gen_response(
+            ResponseCode.SUCCESS,
+            data=counts
+        )
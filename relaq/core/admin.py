@@ -1,3 +1,38 @@
 from django.contrib import admin
 
+from core.models import CrawlArtifact, CrawlTask, CrawlTaskStatus, ProviderUsage
+
+
+class CrawlTaskAdmin(admin.ModelAdmin):
+    list_display = ("stage", "region", "keyword", "shop_name", "status", "attempts", "lease_owner", "available_at", "updated_at")
+    list_filter = ("status", "stage", "region", "keyword")
+    search_fields = ("shop_name", "region", "dedupe_key")
+    readonly_fields = ("dedupe_key", "lease_owner", "lease_expires_at", "heartbeat_at", "last_error")
+    actions = ["retry_tasks"]
+
+    @admin.action(description="重新排入佇列")
+    def retry_tasks(self, request, queryset):
+        count = queryset.exclude(status=CrawlTaskStatus.RUNNING).update(
+            status=CrawlTaskStatus.PENDING,
+            attempts=0,
+            lease_owner="",
+            lease_expires_at=None,
+        )
+        self.message_user(request, f"已重新排入 {count} 筆任務")
+
+
+class CrawlArtifactAdmin(admin.ModelAdmin):
+    list_display = ("shop_name", "stage", "shop_key", "updated_at")
+    list_filter = ("stage", "updated_at")
+    search_fields = ("shop_name", "shop_key")
+
+
+class ProviderUsageAdmin(admin.ModelAdmin):
+    list_display = ("provider", "date", "used", "updated_at")
+    list_filter = ("provider", "date")
+
+
 # Register your models here.
+admin.site.register(CrawlTask, CrawlTaskAdmin)
+admin.site.register(CrawlArtifact, CrawlArtifactAdmin)
+admin.site.register(ProviderUsage, ProviderUsageAdmin)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        if settings.LOG_QUEUE_ENABLED:
+            from core.log_queue import QueueLogging
+
+            QueueLogging.install(max_size=settings.LOG_QUEUE_MAX_SIZE)
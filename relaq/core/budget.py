@@ -0,0 +1,144 @@
+import math
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core.models import CrawlProvider, CrawlStage, CrawlTask, CrawlTaskStatus, ProviderUsage
+
+
+# 各階段使用的外部服務，SAVE 只寫資料庫
+STAGE_PROVIDERS: Dict[CrawlStage, CrawlProvider] = {
+    CrawlStage.SEARCH: CrawlProvider.GOOGLE,
+    CrawlStage.PRICE_AND_SERVICE: CrawlProvider.FELO,
+    CrawlStage.REVIEW: CrawlProvider.OUTSCRAPER,
+    CrawlStage.PRICE_RANGE: CrawlProvider.OPENAI,
+    CrawlStage.SUMMARY: CrawlProvider.OPENAI,
+    CrawlStage.TAG: CrawlProvider.OPENAI,
+    CrawlStage.REGENERATE_SUMMARY: CrawlProvider.OPENAI,
+}
+
+# Google 文字搜尋每頁 20 筆
+PLACES_PAGE_SIZE = 20
+
+
+class ProviderBudget:
+    """跨 worker 的外部服務用量控制
+
+    - 同時執行數：以租約未過期的 RUNNING 任務數計算，搶到任務後超過上限就退回
+    - 每日額度：ProviderUsage 以條件式 UPDATE 累加，額度不足時任務延到隔天
+    """
+
+    @staticmethod
+    def provider_for(stage: str) -> Optional[CrawlProvider]:
+        return STAGE_PROVIDERS.get(CrawlStage(stage))
+
+    @staticmethod
+    def estimate_cost(stage: str) -> int:
+        """預估任務會呼叫外部服務的次數"""
+        if stage == CrawlStage.SEARCH:
+            # 每頁一次文字搜尋，加上每間店家一次 Place Details
+            return settings.CATCH_LIMIT + math.ceil(settings.CATCH_LIMIT / PLACES_PAGE_SIZE)
+        return 1
+
+    @staticmethod
+    def stages_for(provider: str) -> List[CrawlStage]:
+        return [stage for stage, stage_provider in STAGE_PROVIDERS.items() if stage_provider == provider]
+
+    @staticmethod
+    def next_reset_at() -> datetime:
+        """額度重置時間 (隔天 00:00，本地時區)"""
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        return timezone.make_aware(datetime.combine(tomorrow, time.min))
+
+    @classmethod
+    def running_counts(cls) -> Dict[str, int]:
+        counts = {provider: 0 for provider in CrawlProvider.values}
+        rows = (
+            CrawlTask.objects
+            .filter(status=CrawlTaskStatus.RUNNING, lease_expires_at__gte=timezone.now())
+            .values("stage")
+            .order_by()
+            .annotate(count=Count("id"))
+        )
+        for row in rows:
+            provider = cls.provider_for(row["stage"])
+            if provider:
+                counts[provider] += row["count"]
+        return counts
+
+    @staticmethod
+    def used_today() -> Dict[str, int]:
+        usage = {provider: 0 for provider in CrawlProvider.values}
+        usage.update(
+            ProviderUsage.objects
+            .filter(date=timezone.localdate())
+            .values_list("provider", "used")
+        )
+        return usage
+
+    @classmethod
+    def over_quota_stages(cls) -> List[CrawlStage]:
+        """今日額度已用完的服務所對應的階段"""
+        used = cls.used_today()
+        return [
+            stage
+            for provider in CrawlProvider.values
+            if used[provider] >= settings.CRAWL_PROVIDER_DAILY_QUOTA[provider]
+            for stage in cls.stages_for(provider)
+        ]
+
+    @classmethod
+    def blocked_stages(cls) -> List[CrawlStage]:
+        """目前無法再執行的階段 (服務已達同時執行上限或今日額度用完)"""
+        running = cls.running_counts()
+        blocked = cls.over_quota_stages()
+
+        for provider in CrawlProvider.values:
+            if running[provider] >= settings.CRAWL_PROVIDER_CONCURRENCY[provider]:
+                blocked.extend(cls.stages_for(provider))
+        return blocked
+
+    @classmethod
+    def is_over_concurrency(cls, provider: str) -> bool:
+        return cls.running_counts()[provider] > settings.CRAWL_PROVIDER_CONCURRENCY[provider]
+
+    @staticmethod
+    def try_reserve(provider: str, cost: int) -> bool:
+        """在今日額度內預扣用量，額度不足時回傳 False"""
+        today = timezone.localdate()
+        quota = settings.CRAWL_PROVIDER_DAILY_QUOTA[provider]
+
+        try:
+            ProviderUsage.objects.get_or_create(provider=provider, date=today)
+        except IntegrityError:
+            # 其他 worker 同時建立了同一天的紀錄
+            pass
+
+        return bool(
+            ProviderUsage.objects.filter(
+                provider=provider,
+                date=today,
+                used__lte=quota - cost,
+            ).update(
+                used=F("used") + cost,
+                updated_at=timezone.now(),
+            )
+        )
+
+    @classmethod
+    def usage_report(cls) -> Dict[str, Dict[str, int]]:
+        running = cls.running_counts()
+        used = cls.used_today()
+        return {
+            provider: {
+                "running": running[provider],
+                "concurrency": settings.CRAWL_PROVIDER_CONCURRENCY[provider],
+                "used": used[provider],
+                "quota": settings.CRAWL_PROVIDER_DAILY_QUOTA[provider],
+            }
+            for provider in CrawlProvider.values
+        }
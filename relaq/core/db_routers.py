@@ -0,0 +1,154 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReadWriteRouter:
+    """讀取走唯讀連線 (read)，寫入與 migrate 走 default
+
+    SQLite 在 WAL 模式下讀取連線不會被寫入阻擋，爬蟲寫入期間 API 仍可讀取已提交的資料。
+    在 atomic 區塊中的讀取仍走 default，才能讀到同一個交易中尚未提交的寫入。
+    """
+    READ_ALIAS = "read"
+
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 兩個 alias 是同一個資料庫檔案
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@dataclass
+class ReplicaRouting:
+    """單一請求的路由狀態，由 ReplicaRoutingMiddleware 設定"""
+    use_replica: bool = False
+    replica: Optional[str] = None
+    wrote: bool = False
+
+
+_routing: ContextVar[Optional[ReplicaRouting]] = ContextVar("replica_routing", default=None)
+
+
+def get_replica_routing() -> Optional[ReplicaRouting]:
+    return _routing.get()
+
+
+def set_replica_routing(routing: Optional[ReplicaRouting]) -> Token:
+    return _routing.set(routing)
+
+
+def reset_replica_routing(token: Token) -> None:
+    _routing.reset(token)
+
+
+class ReplicaHealth:
+    """副本健康檢查
+
+    每個副本最多每 REPLICA_HEALTH_CHECK_SECONDS 秒檢查一次 (SELECT 1，PostgreSQL 另外檢查複寫延遲)，
+    查詢失敗或延遲超過 REPLICA_MAX_LAG_SECONDS 時標記為不可用，到下次檢查前都改讀 primary。
+    檢查在鎖外執行，同一時間每個副本只有一個執行緒在檢查。狀態存在各自的 process 中。
+    """
+    _status: Dict[str, Tuple[bool, float]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def check(cls, alias: str) -> bool:
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    # primary 沒有寫入時最後重播時間不會更新，已重播完收到的 WAL 就視為沒有延遲
+                    cursor.execute(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                    )
+                    lag = float(cursor.fetchone()[0])
+                    if lag > settings.REPLICA_MAX_LAG_SECONDS:
+                        logger.warning(f"[DB] 副本 {alias} 延遲 {lag:.1f} 秒，暫停使用")
+                        return False
+                else:
+                    cursor.execute("SELECT 1")
+            return True
+        except DatabaseError as e:
+            logger.warning(f"[DB] 副本 {alias} 無法連線，暫停使用: {e}")
+            connection.close()
+            return False
+
+    @classmethod
+    def is_healthy(cls, alias: str) -> bool:
+        now = time.monotonic()
+        with cls._lock:
+            healthy, checked_at = cls._status.get(alias, (True, float("-inf")))
+            if now - checked_at < settings.REPLICA_HEALTH_CHECK_SECONDS:
+                return healthy
+            # 由這個執行緒檢查，其他執行緒在檢查期間沿用目前的狀態，不會等待連線
+            cls._status[alias] = (healthy, now)
+
+        healthy = cls.check(alias)
+        with cls._lock:
+            cls._status[alias] = (healthy, time.monotonic())
+        return healthy
+
+    @classmethod
+    def mark_unhealthy(cls, alias: str) -> None:
+        with cls._lock:
+            cls._status[alias] = (False, time.monotonic())
+
+    @classmethod
+    def healthy_replicas(cls) -> List[str]:
+        return [alias for alias in settings.DATABASE_REPLICAS if cls.is_healthy(alias)]
+
+
+class ReplicaRouter:
+    """公開 API 的讀取走唯讀副本，其餘 (爬蟲、後台、寫入、migrate) 都走 primary
+
+    - 只有 ReplicaRoutingMiddleware 標記的請求會讀副本，同一個請求固定使用同一個副本
+    - 請求中有寫入，或在 atomic 區塊中時改讀 primary，避免讀不到自己剛寫入的資料
+    - 沒有可用的副本時讀 primary
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or not routing.use_replica or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        if routing.replica is None or (
+            routing.replica != DEFAULT_DB_ALIAS and not ReplicaHealth.is_healthy(routing.replica)
+        ):
+            replicas = ReplicaHealth.healthy_replicas()
+            routing.replica = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本與 primary 的資料相同
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
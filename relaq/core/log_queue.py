@@ -0,0 +1,68 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+
+class DroppingQueueHandler(QueueHandler):
+    """佇列已滿時丟棄 record，不讓寫檔變慢時反過來阻塞請求"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueueLogging:
+    """將 root logger 的 handler 移到背景執行緒
+
+    root logger 只保留一個 QueueHandler，請求執行緒只需把 record 放進佇列，
+    格式化後寫入檔案 / console 由 QueueListener 的執行緒以原本的 handler 處理。
+    fork 後子 process 沒有 listener 執行緒，會重新建立佇列與 listener。
+    """
+    _handler: Optional[DroppingQueueHandler] = None
+    _listener: Optional[QueueListener] = None
+    _handlers: List[logging.Handler] = []
+
+    @classmethod
+    def install(cls, max_size: int = 0) -> None:
+        """max_size 為 0 時佇列不限長度，否則超過時丟棄新的 record"""
+        if cls._handler is not None:
+            return
+
+        root = logging.getLogger()
+        cls._handlers = list(root.handlers)
+        cls._handler = DroppingQueueHandler(queue.Queue(max_size))
+
+        for handler in cls._handlers:
+            root.removeHandler(handler)
+        root.addHandler(cls._handler)
+
+        cls._start()
+        atexit.register(cls.stop)
+        os.register_at_fork(after_in_child=cls._restart_in_child)
+
+    @classmethod
+    def _start(cls) -> None:
+        cls._listener = QueueListener(cls._handler.queue, *cls._handlers, respect_handler_level=True)
+        cls._listener.start()
+
+    @classmethod
+    def _restart_in_child(cls) -> None:
+        # 父 process 的 listener 執行緒不會被複製，佇列也可能在 fork 時處於鎖定狀態
+        cls._handler.queue = queue.Queue(cls._handler.queue.maxsize)
+        cls._start()
+
+    @classmethod
+    def stop(cls) -> None:
+        """停止 listener，佇列中剩餘的 record 會先寫完"""
+        if cls._listener is not None:
+            cls._listener.stop()
+            cls._listener = None
@@ -0,0 +1,149 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.metrics import crawl_metrics
+from core.models import CrawlProvider
+from core.replay import (
+    ProviderFixtures,
+    ProviderRecorder,
+    ReplayChatGPTHelper,
+    ReplayFeloScraper,
+    ReplayGoogleMapHelper,
+    ReplayOutscraperHelper,
+    ReplayProfile,
+)
+from core.services import CoreService
+
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parents[2] / "fixtures" / "crawl_replay_sample.json"
+
+
+class Command(BaseCommand):
+    help = "以錄製的外部服務回應離線執行完整爬蟲流程，量測各階段耗時與每分鐘店家數"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "search_region",
+            type=str,
+            nargs="?",
+            default="臺北市",
+            help="搜尋區域",
+        )
+        parser.add_argument(
+            "--keyword",
+            type=str,
+            default="美甲",
+            help="搜尋關鍵字",
+        )
+        parser.add_argument(
+            "--shops",
+            type=int,
+            default=20,
+            help="處理的店家數量 (超過錄製數量時重複使用錄製的店家)",
+        )
+        parser.add_argument(
+            "--fixtures",
+            type=str,
+            default=str(DEFAULT_FIXTURES),
+            help="錄製檔路徑",
+        )
+        parser.add_argument(
+            "--record",
+            action="store_true",
+            help="呼叫實際的外部服務並將回應寫入錄製檔",
+        )
+        parser.add_argument(
+            "--latency-scale",
+            type=float,
+            default=0.01,
+            help="模擬延遲的倍率 (1 為實際延遲，0 為不等待)",
+        )
+        parser.add_argument(
+            "--failure-rate",
+            nargs="+",
+            default=[],
+            metavar="PROVIDER=RATE",
+            help=f"模擬失敗率，例如 FELO=0.1 OPENAI=0.05 ({', '.join(CrawlProvider.values)})",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="模擬延遲與失敗的亂數種子",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="保留寫入資料庫的店家 (預設執行完畢後 rollback)",
+        )
+
+    def _parse_failure_rates(self, values):
+        failure_rates = {}
+        for value in values:
+            provider, _, rate = value.partition("=")
+            if provider not in CrawlProvider.values or not rate:
+                raise CommandError(f"無效的失敗率設定: {value}")
+            failure_rates[provider] = float(rate)
+        return failure_rates
+
+    def _build_core_service(self, options):
+        if options["record"]:
+            recorder = ProviderRecorder()
+            core_service = CoreService(options["shops"], search_keyword=options["keyword"])
+            recorder.wrap_google(core_service.google_map_helper)
+            recorder.wrap_outscraper(core_service.outscraper_helper)
+            recorder.wrap_felo(core_service.felo_scraper)
+            recorder.wrap_chatgpt(core_service.chatgpt_helper)
+            return core_service, recorder
+
+        fixtures = ProviderFixtures.load(options["fixtures"])
+        profile = ReplayProfile(
+            latency_scale=options["latency_scale"],
+            failure_rates=self._parse_failure_rates(options["failure_rate"]),
+            seed=options["seed"],
+        )
+        core_service = CoreService(
+            options["shops"],
+            search_keyword=options["keyword"],
+            google_map_helper=ReplayGoogleMapHelper(fixtures, profile),
+            outscraper_helper=ReplayOutscraperHelper(fixtures, profile),
+            felo_scraper=ReplayFeloScraper(fixtures, profile),
+            chatgpt_helper=ReplayChatGPTHelper(fixtures, profile),
+        )
+        return core_service, None
+
+    def handle(self, *args, **options):
+        core_service, recorder = self._build_core_service(options)
+
+        with transaction.atomic():
+            core_service.main(search_region=options["search_region"])
+            report = crawl_metrics.report()
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        if recorder:
+            recorder.fixtures.save(options["fixtures"])
+            self.stdout.write(self.style.SUCCESS(f"錄製 {len(recorder.fixtures.entries)} 筆回應至 {options['fixtures']}"))
+
+        self.stdout.write(f"{'階段':<16} {'次數':>6} {'總秒數':>10} {'p50':>9} {'p95':>9} {'錯誤':>4}")
+        for stage, summary in report["stages"].items():
+            self.stdout.write(
+                f"{stage:<18} {summary['count']:>6} {summary['sum']:>10.2f} "
+                f"{summary['p50']:>9.3f} {summary['p95']:>9.3f} {summary['errors']:>4}"
+            )
+
+        for provider, summary in report["providers"].items():
+            latency = summary["latency"]
+            self.stdout.write(
+                f"{provider:<18} 呼叫 {latency.get('count', 0)} 次，"
+                f"平均 {latency.get('avg', 0.0):.3f} 秒，重試 {summary['retries']} 次"
+            )
+
+        shops = report["shops"]
+        self.stdout.write(
+            f"店家 {shops['succeeded']} 成功 / {shops['failed']} 失敗，"
+            f"共 {report['elapsed_seconds']:.1f} 秒，每分鐘 {shops['per_minute']:.1f} 間"
+        )
+        self.stdout.write(self.style.SUCCESS("爬蟲流程效能測試完成"))
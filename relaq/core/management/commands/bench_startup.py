@@ -0,0 +1,171 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import requests
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+GUNICORN_CONFIG = Path(settings.BASE_DIR) / "deploy" / "prod" / "gunicorn.conf.py"
+
+SERVERS = {
+    "gunicorn": ["gunicorn", "-c", str(GUNICORN_CONFIG), "relaq.wsgi"],
+    "uvicorn": [
+        "gunicorn", "-c", str(GUNICORN_CONFIG),
+        "--worker-class", "uvicorn.workers.UvicornWorker", "relaq.asgi",
+    ],
+    "runserver": [sys.executable, "manage.py", "runserver", "--noreload"],
+}
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_process_tree(pid: int) -> List[int]:
+    """master 與所有 worker 的 pid (只支援 Linux /proc)"""
+    pids = [pid]
+    for child_pid in pids:
+        children = Path(f"/proc/{child_pid}/task/{child_pid}/children")
+        if children.exists():
+            pids.extend(int(child) for child in children.read_text().split())
+    return pids
+
+
+def get_rss_mb(pid: int) -> float:
+    """Resident memory (MB)，preload 時 worker 共用的分頁會重複計算"""
+    status = Path(f"/proc/{pid}/status")
+    if not status.exists():
+        return 0.0
+    for line in status.read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class Command(BaseCommand):
+    help = "以正式環境設定啟動伺服器，量測啟動時間、記憶體用量，並以 benchmark_api 量測每個 CPU 的吞吐量"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--server",
+            choices=list(SERVERS),
+            default="gunicorn",
+            help="伺服器 (uvicorn 為 gunicorn + UvicornWorker 跑 ASGI)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="worker 數量，預設依 gunicorn.conf.py (CPU 數 * 2 + 1)",
+        )
+        parser.add_argument(
+            "--no-preload",
+            action="store_true",
+            help="關閉 preload_app 比較啟動時間與記憶體",
+        )
+        parser.add_argument(
+            "--scenarios",
+            nargs="+",
+            default=["shop", "homepage", "article_list"],
+            help="啟動後執行的 benchmark_api 情境，設定 none 只量測啟動",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="每個情境的請求數",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="同時送出的請求數，預設為 CPU 數 * 2",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="將吞吐量結果寫入 benchmarks/server_<server>.json 作為基準值",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="等待伺服器啟動的秒數",
+        )
+
+    def _wait_until_ready(self, process: subprocess.Popen, url: str, timeout: float) -> float:
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise CommandError(f"伺服器啟動失敗 (exit code {process.returncode})")
+            try:
+                requests.get(url, timeout=1)
+                return time.perf_counter() - start
+            except requests.RequestException:
+                time.sleep(0.05)
+        raise CommandError(f"伺服器 {timeout} 秒內沒有回應")
+
+    def handle(self, *args, **options):
+        port = get_free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        command = SERVERS[options["server"]] + (
+            [f"127.0.0.1:{port}"] if options["server"] == "runserver" else ["--bind", f"127.0.0.1:{port}"]
+        )
+
+        env = dict(os.environ, DEBUG="False", REQUEST_LOG_SAMPLE_RATE="0")
+        if options["workers"]:
+            env["GUNICORN_WORKERS"] = str(options["workers"])
+        if options["no_preload"]:
+            env["GUNICORN_PRELOAD"] = "False"
+
+        process = subprocess.Popen(
+            command,
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            startup = self._wait_until_ready(process, f"{base_url}/api/homepage/", options["timeout"])
+            first_request_start = time.perf_counter()
+            requests.get(f"{base_url}/api/homepage/", timeout=options["timeout"])
+            first_request = time.perf_counter() - first_request_start
+
+            pids = get_process_tree(process.pid)
+            workers = len(pids) - 1 if options["server"] != "runserver" else 1
+            rss = [get_rss_mb(pid) for pid in pids]
+            self.stdout.write(
+                f"{options['server']} 啟動 {startup:.2f} 秒，第一個請求 {first_request * 1000:.1f} ms，"
+                f"{workers} 個 worker，記憶體 {sum(rss):.0f} MB "
+                f"(master {rss[0]:.0f} MB，worker 平均 {sum(rss[1:]) / max(len(rss) - 1, 1):.0f} MB)"
+            )
+
+            if options["scenarios"] != ["none"]:
+                cpu_count = os.cpu_count() or 1
+                self.stdout.write(f"CPU {cpu_count} 個，吞吐量除以 CPU 數即為每個 CPU 的 rps")
+                call_command(
+                    "benchmark_api",
+                    url=base_url,
+                    scenarios=options["scenarios"],
+                    requests=options["requests"],
+                    concurrency=options["concurrency"] or cpu_count * 2,
+                    baseline=str(Path(settings.BASE_DIR) / "benchmarks" / f"server_{options['server']}.json"),
+                    save_baseline=options["save_baseline"],
+                    stdout=self.stdout,
+                )
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=30)
+
+        self.stdout.write(self.style.SUCCESS("伺服器啟動效能測試完成"))
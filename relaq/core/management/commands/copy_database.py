@@ -0,0 +1,118 @@
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.db import connections, transaction
+
+
+SOURCE_ALIAS = "copy_source"
+
+
+class Command(BaseCommand):
+    help = "將 SQLite 資料庫的資料批次複製到目前設定的資料庫 (例如 PostgreSQL)，目標資料庫需先執行 migrate"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            type=str,
+            default=str(Path(settings.BASE_DIR) / "db.sqlite3"),
+            help="來源 SQLite 檔案",
+        )
+        parser.add_argument(
+            "--database",
+            type=str,
+            default="default",
+            help="目標資料庫 alias",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="每次 bulk_create 的筆數",
+        )
+        parser.add_argument(
+            "--truncate",
+            action="store_true",
+            help="先清空目標資料表；目標已 migrate 時 contenttypes / permissions 會與來源衝突，通常需要指定",
+        )
+
+    def _get_models(self):
+        """依外鍵相依順序排列的所有 model (含 ManyToMany 的關聯表)"""
+        app_models = sort_dependencies(
+            [(app_config, None) for app_config in apps.get_app_configs()],
+            allow_cycles=True,
+        )
+        models = []
+        for model in app_models:
+            if model._meta.proxy or not model._meta.managed:
+                continue
+            models.append(model)
+            models.extend(
+                field.remote_field.through
+                for field in model._meta.local_many_to_many
+                if field.remote_field.through._meta.auto_created
+            )
+        return models
+
+    def _copy_model(self, model, target: str, batch_size: int) -> int:
+        queryset = model._base_manager.using(SOURCE_ALIAS).order_by("pk")
+        copied = 0
+        batch = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                model._base_manager.using(target).bulk_create(batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            model._base_manager.using(target).bulk_create(batch)
+            copied += len(batch)
+        return copied
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        target = options["database"]
+        if not source.exists():
+            raise CommandError(f"找不到來源資料庫 {source}")
+        if connections[target].vendor == "sqlite" and Path(connections[target].settings_dict["NAME"]) == source:
+            raise CommandError("來源與目標是同一個資料庫")
+
+        # 以 alias 動態加入來源資料庫，configure_settings 會補上其餘預設設定
+        connections.settings[SOURCE_ALIAS] = connections.configure_settings({
+            **connections.settings,
+            SOURCE_ALIAS: {"ENGINE": "django.db.backends.sqlite3", "NAME": str(source)},
+        })[SOURCE_ALIAS]
+
+        models = self._get_models()
+        start = time.perf_counter()
+        try:
+            with transaction.atomic(using=target):
+                if options["truncate"]:
+                    for model in reversed(models):
+                        model._base_manager.using(target).all()._raw_delete(target)
+
+                for model in models:
+                    model_start = time.perf_counter()
+                    copied = self._copy_model(model, target, options["batch_size"])
+                    if copied:
+                        self.stdout.write(
+                            f"{model._meta.label:<40} {copied:>8} 筆 "
+                            f"({time.perf_counter() - model_start:.1f} 秒)"
+                        )
+
+                # 明確指定主鍵寫入後，PostgreSQL 的 sequence 需要調整到最大值之後
+                sequence_sql = connections[target].ops.sequence_reset_sql(no_style(), models)
+                if sequence_sql:
+                    with connections[target].cursor() as cursor:
+                        for sql in sequence_sql:
+                            cursor.execute(sql)
+        finally:
+            connections[SOURCE_ALIAS].close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"複製 {len(models)} 個資料表完成，花費 {time.perf_counter() - start:.1f} 秒"
+        ))
@@ -0,0 +1,117 @@
+import time
+from itertools import product
+from typing import List
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from cms.constants import TAIWAN_LOCALITIES
+from cms.localities import resolve_city_codes
+from core.budget import ProviderBudget
+from core.queue import CrawlQueue
+
+
+class Command(BaseCommand):
+    help = "建立多個區域 × 關鍵字的抓取任務，並在外部服務的同時執行上限與每日額度內執行"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--regions",
+            nargs="*",
+            default=[],
+            help="搜尋區域，例如：臺北市大安區 新北市板橋區",
+        )
+        parser.add_argument(
+            "--cities",
+            nargs="*",
+            default=[],
+            help="展開為縣市內所有鄉鎮市區，可使用名稱或代碼，例如：臺北市 NWT",
+        )
+        parser.add_argument(
+            "--all-taiwan",
+            action="store_true",
+            help="展開為全台灣所有鄉鎮市區",
+        )
+        parser.add_argument(
+            "--keywords",
+            nargs="+",
+            default=["美甲"],
+            help="搜尋關鍵字",
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="已完成或失敗的區域搜尋重新執行 (每日更新新店家)",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=4,
+            help="worker process 數量",
+        )
+        parser.add_argument(
+            "--window-minutes",
+            type=int,
+            default=None,
+            help="執行時間上限 (分鐘)，時間到後不再領取新任務，未完成的任務留在佇列",
+        )
+        parser.add_argument(
+            "--enqueue-only",
+            action="store_true",
+            help="只建立任務，交由既有的 crawl_worker 執行",
+        )
+
+    def _build_regions(self, options) -> List[str]:
+        regions = list(options["regions"])
+
+        city_codes = list(TAIWAN_LOCALITIES) if options["all_taiwan"] else []
+        for city in options["cities"]:
+            codes = resolve_city_codes(city)
+            if not codes:
+                raise CommandError(f"找不到縣市: {city}")
+            city_codes.extend(codes)
+
+        for city_code in dict.fromkeys(city_codes):
+            locality = TAIWAN_LOCALITIES[city_code]
+            regions.extend(f"{locality['name']}{district}" for district in locality["districts"])
+
+        return list(dict.fromkeys(regions))
+
+    def handle(self, *args, **options):
+        regions = self._build_regions(options)
+        if not regions:
+            raise CommandError("請指定 --regions、--cities 或 --all-taiwan")
+
+        created = requeued = existing = 0
+        for region, keyword in product(regions, options["keywords"]):
+            if CrawlQueue.enqueue_region(region, keyword):
+                created += 1
+            elif options["refresh"] and CrawlQueue.requeue_region(region, keyword):
+                requeued += 1
+            else:
+                existing += 1
+
+        self.stdout.write(
+            f"區域 {len(regions)} 個 × 關鍵字 {len(options['keywords'])} 個："
+            f"新增 {created}、重新排入 {requeued}、已存在 {existing}"
+        )
+
+        if not options["enqueue_only"]:
+            start_time = time.time()
+            window_minutes = options["window_minutes"]
+            call_command(
+                "crawl_worker",
+                processes=options["processes"],
+                exit_when_empty=True,
+                max_seconds=window_minutes * 60 if window_minutes else None,
+            )
+            self.stdout.write(f"執行時間 {time.time() - start_time:.0f} 秒")
+
+        self.stdout.write(f"任務進度: {CrawlQueue.progress()}")
+        for provider, usage in ProviderBudget.usage_report().items():
+            self.stdout.write(
+                f"  {provider:<10} 執行中 {usage['running']}/{usage['concurrency']}"
+                f"  今日用量 {usage['used']}/{usage['quota']}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("抓取任務排程完成"))
@@ -0,0 +1,98 @@
+import os
+import signal
+import socket
+import time
+import logging
+from multiprocessing import Process
+from typing import Optional
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connections
+
+from core.metrics import crawl_metrics
+from core.queue import CrawlWorker
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "執行爬蟲任務佇列 worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="worker process 數量",
+        )
+        parser.add_argument(
+            "--exit-when-empty",
+            action="store_true",
+            help="佇列沒有任務時結束",
+        )
+        parser.add_argument(
+            "--max-seconds",
+            type=int,
+            default=None,
+            help="執行超過指定秒數後不再領取新任務 (執行中的任務會完成)",
+        )
+
+    def handle(self, *args, **options):
+        processes = options.get("processes")
+        exit_when_empty = options.get("exit_when_empty")
+        max_seconds = options.get("max_seconds")
+        deadline = time.time() + max_seconds if max_seconds else None
+
+        if processes <= 1:
+            self.run_worker(exit_when_empty, deadline)
+            return None
+
+        # fork 前關閉連線，避免子 process 共用同一條 DB 連線
+        connections.close_all()
+        workers = [
+            Process(target=self.run_worker, args=(exit_when_empty, deadline))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.stdout.write(self.style.SUCCESS("爬蟲 worker 結束"))
+        return None
+
+    def run_worker(self, exit_when_empty: bool, deadline: Optional[float] = None) -> None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        worker = CrawlWorker(worker_id)
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            logger.info(f"[Worker] {worker_id} 收到停止訊號，執行完目前任務後結束")
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        # 每個 process 各自輸出報告，fork 前累積的指標不計入
+        crawl_metrics.reset()
+        metrics_name = f"crawl_worker_{socket.gethostname()}_{os.getpid()}"
+
+        logger.info(f"[Worker] {worker_id} 開始")
+        while not stopping:
+            if deadline and time.time() >= deadline:
+                logger.info(f"[Worker] {worker_id} 已達執行時間上限")
+                break
+            if worker.run_once():
+                crawl_metrics.write_prometheus(metrics_name)
+                continue
+            # 任務可能只是暫時受外部服務同時執行上限限制，或由執行中的任務產生後續階段
+            if exit_when_empty and not worker.queue.has_available_work():
+                break
+            time.sleep(settings.CRAWL_WORKER_POLL_SECONDS)
+
+        report_path = crawl_metrics.write_report(crawl_metrics.report_name(metrics_name))
+        crawl_metrics.write_prometheus(metrics_name)
+        logger.info(f"[Worker] {worker_id} 結束，執行報告: {report_path}")
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from core.services import CoreService
+from core.queue import CrawlQueue
 
 
 class Command(BaseCommand):
@@ -13,11 +14,32 @@ class Command(BaseCommand):
             type=str,
             help="搜尋區域",
         )
+        parser.add_argument(
+            "--queue",
+            action="store_true",
+            help="只建立佇列任務，交由 crawl_worker 執行",
+        )
+        parser.add_argument(
+            "--keyword",
+            type=str,
+            default="美甲",
+            help="搜尋關鍵字",
+        )
 
     def handle(self, *args, **options):
         search_region = options.get("search_region")
-
-        core_service = CoreService(settings.CATCH_LIMIT)
+        keyword = options.get("keyword")
+
+        if options.get("queue"):
+            task = CrawlQueue.enqueue_region(search_region, keyword)
+            if task:
+                self.stdout.write(self.style.SUCCESS(f"[{search_region}] 已建立抓取任務"))
+            else:
+                self.stdout.write(self.style.WARNING(f"[{search_region}] 抓取任務已存在"))
+            self.stdout.write(f"任務進度: {CrawlQueue.progress(search_region)}")
+            return None
+
+        core_service = CoreService(settings.CATCH_LIMIT, search_keyword=keyword)
         core_service.main(search_region=search_region)
 
         self.stdout.write(self.style.SUCCESS(f"[{search_region}] 抓取店家資料完成!"))
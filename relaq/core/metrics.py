@@ -0,0 +1,665 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+
+# 秒，涵蓋 API 回應 (毫秒級) 到 Felo / Outscraper 等待 (分鐘級)
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 120, 300,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """以標籤區分多條時間序列的指標，同一個 process 內的執行緒共用"""
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.series: Dict[LabelKey, object] = {}
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.series.clear()
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+        with self._lock:
+            for key, value in sorted(self.series.items()):
+                lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: LabelKey, value) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}"]
+
+    def dump(self) -> List[list]:
+        """可序列化為 JSON 的時間序列 [[標籤, 值], ...]，供跨 process 合併"""
+        with self._lock:
+            return [[list(key), self._dump_value(value)] for key, value in self.series.items()]
+
+    def merge(self, rows: List[list]) -> None:
+        """合併其他 process 以 dump() 輸出的時間序列"""
+        with self._lock:
+            for labels, value in rows:
+                key = tuple(tuple(pair) for pair in labels)
+                self.series[key] = self._merge_value(self.series.get(key), value)
+
+    @staticmethod
+    def _dump_value(value):
+        return value
+
+    @staticmethod
+    def _merge_value(current, value):
+        return (current or 0) + value
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self.series[key] = self.series.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        return self.series.get(_label_key(labels), 0)
+
+    def values(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self.series)
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self.series[_label_key(labels)] = value
+
+    def dec(self, value: float = 1, **labels) -> None:
+        self.inc(-value, **labels)
+
+
+class HistogramSeries:
+    """單一時間序列的直方圖，區間與 Prometheus histogram 相同 (上界累積)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, upper in enumerate(self.buckets):
+            if value <= upper:
+                break
+        else:
+            index = len(self.buckets)
+
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """以區間內線性內插估計分位數 (與 Prometheus histogram_quantile 相同)"""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, bucket_count in zip(self.buckets, self.bucket_counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                estimate = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return min(estimate, self.max)
+            cumulative += bucket_count
+            lower = upper
+        # 落在最後一個 (+Inf) 區間時只能以最大值表示
+        return self.max
+
+    def dump(self) -> list:
+        return [self.bucket_counts, self.count, self.sum, self.max]
+
+    def merge(self, bucket_counts: List[int], count: int, total: float, maximum: float) -> None:
+        self.bucket_counts = [a + b for a, b in zip(self.bucket_counts, bucket_counts)]
+        self.count += count
+        self.sum += total
+        self.max = max(self.max, maximum)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+        }
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = HistogramSeries(self.buckets)
+            series.observe(value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def _dump_value(series: HistogramSeries) -> list:
+        return series.dump()
+
+    def _merge_value(self, current: Optional[HistogramSeries], value: list) -> HistogramSeries:
+        series = current or HistogramSeries(self.buckets)
+        series.merge(*value)
+        return series
+
+    def summaries(self) -> Dict[LabelKey, Dict[str, float]]:
+        with self._lock:
+            return {key: series.summary() for key, series in self.series.items()}
+
+    def _render_series(self, key: LabelKey, series: HistogramSeries) -> List[str]:
+        lines = []
+        cumulative = 0
+        for upper, bucket_count in zip(self.buckets + (float("inf"),), series.bucket_counts):
+            cumulative += bucket_count
+            lines.append(
+                f"{self.name}_bucket{_format_labels(key, ('le', _format_value(float(upper))))} {cumulative}"
+            )
+        lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """一組指標，可輸出為 Prometheus 文字格式"""
+
+    def __init__(self, namespace: str = "relaq"):
+        self.namespace = namespace
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, documentation: str, **kwargs) -> Metric:
+        name = f"{self.namespace}_{name}"
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_class(name, documentation, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter, name, documentation)
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge, name, documentation)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, buckets=buckets)
+
+    def clear(self) -> None:
+        for metric in self.metrics.values():
+            metric.clear()
+
+    def dump(self) -> Dict[str, List[list]]:
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+    def merge(self, data: Dict[str, List[list]], include_gauges: bool = True) -> None:
+        """合併其他 process 的 dump()，已結束的 process 不計入 gauge (例如處理中的請求數)"""
+        for name, rows in data.items():
+            metric = self.metrics.get(name)
+            if metric is None or (isinstance(metric, Gauge) and not include_gauges):
+                continue
+            metric.merge(rows)
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def write_file_atomic(path: str, content: str) -> None:
+    """先寫入暫存檔再替換，避免 node_exporter textfile collector 讀到寫到一半的檔案"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+# 目前執行中的店家，讓 Google / OpenAI 等 helper 記錄的用量可以歸到店家
+_current_shop: ContextVar[Optional[str]] = ContextVar("crawl_current_shop", default=None)
+
+
+class CrawlMetrics:
+    """爬蟲流程的各階段耗時、外部服務用量與 LLM 費用
+
+    - 各階段 (SEARCH / PRICE_AND_SERVICE / ... / SAVE) 的延遲直方圖與成功 / 失敗次數
+    - 各外部服務的呼叫延遲、重試次數與下載位元組數
+    - LLM prompt / completion token 數與依 settings.LLM_TOKEN_PRICES 換算的費用
+    - 每間店家各階段耗時、token 與費用
+
+    helper 透過模組層級的 crawl_metrics 記錄，不需要另外傳遞；
+    執行結束後以 report() 取得 JSON 報告，或以 render_prometheus() 輸出 Prometheus 指標。
+    """
+    # 長時間執行的 worker 只保留最近的店家明細
+    MAX_SHOP_RECORDS = 5000
+
+    def __init__(self):
+        self.registry = MetricsRegistry(namespace="relaq_crawl")
+        self.stage_seconds = self.registry.histogram("stage_duration_seconds", "各階段執行時間 (秒)")
+        self.stage_total = self.registry.counter("stage_total", "各階段執行次數")
+        self.checkpoint_hits = self.registry.counter("checkpoint_hits_total", "沿用 checkpoint 略過的階段次數")
+        self.provider_seconds = self.registry.histogram("provider_request_duration_seconds", "外部服務呼叫時間 (秒)")
+        self.provider_retries = self.registry.counter("provider_retries_total", "外部服務重試次數")
+        self.provider_bytes = self.registry.counter("provider_downloaded_bytes_total", "自外部服務下載的位元組數")
+        self.llm_tokens = self.registry.counter("llm_tokens_total", "LLM token 用量")
+        self.llm_cost = self.registry.counter("llm_cost_usd_total", "LLM 費用 (美元)")
+        self.shops_total = self.registry.counter("shops_total", "處理完成的店家數")
+        self.reset()
+
+    def reset(self) -> None:
+        self.registry.clear()
+        self.started_at = timezone.now()
+        self.started_perf = time.perf_counter()
+        self.shops: "OrderedDict[str, Dict]" = OrderedDict()
+        self._shops_lock = threading.Lock()
+
+    def _shop_record(self, shop_key: str, shop_name: str = "") -> Dict:
+        with self._shops_lock:
+            record = self.shops.get(shop_key)
+            if record is None:
+                record = self.shops[shop_key] = {
+                    "name": shop_name or shop_key,
+                    "stages": {},
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cost_usd": 0.0,
+                    "success": None,
+                }
+                while len(self.shops) > self.MAX_SHOP_RECORDS:
+                    self.shops.popitem(last=False)
+            elif shop_name:
+                record["name"] = shop_name
+            return record
+
+    @contextmanager
+    def stage(self, stage: str, shop_key: Optional[str] = None, shop_name: str = "") -> Iterator[None]:
+        """記錄一個階段的執行時間，店家階段同時記錄到該店家的明細"""
+        token = _current_shop.set(shop_key)
+        status = "error"
+        start = time.perf_counter()
+        try:
+            yield
+            status = "ok"
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_shop.reset(token)
+            self.stage_seconds.observe(elapsed, stage=stage)
+            self.stage_total.inc(stage=stage, status=status)
+            if shop_key:
+                stages = self._shop_record(shop_key, shop_name)["stages"]
+                stages[stage] = round(stages.get(stage, 0) + elapsed, 6)
+
+    def checkpoint_hit(self, stage: str) -> None:
+        self.checkpoint_hits.inc(stage=stage)
+
+    @contextmanager
+    def request(self, provider: str) -> Iterator[None]:
+        """記錄一次外部服務呼叫的時間"""
+        with self.provider_seconds.time(provider=provider):
+            yield
+
+    def retry(self, provider: str) -> None:
+        self.provider_retries.inc(provider=provider)
+
+    def downloaded(self, provider: str, size: int) -> None:
+        self.provider_bytes.inc(size, provider=provider)
+
+    def llm_usage(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """記錄一次 LLM 呼叫的 token 用量，回傳換算的費用 (美元)"""
+        prompt_price, completion_price = settings.LLM_TOKEN_PRICES.get(model, (0.0, 0.0))
+        cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+        self.llm_tokens.inc(prompt_tokens, model=model, kind="prompt")
+        self.llm_tokens.inc(completion_tokens, model=model, kind="completion")
+        self.llm_cost.inc(cost, model=model)
+
+        shop_key = _current_shop.get()
+        if shop_key:
+            record = self._shop_record(shop_key)
+            with self._shops_lock:
+                record["prompt_tokens"] += prompt_tokens
+                record["completion_tokens"] += completion_tokens
+                record["cost_usd"] = round(record["cost_usd"] + cost, 6)
+        return cost
+
+    def shop_done(self, shop_key: str, success: bool, shop_name: str = "") -> None:
+        self._shop_record(shop_key, shop_name)["success"] = success
+        self.shops_total.inc(status="ok" if success else "error")
+
+    @staticmethod
+    def _by_label(values: Dict[LabelKey, object], label: str) -> Dict[str, Dict[LabelKey, object]]:
+        grouped: Dict[str, Dict[LabelKey, object]] = {}
+        for key, value in values.items():
+            labels = dict(key)
+            grouped.setdefault(labels.pop(label), {})[tuple(sorted(labels.items()))] = value
+        return grouped
+
+    def report(self) -> Dict:
+        """本次執行的 JSON 報告"""
+        elapsed = time.perf_counter() - self.started_perf
+        stage_totals = self._by_label(self.stage_total.values(), "stage")
+        checkpoint_hits = self._by_label(self.checkpoint_hits.values(), "stage")
+        stages = {
+            dict(key)["stage"]: {
+                **summary,
+                "errors": int(stage_totals.get(dict(key)["stage"], {}).get((("status", "error"),), 0)),
+                "checkpoint_hits": int(checkpoint_hits.get(dict(key)["stage"], {}).get((), 0)),
+            }
+            for key, summary in self.stage_seconds.summaries().items()
+        }
+
+        latencies = self._by_label(self.provider_seconds.summaries(), "provider")
+        retries = self._by_label(self.provider_retries.values(), "provider")
+        downloaded = self._by_label(self.provider_bytes.values(), "provider")
+        providers = {
+            provider: {
+                "latency": latencies.get(provider, {}).get((), {}),
+                "retries": int(retries.get(provider, {}).get((), 0)),
+                "downloaded_bytes": int(downloaded.get(provider, {}).get((), 0)),
+            }
+            for provider in sorted(set(latencies) | set(retries) | set(downloaded))
+        }
+
+        tokens = self._by_label(self.llm_tokens.values(), "model")
+        costs = self._by_label(self.llm_cost.values(), "model")
+        llm = {
+            model: {
+                "prompt_tokens": int(tokens[model].get((("kind", "prompt"),), 0)),
+                "completion_tokens": int(tokens[model].get((("kind", "completion"),), 0)),
+                "cost_usd": round(costs.get(model, {}).get((), 0.0), 6),
+            }
+            for model in sorted(tokens)
+        }
+
+        shops_total = self._by_label(self.shops_total.values(), "status")
+        succeeded = int(shops_total.get("ok", {}).get((), 0))
+        failed = int(shops_total.get("error", {}).get((), 0))
+
+        return {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": timezone.now().isoformat(),
+            "elapsed_seconds": round(elapsed, 3),
+            "shops": {
+                "succeeded": succeeded,
+                "failed": failed,
+                "per_minute": round((succeeded + failed) / elapsed * 60, 3) if elapsed else 0.0,
+            },
+            "stages": stages,
+            "providers": providers,
+            "llm": llm,
+            "llm_cost_usd": round(sum(model["cost_usd"] for model in llm.values()), 6),
+            "shop_details": self._shop_details(),
+        }
+
+    def _shop_details(self) -> List[Dict]:
+        with self._shops_lock:
+            return [dict(record, stages=dict(record["stages"])) for record in self.shops.values()]
+
+    def render_prometheus(self) -> str:
+        return self.registry.render_prometheus()
+
+    def write_report(self, name: str) -> str:
+        """將 JSON 報告寫入 settings.CRAWL_METRICS_REPORT_DIR，回傳檔案路徑"""
+        path = os.path.join(settings.CRAWL_METRICS_REPORT_DIR, f"{name}.json")
+        write_file_atomic(path, json.dumps(self.report(), ensure_ascii=False, indent=2))
+        return path
+
+    def write_prometheus(self, name: str) -> Optional[str]:
+        """有設定 settings.CRAWL_METRICS_PROMETHEUS_DIR 時寫入 textfile collector 使用的 .prom 檔"""
+        if not settings.CRAWL_METRICS_PROMETHEUS_DIR:
+            return None
+
+        path = os.path.join(settings.CRAWL_METRICS_PROMETHEUS_DIR, f"{name}.prom")
+        write_file_atomic(path, self.render_prometheus())
+        return path
+
+    @staticmethod
+    def report_name(prefix: str) -> str:
+        return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+crawl_metrics = CrawlMetrics()
+
+
+class ApiMetrics:
+    """API 各路由的延遲、狀態碼、資料庫查詢與記憶體快取命中率
+
+    路由以解析後的 view name (例如 cms:shop_list) 區分，避免路徑參數造成標籤數量暴增。
+    指標累積在各自的 process 中；設定 settings.API_METRICS_DIR 時，每個 worker process
+    定期將指標寫入該目錄 (api_<pid>.json)，/metrics 合併所有 worker 後輸出，
+    不論請求由哪個 worker 處理都能取得完整的數量。
+    已結束的 worker 的 counter 與 histogram 併入 api_dead.json 後刪除其檔案，
+    檔案數量不會隨 worker 重啟增加，PID 被重複使用時也不會覆寫舊 worker 的數量。
+    """
+    QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+    SNAPSHOT_PREFIX = "api_"
+    DEAD_SNAPSHOT = "api_dead.json"
+    LOCK_FILE = "api.lock"
+
+    def __init__(self):
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_at = 0.0
+        # 寫入過快照的 PID，尚未寫入或 fork 後與目前的 PID 不同
+        self._snapshot_pid: Optional[int] = None
+        self.registry = MetricsRegistry(namespace="relaq_http")
+        self.request_seconds = self.registry.histogram("request_duration_seconds", "請求處理時間 (秒)")
+        self.requests_total = self.registry.counter("requests_total", "請求數量")
+        self.in_flight = self.registry.gauge("requests_in_flight", "處理中的請求數量")
+        self.db_queries = self.registry.histogram(
+            "db_queries_per_request",
+            "每個請求執行的 SQL 數量",
+            buckets=self.QUERY_COUNT_BUCKETS,
+        )
+        self.db_seconds = self.registry.histogram("db_duration_seconds", "每個請求的 SQL 執行時間 (秒)")
+        self.cache_lookups = self.registry.counter("cache_lookups_total", "記憶體快取查詢次數")
+        self.cache_hit_ratio = self.registry.gauge("cache_hit_ratio", "記憶體快取命中率")
+
+    def observe_request(
+        self,
+        route: str,
+        method: str,
+        status: int,
+        seconds: float,
+        query_count: int,
+        query_seconds: float,
+    ) -> None:
+        self.request_seconds.observe(seconds, route=route, method=method)
+        self.requests_total.inc(route=route, method=method, status=status)
+        self.db_queries.observe(query_count, route=route)
+        self.db_seconds.observe(query_seconds, route=route)
+
+        if time.monotonic() - self._snapshot_at >= settings.API_METRICS_WRITE_INTERVAL_SECONDS:
+            self.write_snapshot()
+
+    def cache_lookup(self, cache: str, hit: bool) -> None:
+        self.cache_lookups.inc(cache=cache, result="hit" if hit else "miss")
+
+    def render_prometheus(self) -> str:
+        if not settings.API_METRICS_DIR:
+            return self._render()
+
+        # 目前的 process 先寫入最新的指標，再合併所有 worker
+        self.write_snapshot(force=True)
+        merged = ApiMetrics()
+        with self._dir_lock():
+            self._fold_dead_snapshots()
+            dead_path = os.path.join(settings.API_METRICS_DIR, self.DEAD_SNAPSHOT)
+            if os.path.exists(dead_path):
+                merged.registry.merge(self._load(dead_path), include_gauges=False)
+            for pid, data in self.read_snapshots():
+                merged.registry.merge(data, include_gauges=self._is_alive(pid))
+        return merged._render()
+
+    def _render(self) -> str:
+        lookups = self._lookups_by_cache()
+        for cache, (hits, misses) in lookups.items():
+            self.cache_hit_ratio.set(hits / (hits + misses), cache=cache)
+        return self.registry.render_prometheus()
+
+    def write_snapshot(self, force: bool = False) -> None:
+        """將目前 process 的指標寫入 settings.API_METRICS_DIR，其他執行緒正在寫入時略過"""
+        if not settings.API_METRICS_DIR:
+            return
+        if not self._snapshot_lock.acquire(blocking=force):
+            return
+
+        try:
+            self._snapshot_at = time.monotonic()
+            if self._snapshot_pid != os.getpid():
+                # 第一次寫入前，先併入使用相同 PID 的舊 worker 留下的檔案
+                with self._dir_lock():
+                    self._fold_dead_snapshots()
+                self._snapshot_pid = os.getpid()
+            path = os.path.join(settings.API_METRICS_DIR, f"{self.SNAPSHOT_PREFIX}{os.getpid()}.json")
+            write_file_atomic(path, json.dumps(self.registry.dump()))
+        finally:
+            self._snapshot_lock.release()
+
+    def read_snapshots(self) -> Iterator[Tuple[int, Dict[str, List[list]]]]:
+        """各 worker 的 (pid, 指標)，不含已併入 api_dead.json 的 worker"""
+        for filename in sorted(os.listdir(settings.API_METRICS_DIR)):
+            pid = filename[len(self.SNAPSHOT_PREFIX):-len(".json")]
+            if not filename.startswith(self.SNAPSHOT_PREFIX) or not filename.endswith(".json") or not pid.isdigit():
+                continue
+            try:
+                yield int(pid), self._load(os.path.join(settings.API_METRICS_DIR, filename))
+            except FileNotFoundError:
+                # 其他 process 剛將它併入 api_dead.json
+                continue
+
+    def _fold_dead_snapshots(self) -> None:
+        """將已結束 worker 的 counter 與 histogram 併入 api_dead.json 並刪除其檔案 (需持有目錄鎖)
+
+        尚未寫入過快照的 process 也會併入自己 PID 的檔案，那是之前使用同一個 PID 的 worker 留下的。
+        """
+        dead_pids = [
+            pid for pid, _ in self.read_snapshots()
+            if not self._is_alive(pid) or (pid == os.getpid() and self._snapshot_pid != pid)
+        ]
+        if not dead_pids:
+            return
+
+        dead = ApiMetrics()
+        dead_path = os.path.join(settings.API_METRICS_DIR, self.DEAD_SNAPSHOT)
+        if os.path.exists(dead_path):
+            dead.registry.merge(self._load(dead_path), include_gauges=False)
+        paths = [os.path.join(settings.API_METRICS_DIR, f"{self.SNAPSHOT_PREFIX}{pid}.json") for pid in dead_pids]
+        for path in paths:
+            dead.registry.merge(self._load(path), include_gauges=False)
+
+        write_file_atomic(dead_path, json.dumps(dead.registry.dump()))
+        for path in paths:
+            os.remove(path)
+
+    @contextmanager
+    def _dir_lock(self) -> Iterator[None]:
+        """跨 process 的目錄鎖，避免多個 worker 同時併入已結束 worker 的檔案"""
+        os.makedirs(settings.API_METRICS_DIR, exist_ok=True)
+        with open(os.path.join(settings.API_METRICS_DIR, self.LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, List[list]]:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _lookups_by_cache(self) -> Dict[str, Tuple[float, float]]:
+        lookups: Dict[str, Tuple[float, float]] = {}
+        for key, value in self.cache_lookups.values().items():
+            labels = dict(key)
+            hits, misses = lookups.get(labels["cache"], (0, 0))
+            if labels["result"] == "hit":
+                hits += value
+            else:
+                misses += value
+            lookups[labels["cache"]] = (hits, misses)
+        return lookups
+
+
+api_metrics = ApiMetrics()
@@ -0,0 +1,95 @@
+import logging
+from typing import Callable, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.http import HttpRequest, HttpResponse
+
+from core.db_routers import (
+    ReplicaHealth,
+    ReplicaRouting,
+    get_replica_routing,
+    reset_replica_routing,
+    set_replica_routing,
+)
+
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "db_primary"
+
+
+class ReplicaRoutingMiddleware:
+    """標記哪些請求可以讀唯讀副本 (core.db_routers.ReplicaRouter)
+
+    - 只有 settings.DATABASE_REPLICA_APPS 中的 view (cms 公開 API) 讀副本
+    - 請求中有寫入 (例如後台儲存) 時回應帶 db_primary cookie，
+      REPLICA_STICKY_SECONDS 秒內同一個瀏覽器的請求都讀 primary，避免讀到副本尚未同步的舊資料
+    - 副本查詢失敗時標記為不可用，並以 primary 重新執行一次 (cms API 都是唯讀)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = set_replica_routing(ReplicaRouting())
+        try:
+            return self.set_sticky_cookie(self.get_response(request))
+        finally:
+            reset_replica_routing(token)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        token = set_replica_routing(ReplicaRouting())
+        try:
+            return self.set_sticky_cookie(await self.get_response(request))
+        finally:
+            reset_replica_routing(token)
+
+    def process_view(self, request: HttpRequest, view_func, view_args, view_kwargs) -> None:
+        routing = get_replica_routing()
+        resolver_match = request.resolver_match
+        routing.use_replica = (
+            resolver_match.app_name in settings.DATABASE_REPLICA_APPS
+            and STICKY_COOKIE not in request.COOKIES
+        )
+        return None
+
+    def process_exception(self, request: HttpRequest, exception: Exception) -> Optional[HttpResponse]:
+        routing = get_replica_routing()
+        if not isinstance(exception, DatabaseError) or routing is None \
+                or routing.replica in (None, DEFAULT_DB_ALIAS):
+            return None
+
+        logger.warning(f"[DB] 副本 {routing.replica} 查詢失敗，改用 primary 重試 {request.path}: {exception}")
+        ReplicaHealth.mark_unhealthy(routing.replica)
+
+        resolver_match = request.resolver_match
+        if iscoroutinefunction(resolver_match.func):
+            # async view 無法在這裡重新執行，之後的請求會因為標記不可用而讀 primary
+            return None
+
+        routing.use_replica = False
+        return resolver_match.func(request, *resolver_match.args, **resolver_match.kwargs)
+
+    def set_sticky_cookie(self, response: HttpResponse) -> HttpResponse:
+        routing = get_replica_routing()
+        if routing is not None and routing.wrote:
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,104 @@
+import time
+from contextlib import ExitStack
+from typing import Callable
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from core.metrics import api_metrics
+
+
+class QueryTimer:
+    """以 execute_wrapper 累計一個請求中的 SQL 數量與時間"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def install_execute_wrapper(stack: ExitStack, wrapper: Callable) -> None:
+    """在目前執行緒的所有資料庫連線上掛上 execute_wrapper
+
+    ASGI 下 ORM 在 sync_to_async 的執行緒中執行 (同一個請求共用一條執行緒)，
+    async middleware 需以 sync_to_async 呼叫這裡，才會掛在實際執行 SQL 的連線上。
+    """
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+class MetricsMiddleware:
+    """記錄每個請求的延遲、狀態碼與 SQL 數量 / 時間，由 /metrics 輸出"""
+
+    UNMATCHED_ROUTE = "<unmatched>"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @classmethod
+    def get_route(cls, request: HttpRequest) -> str:
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is None:
+            return cls.UNMATCHED_ROUTE
+        return resolver_match.view_name or resolver_match.route or cls.UNMATCHED_ROUTE
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        query_timer = QueryTimer()
+        status = 500
+        api_metrics.in_flight.inc()
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                install_execute_wrapper(stack, query_timer)
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            self._observe(request, status, start, query_timer)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        query_timer = QueryTimer()
+        status = 500
+        api_metrics.in_flight.inc()
+        start = time.perf_counter()
+
+        stack = ExitStack()
+        try:
+            await sync_to_async(install_execute_wrapper)(stack, query_timer)
+            response = await self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            await sync_to_async(stack.close)()
+            self._observe(request, status, start, query_timer)
+
+    def _observe(self, request: HttpRequest, status: int, start: float, query_timer: QueryTimer) -> None:
+        api_metrics.in_flight.dec()
+        api_metrics.observe_request(
+            route=self.get_route(request),
+            method=request.method,
+            status=status,
+            seconds=time.perf_counter() - start,
+            query_count=query_timer.count,
+            query_seconds=query_timer.seconds,
+        )
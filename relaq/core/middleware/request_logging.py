@@ -1,7 +1,10 @@
 import time
+import random
 import logging
 from typing import Callable
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.http import HttpRequest, HttpResponse
 
 
@@ -9,32 +12,89 @@ logger = logging.getLogger(__name__)
 
 
 class RequestLoggingMiddleware:
+    """記錄請求與回應
+
+    - 只讀取 settings.REQUEST_LOG_BODY_CONTENT_TYPES 中的小型 body，並截斷到
+      REQUEST_LOG_BODY_MAX_BYTES；檔案上傳 (multipart) 等其他內容只記錄長度，不會整個讀進記憶體
+    - 依 REQUEST_LOG_SAMPLE_RATE 抽樣記錄，錯誤 (4xx / 5xx) 與超過 REQUEST_LOG_SLOW_SECONDS 的請求一律記錄
+    - 請求與回應合併為一筆 log
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response: Callable):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def get_body_preview(request: HttpRequest) -> str:
+        max_bytes = settings.REQUEST_LOG_BODY_MAX_BYTES
+        content_type = request.content_type or ""
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+
+        if not content_length:
+            return ""
+        if max_bytes <= 0 or not content_type.startswith(settings.REQUEST_LOG_BODY_CONTENT_TYPES):
+            return f"<{content_type or 'unknown'} {content_length} bytes>"
+        if content_length > settings.REQUEST_LOG_BODY_READ_MAX_BYTES:
+            # 太大的 body 不在這裡讀取，交給 view 自行串流處理
+            return f"<{content_type} {content_length} bytes>"
+
+        body = request.body[:max_bytes].decode(errors="replace")
+        if content_length > max_bytes:
+            body += f"...<{content_length} bytes>"
+        return body
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        # Start timing
-        start_time = time.time()
-
-        # Log request
-        logger.info(
-            f"[Request] {request.method} {request.path} "
-            f"Query Params: {dict(request.GET.items())} "
-            f"Body: {request.body.decode() if request.body else ''}"
-        )
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        sampled = random.random() < settings.REQUEST_LOG_SAMPLE_RATE
+        # body 需要在 view 讀取前取得 (view 讀取串流後 request.body 無法再使用)
+        body = self.get_body_preview(request) if sampled else ""
 
-        # Get response
+        start_time = time.perf_counter()
         response = self.get_response(request)
+        return self.log_response(request, response, body, sampled, time.perf_counter() - start_time)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        sampled = random.random() < settings.REQUEST_LOG_SAMPLE_RATE
+        body = self.get_body_preview(request) if sampled else ""
+
+        start_time = time.perf_counter()
+        response = await self.get_response(request)
+        return self.log_response(request, response, body, sampled, time.perf_counter() - start_time)
+
+    def log_response(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        body: str,
+        sampled: bool,
+        execution_time: float,
+    ) -> HttpResponse:
+        is_error = response.status_code >= 400
+        is_slow = execution_time >= settings.REQUEST_LOG_SLOW_SECONDS
+        if not (sampled or is_error or is_slow):
+            return response
 
-        # Calculate execution time
-        execution_time = time.time() - start_time
+        if not sampled:
+            body = "<not sampled>"
 
-        # Log response
-        logger.info(
-            f"[Response] {request.method} {request.path} "
-            f"Status: {response.status_code} "
-            f"Time: {execution_time:.2f}s "
-            f"Content-Type: {response.get('Content-Type', '')}"
+        logger.log(
+            logging.WARNING if is_slow else logging.INFO,
+            "[Request] %s %s Query Params: %s Body: %s Status: %s Time: %.3fs Content-Type: %s",
+            request.method,
+            request.path,
+            dict(request.GET.items()),
+            body,
+            response.status_code,
+            execution_time,
+            response.get("Content-Type", ""),
         )
 
-        return response 
\ No newline at end of file
+        return response
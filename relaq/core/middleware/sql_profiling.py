@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import random
+import logging
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-SQL"
+SUMMARY_HEADER = "X-SQL-Profile"
+MIDDLEWARE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+@dataclass
+class ProfiledQuery:
+    alias: str
+    sql: str
+    params: Optional[tuple]
+    seconds: float
+    origin: str
+
+
+class SqlProfiler:
+    """以 execute_wrapper 記錄單一請求的每一筆 SQL
+
+    記錄執行時間、呼叫位置 (專案內最後一個 frame) 與重複查詢：
+    - duplicate: SQL 與參數都相同，通常可以重複利用結果
+    - similar: SQL 相同但參數不同，通常是迴圈內逐筆查詢 (N+1)
+    """
+
+    def __init__(self, alias: str, max_queries: int):
+        self.alias = alias
+        self.max_queries = max_queries
+        self.queries: List[ProfiledQuery] = []
+        self.dropped = 0
+
+    @staticmethod
+    def get_origin() -> str:
+        """由內往外找第一個專案內的 frame (略過 middleware 與第三方套件)"""
+        project_dir = str(settings.BASE_DIR) + os.sep
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(project_dir) and not filename.startswith(MIDDLEWARE_DIR) \
+                    and "site-packages" not in filename:
+                return f"{filename[len(project_dir):]}:{frame.f_lineno} {frame.f_code.co_name}"
+            frame = frame.f_back
+        return "<unknown>"
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < self.max_queries:
+                self.queries.append(ProfiledQuery(
+                    alias=self.alias,
+                    sql=sql,
+                    params=None if many else tuple(params or ()),
+                    seconds=time.perf_counter() - start,
+                    origin=self.get_origin(),
+                ))
+            else:
+                self.dropped += 1
+
+
+class SqlProfilingMiddleware:
+    """逐請求的 SQL 分析 (預設關閉)
+
+    啟用方式：
+    - 帶 X-Profile-SQL header，值需等於 settings.SQL_PROFILE_TOKEN (未設定 token 時僅 DEBUG 可用)
+    - 或依 settings.SQL_PROFILE_SAMPLE_RATE 抽樣 (正式環境可設定小比例)
+
+    以 header 啟用的請求，回應會帶 X-SQL-Profile header (查詢數、總時間、重複數、最慢的查詢)，
+    抽樣的請求只寫入 log，避免對一般使用者揭露程式位置。
+    完整明細與超過 SQL_PROFILE_SLOW_MS 的查詢 (附 EXPLAIN) 寫入 log。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def is_requested(request: HttpRequest) -> bool:
+        """帶有效的 X-Profile-SQL header，回應才會附上分析結果"""
+        header = request.headers.get(PROFILE_HEADER)
+        if not header:
+            return False
+        if settings.SQL_PROFILE_TOKEN:
+            return header == settings.SQL_PROFILE_TOKEN
+        return settings.DEBUG
+
+    @staticmethod
+    def is_sampled() -> bool:
+        return random.random() < settings.SQL_PROFILE_SAMPLE_RATE
+
+    @staticmethod
+    def install_profilers(stack: ExitStack) -> List[SqlProfiler]:
+        profilers = []
+        for connection in connections.all():
+            profiler = SqlProfiler(connection.alias, settings.SQL_PROFILE_MAX_QUERIES)
+            stack.enter_context(connection.execute_wrapper(profiler))
+            profilers.append(profiler)
+        return profilers
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        requested = self.is_requested(request)
+        if not requested and not self.is_sampled():
+            return self.get_response(request)
+
+        with ExitStack() as stack:
+            profilers = self.install_profilers(stack)
+            response = self.get_response(request)
+        return self.add_summary(request, response, profilers, requested)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        requested = self.is_requested(request)
+        if not requested and not self.is_sampled():
+            return await self.get_response(request)
+
+        # 與 MetricsMiddleware 相同，execute_wrapper 需掛在 ORM 執行的執行緒上
+        stack = ExitStack()
+        try:
+            profilers = await sync_to_async(self.install_profilers)(stack)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        # EXPLAIN 需要查詢資料庫
+        return await sync_to_async(self.add_summary)(request, response, profilers, requested)
+
+    def add_summary(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        profilers: List[SqlProfiler],
+        requested: bool,
+    ) -> HttpResponse:
+        queries = [query for profiler in profilers for query in profiler.queries]
+        dropped = sum(profiler.dropped for profiler in profilers)
+        summary = self.summarize(request, queries, dropped)
+        if requested:
+            response[SUMMARY_HEADER] = summary
+        return response
+
+    def summarize(self, request: HttpRequest, queries: List[ProfiledQuery], dropped: int) -> str:
+        total_ms = sum(query.seconds for query in queries) * 1000
+        exact = Counter((query.alias, query.sql, query.params) for query in queries)
+        similar = Counter((query.alias, query.sql) for query in queries)
+        duplicates = sum(count - 1 for count in exact.values())
+        similar_count = sum(count - 1 for count in similar.values())
+        slowest = max(queries, key=lambda query: query.seconds, default=None)
+
+        summary = (
+            f"queries={len(queries) + dropped}; time={total_ms:.1f}ms; "
+            f"duplicates={duplicates}; similar={similar_count}"
+        )
+        if slowest:
+            summary += f"; slowest={slowest.seconds * 1000:.1f}ms@{slowest.origin}"
+
+        lines = [f"[SQL] {request.method} {request.path} {summary}"]
+        for (alias, sql), count in similar.most_common(5):
+            if count > 1:
+                origins = {query.origin for query in queries if query.sql == sql and query.alias == alias}
+                lines.append(f"  重複 {count} 次 ({', '.join(sorted(origins))}): {sql[:300]}")
+        logger.info("\n".join(lines))
+
+        slow_queries = sorted(
+            (query for query in queries if query.seconds * 1000 >= settings.SQL_PROFILE_SLOW_MS),
+            key=lambda query: query.seconds,
+            reverse=True,
+        )
+        for query in slow_queries[:settings.SQL_PROFILE_MAX_EXPLAINS]:
+            logger.warning(
+                f"[SQL] 慢查詢 {query.seconds * 1000:.1f}ms ({query.origin}): {query.sql}\n"
+                f"  params: {query.params}\n"
+                f"  explain:\n{self.explain(query)}"
+            )
+
+        return summary
+
+    @staticmethod
+    def explain(query: ProfiledQuery) -> str:
+        """只對 SELECT 執行 EXPLAIN，避免重複執行寫入"""
+        if query.params is None or not query.sql.lstrip().upper().startswith("SELECT"):
+            return "  (略過)"
+
+        connection = connections[query.alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {query.sql}", query.params)
+                return "\n".join(
+                    "  " + " ".join(str(column) for column in row)
+                    for row in cursor.fetchall()
+                )
+        except Exception as e:
+            return f"  (EXPLAIN 失敗: {e})"
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('dedupe_key', models.CharField(help_text='同一區域搜尋或同一店家同一階段只會有一筆任務', max_length=255, unique=True, verbose_name='去重鍵')),
+                ('stage', models.CharField(choices=[('SEARCH', '搜尋區域'), ('PRICE_AND_SERVICE', '價格與服務'), ('REVIEW', '評論'), ('PRICE_RANGE', '價格區間'), ('SUMMARY', 'AI 摘要'), ('TAG', 'AI 標籤'), ('SAVE', '寫入資料庫')], max_length=32, verbose_name='階段')),
+                ('region', models.CharField(max_length=255, verbose_name='搜尋區域')),
+                ('keyword', models.CharField(max_length=255, verbose_name='搜尋關鍵字')),
+                ('shop_name', models.CharField(blank=True, default='', max_length=255, verbose_name='店家名稱')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='任務資料')),
+                ('status', models.CharField(choices=[('PENDING', '等待中'), ('RUNNING', '執行中'), ('DONE', '完成'), ('FAILED', '失敗')], default='PENDING', max_length=16, verbose_name='狀態')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='已嘗試次數')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='最大嘗試次數')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='可執行時間')),
+                ('lease_owner', models.CharField(blank=True, default='', max_length=255, verbose_name='執行者')),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True, verbose_name='租約到期時間')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='最後心跳時間')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最後錯誤')),
+            ],
+            options={
+                'verbose_name': '爬蟲任務',
+                'verbose_name_plural': '爬蟲任務',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='core_crawlt_status_171c3f_idx'), models.Index(fields=['status', 'lease_expires_at'], name='core_crawlt_status_2c426f_idx')],
+            },
+        ),
+    ]
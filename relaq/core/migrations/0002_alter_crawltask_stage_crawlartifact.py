@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='crawltask',
+            name='stage',
+            field=models.CharField(choices=[('SEARCH', '搜尋區域'), ('PLACE_DETAIL', '店家詳細資料'), ('PRICE_AND_SERVICE', '價格與服務'), ('REVIEW', '評論'), ('PRICE_RANGE', '價格區間'), ('SUMMARY', 'AI 摘要'), ('TAG', 'AI 標籤'), ('SAVE', '寫入資料庫')], max_length=32, verbose_name='階段'),
+        ),
+        migrations.CreateModel(
+            name='CrawlArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('shop_key', models.CharField(help_text='Google Place ID，沒有時使用店家名稱', max_length=255, verbose_name='店家鍵')),
+                ('shop_name', models.CharField(max_length=255, verbose_name='店家名稱')),
+                ('stage', models.CharField(choices=[('SEARCH', '搜尋區域'), ('PLACE_DETAIL', '店家詳細資料'), ('PRICE_AND_SERVICE', '價格與服務'), ('REVIEW', '評論'), ('PRICE_RANGE', '價格區間'), ('SUMMARY', 'AI 摘要'), ('TAG', 'AI 標籤'), ('SAVE', '寫入資料庫')], max_length=32, verbose_name='階段')),
+                ('data', models.JSONField(blank=True, null=True, verbose_name='階段結果')),
+            ],
+            options={
+                'verbose_name': '爬蟲階段結果',
+                'verbose_name_plural': '爬蟲階段結果',
+                'constraints': [models.UniqueConstraint(fields=('shop_key', 'stage'), name='unique_crawl_artifact_stage')],
+            },
+        ),
+    ]
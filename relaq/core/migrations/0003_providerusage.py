@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_crawltask_stage_crawlartifact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('provider', models.CharField(choices=[('GOOGLE', 'Google Map'), ('OUTSCRAPER', 'Outscraper'), ('FELO', 'Felo'), ('OPENAI', 'OpenAI')], max_length=16, verbose_name='服務')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('used', models.PositiveIntegerField(default=0, help_text='依各階段預估的 API 呼叫次數累計', verbose_name='已使用次數')),
+            ],
+            options={
+                'verbose_name': '外部服務用量',
+                'verbose_name_plural': '外部服務用量',
+                'constraints': [models.UniqueConstraint(fields=('provider', 'date'), name='unique_provider_usage_date')],
+            },
+        ),
+    ]
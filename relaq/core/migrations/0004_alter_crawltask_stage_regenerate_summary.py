@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_providerusage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='crawlartifact',
+            name='stage',
+            field=models.CharField(choices=[('SEARCH', '搜尋區域'), ('PLACE_DETAIL', '店家詳細資料'), ('PRICE_AND_SERVICE', '價格與服務'), ('REVIEW', '評論'), ('PRICE_RANGE', '價格區間'), ('SUMMARY', 'AI 摘要'), ('TAG', 'AI 標籤'), ('SAVE', '寫入資料庫'), ('REGENERATE_SUMMARY', '重新產生 AI 摘要')], max_length=32, verbose_name='階段'),
+        ),
+        migrations.AlterField(
+            model_name='crawltask',
+            name='stage',
+            field=models.CharField(choices=[('SEARCH', '搜尋區域'), ('PLACE_DETAIL', '店家詳細資料'), ('PRICE_AND_SERVICE', '價格與服務'), ('REVIEW', '評論'), ('PRICE_RANGE', '價格區間'), ('SUMMARY', 'AI 摘要'), ('TAG', 'AI 標籤'), ('SAVE', '寫入資料庫'), ('REGENERATE_SUMMARY', '重新產生 AI 摘要')], max_length=32, verbose_name='階段'),
+        ),
+    ]
@@ -24,3 +24,170 @@ class TimeStamped(models.Model):
 
     def updated_at_local(self) -> datetime:
         return timezone.localtime(self.updated_at)
+
+
+class CrawlStage(models.TextChoices):
+    SEARCH = ("SEARCH", "搜尋區域")
+    PLACE_DETAIL = ("PLACE_DETAIL", "店家詳細資料")
+    PRICE_AND_SERVICE = ("PRICE_AND_SERVICE", "價格與服務")
+    REVIEW = ("REVIEW", "評論")
+    PRICE_RANGE = ("PRICE_RANGE", "價格區間")
+    SUMMARY = ("SUMMARY", "AI 摘要")
+    TAG = ("TAG", "AI 標籤")
+    SAVE = ("SAVE", "寫入資料庫")
+    REGENERATE_SUMMARY = ("REGENERATE_SUMMARY", "重新產生 AI 摘要")
+
+
+class CrawlProvider(models.TextChoices):
+    GOOGLE = ("GOOGLE", "Google Map")
+    OUTSCRAPER = ("OUTSCRAPER", "Outscraper")
+    FELO = ("FELO", "Felo")
+    OPENAI = ("OPENAI", "OpenAI")
+
+
+class CrawlTaskStatus(models.TextChoices):
+    PENDING = ("PENDING", "等待中")
+    RUNNING = ("RUNNING", "執行中")
+    DONE = ("DONE", "完成")
+    FAILED = ("FAILED", "失敗")
+
+
+class CrawlTask(TimeStamped):
+    dedupe_key = models.CharField(
+        verbose_name="去重鍵",
+        max_length=255,
+        unique=True,
+        help_text="同一區域搜尋或同一店家同一階段只會有一筆任務",
+    )
+    stage = models.CharField(
+        verbose_name="階段",
+        max_length=32,
+        choices=CrawlStage.choices,
+    )
+    region = models.CharField(
+        verbose_name="搜尋區域",
+        max_length=255,
+    )
+    keyword = models.CharField(
+        verbose_name="搜尋關鍵字",
+        max_length=255,
+    )
+    shop_name = models.CharField(
+        verbose_name="店家名稱",
+        max_length=255,
+        blank=True,
+        default="",
+    )
+    payload = models.JSONField(
+        verbose_name="任務資料",
+        default=dict,
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name="狀態",
+        max_length=16,
+        choices=CrawlTaskStatus.choices,
+        default=CrawlTaskStatus.PENDING,
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name="已嘗試次數",
+        default=0,
+    )
+    max_attempts = models.PositiveIntegerField(
+        verbose_name="最大嘗試次數",
+        default=5,
+    )
+    available_at = models.DateTimeField(
+        verbose_name="可執行時間",
+        default=timezone.now,
+    )
+    lease_owner = models.CharField(
+        verbose_name="執行者",
+        max_length=255,
+        blank=True,
+        default="",
+    )
+    lease_expires_at = models.DateTimeField(
+        verbose_name="租約到期時間",
+        null=True,
+        blank=True,
+    )
+    heartbeat_at = models.DateTimeField(
+        verbose_name="最後心跳時間",
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        verbose_name="最後錯誤",
+        blank=True,
+        default="",
+    )
+
+    class Meta:
+        verbose_name = "爬蟲任務"
+        verbose_name_plural = "爬蟲任務"
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+            models.Index(fields=["status", "lease_expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_stage_display()} {self.shop_name or self.region}"
+
+
+class CrawlArtifact(TimeStamped):
+    shop_key = models.CharField(
+        verbose_name="店家鍵",
+        max_length=255,
+        help_text="Google Place ID，沒有時使用店家名稱",
+    )
+    shop_name = models.CharField(
+        verbose_name="店家名稱",
+        max_length=255,
+    )
+    stage = models.CharField(
+        verbose_name="階段",
+        max_length=32,
+        choices=CrawlStage.choices,
+    )
+    data = models.JSONField(
+        verbose_name="階段結果",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = "爬蟲階段結果"
+        verbose_name_plural = "爬蟲階段結果"
+        constraints = [
+            models.UniqueConstraint(fields=["shop_key", "stage"], name="unique_crawl_artifact_stage"),
+        ]
+
+    def __str__(self):
+        return f"{self.shop_name} {self.get_stage_display()}"
+
+
+class ProviderUsage(TimeStamped):
+    provider = models.CharField(
+        verbose_name="服務",
+        max_length=16,
+        choices=CrawlProvider.choices,
+    )
+    date = models.DateField(
+        verbose_name="日期",
+    )
+    used = models.PositiveIntegerField(
+        verbose_name="已使用次數",
+        default=0,
+        help_text="依各階段預估的 API 呼叫次數累計",
+    )
+
+    class Meta:
+        verbose_name = "外部服務用量"
+        verbose_name_plural = "外部服務用量"
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "date"], name="unique_provider_usage_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_provider_display()} {self.date}"
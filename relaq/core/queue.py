@@ -0,0 +1,439 @@
+import logging
+import random
+import threading
+from dataclasses import asdict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from cms.models import Shop
+from core.budget import ProviderBudget
+from core.metrics import crawl_metrics
+from core.models import CrawlStage, CrawlTask, CrawlTaskStatus
+from core.services import CoreService, SHOP_STAGES, ShopSummaryRegenerator, get_shop_key
+from googlemap.models import PlaceDetail
+
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlQueue:
+    """以資料庫實作的爬蟲任務佇列
+
+    - 每個區域搜尋、每間店家的每個階段各為一筆任務
+    - 以條件式 UPDATE 搶租約，多個 worker process / 節點可同時消費
+    - 執行中定期心跳延長租約，worker 中斷後租約到期即可被其他 worker 接手
+    - 失敗時依指數退避重試，超過最大次數標記為失敗
+    """
+    CLAIM_BATCH_SIZE = 10
+
+    def __init__(self, worker_id: str):
+        self.worker_id = worker_id
+        self.lease_seconds = settings.CRAWL_TASK_LEASE_SECONDS
+
+    @staticmethod
+    def _region_key(region: str, keyword: str) -> str:
+        return f"{CrawlStage.SEARCH}:{region}:{keyword}"
+
+    @staticmethod
+    def _shop_key(stage: CrawlStage, shop_data: PlaceDetail) -> str:
+        return f"{stage}:{get_shop_key(shop_data)}"
+
+    @staticmethod
+    def _create_task(**fields) -> Optional[CrawlTask]:
+        try:
+            # 在 savepoint 中新增，重複時只回滾這一筆，不影響外層交易
+            with transaction.atomic():
+                return CrawlTask.objects.create(
+                    max_attempts=settings.CRAWL_TASK_MAX_ATTEMPTS,
+                    **fields
+                )
+        except IntegrityError:
+            logger.info(f"[Queue] 任務 {fields['dedupe_key']} 已存在，略過")
+            return None
+
+    @classmethod
+    def enqueue_region(cls, region: str, keyword: str) -> Optional[CrawlTask]:
+        """新增區域搜尋任務，若已存在則不重複新增"""
+        return cls._create_task(
+            dedupe_key=cls._region_key(region, keyword),
+            stage=CrawlStage.SEARCH,
+            region=region,
+            keyword=keyword,
+        )
+
+    @staticmethod
+    def _requeue(dedupe_key: str, **fields) -> bool:
+        """已完成或失敗的任務重新排入佇列 (可一併更新任務資料)，等待中或執行中的任務不變"""
+        return bool(
+            CrawlTask.objects.filter(
+                dedupe_key=dedupe_key,
+                status__in=[CrawlTaskStatus.DONE, CrawlTaskStatus.FAILED],
+            ).update(
+                status=CrawlTaskStatus.PENDING,
+                attempts=0,
+                available_at=timezone.now(),
+                lease_owner="",
+                lease_expires_at=None,
+                last_error="",
+                updated_at=timezone.now(),
+                **fields
+            )
+        )
+
+    @classmethod
+    def requeue_region(cls, region: str, keyword: str) -> bool:
+        """已完成或失敗的區域搜尋重新排入佇列 (例如每日重新搜尋新店家)"""
+        return cls._requeue(cls._region_key(region, keyword))
+
+    @classmethod
+    def enqueue_shop_stage(
+        cls,
+        stage: CrawlStage,
+        shop_data: PlaceDetail,
+        region: str,
+        keyword: str,
+    ) -> Optional[CrawlTask]:
+        """新增單一店家某個階段的任務，先前階段的結果由 CrawlArtifact 提供
+
+        先前失敗的店家重新被搜尋到時，已結束的同階段任務會重新排入佇列。
+        """
+        dedupe_key = cls._shop_key(stage, shop_data)
+        fields = {
+            "region": region,
+            "keyword": keyword,
+            "shop_name": shop_data.name,
+            "payload": {
+                "place": asdict(shop_data),
+            },
+        }
+        if cls._requeue(dedupe_key, **fields):
+            return CrawlTask.objects.get(dedupe_key=dedupe_key)
+
+        return cls._create_task(dedupe_key=dedupe_key, stage=stage, **fields)
+
+    @classmethod
+    def enqueue_summary_regeneration(cls, shop: Shop) -> bool:
+        """新增依照既有資料重新產生店家 AI 摘要的任務 (後台使用)
+
+        Returns:
+            bool: 是否已排入，同一間店家的任務仍在等待或執行中時回傳 False
+        """
+        dedupe_key = f"{CrawlStage.REGENERATE_SUMMARY}:{shop.id}"
+        if cls._requeue(dedupe_key):
+            return True
+
+        task = cls._create_task(
+            dedupe_key=dedupe_key,
+            stage=CrawlStage.REGENERATE_SUMMARY,
+            region=shop.city or "",
+            keyword="",
+            shop_name=shop.name,
+            payload={
+                "shop_id": shop.id,
+            },
+        )
+        return task is not None
+
+    def claim(self) -> Optional[CrawlTask]:
+        """取得一筆可執行的任務 (等待中或租約已過期)"""
+        self._defer_over_quota()
+
+        now = timezone.now()
+        candidates = CrawlTask.objects.filter(
+            Q(status=CrawlTaskStatus.PENDING, available_at__lte=now) |
+            Q(status=CrawlTaskStatus.RUNNING, lease_expires_at__lt=now)
+        ).exclude(
+            # 外部服務已達同時執行上限或今日額度用完的階段先不領取
+            stage__in=ProviderBudget.blocked_stages()
+        ).order_by("available_at", "id")[:self.CLAIM_BATCH_SIZE]
+
+        for task in candidates:
+            if task.status == CrawlTaskStatus.RUNNING and task.attempts >= task.max_attempts:
+                self._mark_abandoned(task)
+                continue
+
+            # 只有狀態與租約都沒被其他 worker 改動時才會更新成功
+            claimed = CrawlTask.objects.filter(
+                id=task.id,
+                status=task.status,
+                lease_owner=task.lease_owner,
+                attempts=task.attempts,
+            ).update(
+                status=CrawlTaskStatus.RUNNING,
+                lease_owner=self.worker_id,
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                heartbeat_at=now,
+                attempts=F("attempts") + 1,
+                updated_at=now,
+            )
+            if claimed:
+                task.refresh_from_db()
+                if self._reserve_budget(task):
+                    return task
+
+        return None
+
+    @staticmethod
+    def _defer_over_quota() -> None:
+        """今日額度已用完的服務，其等待中的任務延到額度重置後"""
+        stages = ProviderBudget.over_quota_stages()
+        if not stages:
+            return
+
+        deferred = CrawlTask.objects.filter(
+            status=CrawlTaskStatus.PENDING,
+            stage__in=stages,
+            available_at__lte=timezone.now(),
+        ).update(available_at=ProviderBudget.next_reset_at())
+        if deferred:
+            logger.warning(f"[Queue] 今日額度已用完，{deferred} 筆任務延到額度重置後執行")
+
+    def _reserve_budget(self, task: CrawlTask) -> bool:
+        """確認任務使用的外部服務仍有同時執行數與今日額度，否則退回任務"""
+        provider = ProviderBudget.provider_for(task.stage)
+        if provider is None:
+            return True
+
+        # 多個 worker 可能同時搶到同一服務的任務，超過上限的退回等待
+        if ProviderBudget.is_over_concurrency(provider):
+            self._release(task, task.available_at)
+            return False
+
+        if not ProviderBudget.try_reserve(provider, ProviderBudget.estimate_cost(task.stage)):
+            logger.warning(f"[Queue] {provider} 今日額度已用完，任務 {task.dedupe_key} 延到額度重置後執行")
+            self._release(task, ProviderBudget.next_reset_at())
+            return False
+
+        return True
+
+    def _release(self, task: CrawlTask, available_at) -> None:
+        """退回剛搶到的任務，不計入嘗試次數"""
+        CrawlTask.objects.filter(id=task.id, lease_owner=self.worker_id).update(
+            status=CrawlTaskStatus.PENDING,
+            attempts=F("attempts") - 1,
+            available_at=available_at,
+            lease_owner="",
+            lease_expires_at=None,
+            updated_at=timezone.now(),
+        )
+
+    @staticmethod
+    def has_available_work() -> bool:
+        """是否還有可執行或執行中 (可能產生後續階段) 的任務"""
+        return CrawlTask.objects.filter(
+            Q(status=CrawlTaskStatus.PENDING, available_at__lte=timezone.now()) |
+            Q(status=CrawlTaskStatus.RUNNING)
+        ).exists()
+
+    @staticmethod
+    def is_place_enqueued(place_id: str) -> bool:
+        """同一個地點已有等待中 / 執行中的店家任務，或已完成所有階段
+
+        失敗而中斷的店家不算，重新搜尋時會再排入佇列。
+        """
+        return CrawlTask.objects.filter(
+            Q(
+                dedupe_key__in=[f"{stage}:{place_id}" for stage in SHOP_STAGES],
+                status__in=[CrawlTaskStatus.PENDING, CrawlTaskStatus.RUNNING],
+            ) |
+            Q(dedupe_key=f"{SHOP_STAGES[-1]}:{place_id}", status=CrawlTaskStatus.DONE)
+        ).exists()
+
+    def _mark_abandoned(self, task: CrawlTask) -> None:
+        CrawlTask.objects.filter(
+            id=task.id,
+            status=CrawlTaskStatus.RUNNING,
+            lease_owner=task.lease_owner,
+        ).update(
+            status=CrawlTaskStatus.FAILED,
+            last_error=f"租約過期且已達最大嘗試次數 (最後執行者 {task.lease_owner})",
+            updated_at=timezone.now(),
+        )
+        logger.error(f"[Queue] 任務 {task.dedupe_key} 租約過期且已達最大嘗試次數")
+
+    def heartbeat(self, task: CrawlTask) -> bool:
+        """延長租約，回傳是否仍持有該任務"""
+        now = timezone.now()
+        return bool(
+            CrawlTask.objects.filter(
+                id=task.id,
+                status=CrawlTaskStatus.RUNNING,
+                lease_owner=self.worker_id,
+            ).update(
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                heartbeat_at=now,
+            )
+        )
+
+    def complete(self, task: CrawlTask) -> None:
+        CrawlTask.objects.filter(id=task.id, lease_owner=self.worker_id).update(
+            status=CrawlTaskStatus.DONE,
+            lease_expires_at=None,
+            last_error="",
+            updated_at=timezone.now(),
+        )
+
+    def fail(self, task: CrawlTask, error: str) -> None:
+        """記錄失敗，未達最大次數時以指數退避 (含隨機抖動) 重新排程"""
+        now = timezone.now()
+
+        if task.attempts >= task.max_attempts:
+            status = CrawlTaskStatus.FAILED
+            available_at = task.available_at
+            logger.error(f"[Queue] 任務 {task.dedupe_key} 已達最大嘗試次數，標記失敗")
+        else:
+            status = CrawlTaskStatus.PENDING
+            backoff = min(
+                settings.CRAWL_TASK_BACKOFF_SECONDS * 2 ** (task.attempts - 1),
+                settings.CRAWL_TASK_BACKOFF_MAX_SECONDS,
+            )
+            available_at = now + timedelta(seconds=backoff * random.uniform(0.8, 1.2))
+            logger.warning(f"[Queue] 任務 {task.dedupe_key} 失敗，{backoff} 秒後重試")
+
+        CrawlTask.objects.filter(id=task.id, lease_owner=self.worker_id).update(
+            status=status,
+            available_at=available_at,
+            lease_expires_at=None,
+            last_error=error,
+            updated_at=now,
+        )
+
+    @staticmethod
+    def progress(region: Optional[str] = None) -> Dict[str, int]:
+        """各狀態的任務數量"""
+        queryset = CrawlTask.objects.all()
+        if region:
+            queryset = queryset.filter(region=region)
+
+        progress = {status: 0 for status in CrawlTaskStatus.values}
+        for row in queryset.values("status").order_by().annotate(count=Count("id")):
+            progress[row["status"]] = row["count"]
+        return progress
+
+
+class LeaseHeartbeat:
+    """在背景執行緒中定期為任務心跳，任務執行完畢後停止"""
+
+    def __init__(self, queue: CrawlQueue, task: CrawlTask):
+        self.queue = queue
+        self.task = task
+        self.interval = max(queue.lease_seconds / 3, 1)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        try:
+            while not self.stop_event.wait(self.interval):
+                if not self.queue.heartbeat(self.task):
+                    logger.warning(f"[Queue] 任務 {self.task.dedupe_key} 的租約已被其他 worker 接手")
+                    return
+        finally:
+            # 背景執行緒有自己的 DB 連線，結束時需關閉
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
+        return False
+
+
+class CrawlWorker:
+    """消費爬蟲任務：區域搜尋任務展開為店家任務，店家任務逐階段往下串接"""
+
+    def __init__(self, worker_id: str, core_service: Optional[CoreService] = None):
+        self.queue = CrawlQueue(worker_id)
+        self.core_service = core_service
+
+    def _get_core_service(self) -> CoreService:
+        # 延遲初始化，避免 worker 沒拿到任務也啟動 Selenium driver
+        if self.core_service is None:
+            self.core_service = CoreService(settings.CATCH_LIMIT)
+        return self.core_service
+
+    def run_task(self, task: CrawlTask) -> None:
+        if task.stage == CrawlStage.REGENERATE_SUMMARY:
+            # 只呼叫 LLM，不需要啟動爬蟲工具
+            self._run_summary_regeneration(task)
+            return
+
+        core_service = self._get_core_service()
+        core_service.search_keyword = task.keyword
+
+        if task.stage == CrawlStage.SEARCH:
+            self._run_search(core_service, task)
+        else:
+            self._run_shop_stage(core_service, task)
+
+    def _run_search(self, core_service: CoreService, task: CrawlTask) -> None:
+        # 不同區域 / 關鍵字的搜尋結果會重疊，已建立任務的地點不再取詳細資訊
+        all_shop_data: List[PlaceDetail] = core_service._get_all_shop_data(
+            search_query=f"{task.region} {task.keyword}",
+            skip_place=lambda place: self.queue.is_place_enqueued(place["place_id"]),
+        )
+        logger.info(f"[Queue] {task.region} 共找到 {len(all_shop_data)} 家店家")
+
+        for shop_data in all_shop_data[:core_service.catch_limit]:
+            if core_service.is_shop_crawled(shop_data.name):
+                logger.info(f"[Queue] 店家 {shop_data.name} 已存在，跳過")
+                continue
+
+            core_service.save_checkpoint(shop_data, CrawlStage.PLACE_DETAIL, asdict(shop_data))
+            self.queue.enqueue_shop_stage(SHOP_STAGES[0], shop_data, task.region, task.keyword)
+
+    def _run_shop_stage(self, core_service: CoreService, task: CrawlTask) -> None:
+        stage = CrawlStage(task.stage)
+        shop_data = PlaceDetail(**task.payload["place"])
+        # 前面階段通常都有 checkpoint，缺少時 (例如已過期) 會在這裡補跑
+        outputs = core_service.load_checkpoints(shop_data)
+        for previous_stage in SHOP_STAGES[:SHOP_STAGES.index(stage) + 1]:
+            outputs[previous_stage] = core_service.run_checkpointed_stage(previous_stage, shop_data, outputs)
+
+        next_index = SHOP_STAGES.index(stage) + 1
+        if next_index < len(SHOP_STAGES):
+            self.queue.enqueue_shop_stage(
+                SHOP_STAGES[next_index],
+                shop_data,
+                task.region,
+                task.keyword,
+            )
+        else:
+            # 佇列中的 SAVE 任務需要在完成前寫入資料庫
+            core_service.shop_writer.flush()
+            crawl_metrics.shop_done(get_shop_key(shop_data), True, shop_data.name)
+            logger.info(f"[Queue] 店家 {shop_data.name} 所有階段完成")
+
+    def _run_summary_regeneration(self, task: CrawlTask) -> None:
+        shop = Shop.objects.filter(id=task.payload["shop_id"]).first()
+        if shop is None:
+            logger.warning(f"[Queue] 店家 {task.shop_name} 已刪除，略過重新產生摘要")
+            return
+
+        for section, content in ShopSummaryRegenerator().stream(shop):
+            logger.info(f"[Queue] 店家 {shop.name} 摘要 {section} 完成 ({len(content)} 字)")
+
+    def run_once(self) -> bool:
+        """執行一筆任務，沒有任務時回傳 False"""
+        task = self.queue.claim()
+        if task is None:
+            return False
+
+        logger.info(f"[Queue] {self.queue.worker_id} 開始執行 {task} (第 {task.attempts} 次)")
+        with LeaseHeartbeat(self.queue, task):
+            try:
+                self.run_task(task)
+            except Exception as e:
+                logger.error(f"[Queue] 任務 {task.dedupe_key} 執行失敗: {str(e)}", exc_info=True)
+                self.queue.fail(task, str(e))
+                return True
+
+        self.queue.complete(task)
+        return True
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from chatgpt.services import ChatGPTHelper, GPTModelEnum
+from core.metrics import crawl_metrics
+from core.models import CrawlProvider
+from felo.scraper import FeloScraper
+from googlemap.models import PlaceDetail
+from googlemap.services import GoogleMapHelper
+from outscrapers.services import OutscraperHelper
+
+
+# 各外部服務一次呼叫的實際延遲 (秒)，重播時乘上 ReplayProfile.latency_scale
+DEFAULT_LATENCY_SECONDS = {
+    CrawlProvider.GOOGLE: 0.5,
+    CrawlProvider.OUTSCRAPER: 45.0,
+    CrawlProvider.FELO: 25.0,
+    CrawlProvider.OPENAI: 4.0,
+}
+
+
+class ProviderReplayError(Exception):
+    """重播時模擬的外部服務失敗"""
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class ProviderFixtures:
+    """外部服務回應的錄製檔
+
+    每筆回應以 (服務, 方法, 群組, key) 保存，群組區分同一方法的不同用途
+    (例如不同 system prompt 的 chat)。重播時先找相同 key 的回應，
+    找不到時 (例如店家數比錄製時多) 依序輪流使用同群組的其他回應。
+    """
+
+    def __init__(self, entries: Optional[List[Dict[str, Any]]] = None):
+        self.entries: Dict[Tuple[str, str, str, str], Any] = {}
+        self.groups: Dict[Tuple[str, str, str], List[Any]] = {}
+        self.cursors: Dict[Tuple[str, str, str], int] = {}
+        for entry in entries or []:
+            self.record(entry["provider"], entry["method"], entry["group"], entry["key"], entry["response"])
+
+    @classmethod
+    def load(cls, path: str) -> "ProviderFixtures":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8"))["entries"])
+
+    def save(self, path: str) -> None:
+        entries = [
+            {"provider": provider, "method": method, "group": group, "key": key, "response": response}
+            for (provider, method, group, key), response in self.entries.items()
+        ]
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(
+            json.dumps({"entries": entries}, ensure_ascii=False, indent=2) + "\n",
+            encoding="utf-8",
+        )
+
+    def record(self, provider: str, method: str, group: str, key: str, response: Any) -> None:
+        if (provider, method, group, key) not in self.entries:
+            self.groups.setdefault((provider, method, group), []).append(response)
+        self.entries[(provider, method, group, key)] = response
+
+    def lookup(self, provider: str, method: str, group: str, key: str) -> Any:
+        if (provider, method, group, key) in self.entries:
+            return self.entries[(provider, method, group, key)]
+
+        responses = self.groups.get((provider, method, group))
+        if not responses:
+            raise KeyError(f"錄製檔中沒有 {provider}.{method} ({group}) 的回應")
+
+        cursor = self.cursors.get((provider, method, group), 0)
+        self.cursors[(provider, method, group)] = cursor + 1
+        return responses[cursor % len(responses)]
+
+
+@dataclass
+class ReplayProfile:
+    """重播時模擬的延遲與失敗率
+
+    Args:
+        latency_scale: 延遲倍率，1 為實際延遲，0 為不等待
+        failure_rates: 各服務呼叫失敗的機率 (0 ~ 1)
+        latency_seconds: 各服務一次呼叫的延遲，預設為 DEFAULT_LATENCY_SECONDS
+        jitter: 延遲的隨機浮動比例
+    """
+    latency_scale: float = 0.01
+    failure_rates: Dict[str, float] = field(default_factory=dict)
+    latency_seconds: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_LATENCY_SECONDS))
+    jitter: float = 0.2
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self.random = random.Random(self.seed)
+
+    def simulate(self, provider: str) -> None:
+        latency = self.latency_seconds.get(provider, 0) * self.latency_scale
+        with crawl_metrics.request(provider):
+            if latency > 0:
+                time.sleep(latency * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+            if self.random.random() < self.failure_rates.get(provider, 0):
+                raise ProviderReplayError(f"{provider} 模擬失敗")
+
+
+class ReplayGoogleMapHelper(GoogleMapHelper):
+    """以錄製的搜尋結果取代 Google Map API
+
+    只取代文字搜尋與 Place Details 兩個 API 呼叫，分頁、平行取得詳細資訊與預先請求下一頁
+    都沿用 GoogleMapHelper.search_places。
+    店家數超過錄製數量時，複製錄製的店家並加上編號 (名稱與 place_id 都不同)。
+    """
+    PAGE_SIZE = 20
+
+    def __init__(self, fixtures: ProviderFixtures, profile: ReplayProfile):
+        self.fixtures = fixtures
+        self.profile = profile
+        self.recorded_places: List[dict] = []
+
+    def search_places(
+        self,
+        query: str,
+        catch_limit: int = 20,
+        fields: Optional[list[str]] = None,
+        skip_place: Optional[Callable[[dict], bool]] = None,
+    ) -> list[PlaceDetail]:
+        recorded = self.fixtures.lookup(CrawlProvider.GOOGLE, "search_places", "", query)
+        # 最多產生 catch_limit 的 10 倍，店家都被略過時不會無限翻頁
+        self.recorded_places = []
+        for index in range(catch_limit * 10 if recorded else 0):
+            place = dict(recorded[index % len(recorded)])
+            copy = index // len(recorded)
+            if copy:
+                place.update(name=f"{place['name']} #{copy + 1}", place_id=f"{place['place_id']}-{copy + 1}")
+            self.recorded_places.append(place)
+
+        return super().search_places(query, catch_limit, fields, skip_place)
+
+    def _fetch_page(self, query: str, page_token: Optional[str] = None) -> dict:
+        # 文字搜尋，page_token 為下一頁的起始位置
+        self.profile.simulate(CrawlProvider.GOOGLE)
+        start = int(page_token or 0)
+        end = start + self.PAGE_SIZE
+        page = {"results": self.recorded_places[start:end]}
+        if end < len(self.recorded_places):
+            page["next_page_token"] = str(end)
+        return page
+
+    def _fetch_place_detail(self, place: dict, fields: list[str]) -> Optional[PlaceDetail]:
+        # 與實際 API 相同，取得失敗的地點回傳 None，由 search_places 以下一頁補足
+        try:
+            self.profile.simulate(CrawlProvider.GOOGLE)
+        except ProviderReplayError:
+            return None
+        return PlaceDetail(**place)
+
+
+class ReplayOutscraperHelper(OutscraperHelper):
+    def __init__(self, fixtures: ProviderFixtures, profile: ReplayProfile):
+        super().__init__()
+        self.fixtures = fixtures
+        self.profile = profile
+
+    def get_map_review(self, shop_name: str) -> tuple[bool, dict]:
+        self.profile.simulate(CrawlProvider.OUTSCRAPER)
+        is_ok, result = self.fixtures.lookup(CrawlProvider.OUTSCRAPER, "get_map_review", "", shop_name)
+        return is_ok, result
+
+
+class ReplayFeloScraper(FeloScraper):
+    def __init__(self, fixtures: ProviderFixtures, profile: ReplayProfile):
+        # 不啟動 Selenium driver
+        self.fixtures = fixtures
+        self.profile = profile
+
+    def search(self, prompt: str, max_retries: int = 3, retry_delay: int = 5) -> str:
+        self.profile.simulate(CrawlProvider.FELO)
+        return self.fixtures.lookup(CrawlProvider.FELO, "search", "", prompt)
+
+
+class ReplayChatGPTHelper(ChatGPTHelper):
+    """以錄製的回應取代 OpenAI，chat 與 chat_stream 共用同一份錄製內容"""
+    STREAM_CHUNK_SIZE = 20
+
+    def __init__(self, fixtures: ProviderFixtures, profile: ReplayProfile):
+        self.fixtures = fixtures
+        self.profile = profile
+
+    def chat(self, user_input: str, system_setting: str, model: str = GPTModelEnum.GPT_4O_MINI.value) -> str:
+        self.profile.simulate(CrawlProvider.OPENAI)
+        return self.fixtures.lookup(CrawlProvider.OPENAI, "chat", _digest(system_setting), _digest(user_input))
+
+    def chat_stream(
+        self,
+        user_input: str,
+        system_setting: str,
+        model: str = GPTModelEnum.GPT_4O_MINI.value,
+    ) -> Iterator[str]:
+        text = self.chat(user_input, system_setting, model)
+        for start in range(0, len(text), self.STREAM_CHUNK_SIZE):
+            yield text[start:start + self.STREAM_CHUNK_SIZE]
+
+
+class ProviderRecorder:
+    """包裝實際的 helper，將 CoreService 用到的方法回應寫入錄製檔"""
+
+    def __init__(self, fixtures: Optional[ProviderFixtures] = None):
+        self.fixtures = fixtures or ProviderFixtures()
+
+    def wrap_google(self, helper: GoogleMapHelper) -> GoogleMapHelper:
+        search_places = helper.search_places
+
+        def recorded_search_places(query: str, *args, **kwargs) -> list[PlaceDetail]:
+            places = search_places(query, *args, **kwargs)
+            self.fixtures.record(
+                CrawlProvider.GOOGLE, "search_places", "", query,
+                [asdict(place) for place in places],
+            )
+            return places
+
+        helper.search_places = recorded_search_places
+        return helper
+
+    def wrap_outscraper(self, helper: OutscraperHelper) -> OutscraperHelper:
+        get_map_review = helper.get_map_review
+
+        def recorded_get_map_review(shop_name: str) -> tuple[bool, dict]:
+            is_ok, result = get_map_review(shop_name)
+            self.fixtures.record(CrawlProvider.OUTSCRAPER, "get_map_review", "", shop_name, [is_ok, result])
+            return is_ok, result
+
+        helper.get_map_review = recorded_get_map_review
+        return helper
+
+    def wrap_felo(self, scraper: FeloScraper) -> FeloScraper:
+        search = scraper.search
+
+        def recorded_search(prompt: str, *args, **kwargs) -> str:
+            content = search(prompt, *args, **kwargs)
+            self.fixtures.record(CrawlProvider.FELO, "search", "", prompt, content)
+            return content
+
+        scraper.search = recorded_search
+        return scraper
+
+    def wrap_chatgpt(self, helper: ChatGPTHelper) -> ChatGPTHelper:
+        chat = helper.chat
+        chat_stream = helper.chat_stream
+
+        def record(user_input: str, system_setting: str, text: str) -> None:
+            self.fixtures.record(CrawlProvider.OPENAI, "chat", _digest(system_setting), _digest(user_input), text)
+
+        def recorded_chat(user_input: str, system_setting: str, *args, **kwargs) -> str:
+            text = chat(user_input, system_setting, *args, **kwargs)
+            record(user_input, system_setting, text)
+            return text
+
+        def recorded_chat_stream(user_input: str, system_setting: str, *args, **kwargs) -> Iterator[str]:
+            chunks = []
+            for chunk in chat_stream(user_input, system_setting, *args, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            record(user_input, system_setting, "".join(chunks))
+
+        helper.chat = recorded_chat
+        helper.chat_stream = recorded_chat_stream
+        return helper
@@ -1,21 +1,46 @@
 import time
 import logging
 import re
-from dataclasses import dataclass
-from typing import Optional, List, Dict, Tuple
+from dataclasses import dataclass, asdict
+from datetime import timedelta
+from typing import Any, Callable, Optional, List, Dict, Tuple, Iterator
 from enum import Enum
 
-from cms.models import Shop, ShopTag, ShopPhoto
-from cms.constants import CITY_PATTERN, DISTRICT_PATTERN
+from django.conf import settings
+from django.utils import timezone
+
+from cms.models import Shop, ShopPhoto
+from cms.address_parser import parse_address
+from cms.tag_registry import ShopTagRegistry
+from core.models import CrawlStage, CrawlArtifact
+from core.metrics import crawl_metrics
 from chatgpt.services import ChatGPTHelper
+from chatgpt.compaction import PromptCompactor
 from chatgpt.constants import SUMMARY_PROMPT, TAG_PROMPT, PRICE_MIN_AND_MAX_PROMPT
 from felo.scraper import FeloScraper
 from googlemap.services import GoogleMapHelper
 from googlemap.models import PlaceDetail
 from outscrapers.services import OutscraperHelper
+from core.writers import ShopBatchWriter, ShopRecord
 
 logger = logging.getLogger(__name__)
 
+# 單一店家依序執行的階段
+SHOP_STAGES = [
+    CrawlStage.PRICE_AND_SERVICE,
+    CrawlStage.REVIEW,
+    CrawlStage.PRICE_RANGE,
+    CrawlStage.SUMMARY,
+    CrawlStage.TAG,
+    CrawlStage.SAVE,
+]
+
+
+def get_shop_key(shop_data: PlaceDetail) -> str:
+    """店家在爬蟲流程中的唯一鍵，優先使用 Google Place ID"""
+    return shop_data.place_id or shop_data.name
+
+
 class SummarySection(Enum):
     CORE_FEATURES = 'B. 核心特色'
     REVIEW_SUMMARY = 'C. 評價摘要'
@@ -61,95 +86,139 @@ class AISummaryParser:
         Returns:
             ShopSummary object containing parsed sections
         """
-        sections = {
+        parser = StreamingSummaryParser()
+        parser.feed(ai_response)
+        parser.close()
+        
+        return parser.summary
+
+
+class StreamingSummaryParser:
+    """逐段解析串流中的 AI 摘要
+    
+    每當遇到下一個 <h1> 標題 (或串流結束) 時，前一個區段即視為完整，
+    feed/close 會回傳 (區段名稱, 清理後內容) 讓呼叫端可以先行寫入或記錄。
+    """
+    SECTION_HEADERS = (
+        ('<h1>核心特色</h1>', 'core_features'),
+        ('<h1>評價摘要</h1>', 'review_summary'),
+        ('<h1>推薦用途</h1>', 'recommended_uses'),
+        ('<h1>店名與基本資訊</h1>', None),
+    )
+
+    def __init__(self):
+        self.buffer = ""
+        self.current_section = None
+        self.sections: Dict[str, List[str]] = {
             'core_features': [],
             'review_summary': [],
             'recommended_uses': []
         }
-        
-        current_section = None
-        
-        for line in ai_response.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Determine current section based on HTML h1 tags
-            if '<h1>核心特色</h1>' in line:
-                current_section = 'core_features'
-            elif '<h1>評價摘要</h1>' in line:
-                current_section = 'review_summary'
-            elif '<h1>推薦用途</h1>' in line:
-                current_section = 'recommended_uses'
-            elif '<h1>店名與基本資訊</h1>' in line:
-                current_section = None
-            elif current_section and line:
-                # 只收集非空行且不是 h1 標籤的內容
-                if not line.startswith('<h1>'):
-                    sections[current_section].append(line)
-        
-        # 清理每個區段的內容
+        self.completed: Dict[str, str] = {}
+
+    @property
+    def summary(self) -> ShopSummary:
         return ShopSummary(
-            core_features=AISummaryParser._clean_html_content('\n'.join(sections['core_features']).strip()),
-            review_summary=AISummaryParser._clean_html_content('\n'.join(sections['review_summary']).strip()),
-            recommended_uses=AISummaryParser._clean_html_content('\n'.join(sections['recommended_uses']).strip())
+            core_features=self._section_content('core_features'),
+            review_summary=self._section_content('review_summary'),
+            recommended_uses=self._section_content('recommended_uses'),
         )
 
-class CoreService:
-    def __init__(self, catch_limit: int = 1):
-        self.catch_limit = catch_limit
-        self.search_keyword = "美甲"
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """餵入一段文字，回傳這段文字讓哪些區段變為完整"""
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split('\n')
         
-        self.google_map_helper = GoogleMapHelper()
-        self.outscraper_helper = OutscraperHelper()
-        self.felo_scraper = FeloScraper()
-        self.chatgpt_helper = ChatGPTHelper()
-        self.summary_parser = AISummaryParser()
+        completed = []
+        for line in lines:
+            completed.extend(self._parse_line(line))
+        return completed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """串流結束，處理剩餘內容並回傳最後一個區段"""
+        line, self.buffer = self.buffer, ""
+        completed = self._parse_line(line)
+        completed.extend(self._complete_current_section())
+        return completed
+
+    def _section_content(self, section: str) -> str:
+        return AISummaryParser._clean_html_content('\n'.join(self.sections[section]).strip())
+
+    def _complete_current_section(self) -> List[Tuple[str, str]]:
+        section = self.current_section
+        if not section or section in self.completed:
+            return []
         
-    def _parse_address(self, address: str) -> Tuple[str, str]:
-        """解析地址，將其分為縣市和行政區。
+        self.completed[section] = self._section_content(section)
+        return [(section, self.completed[section])]
+
+    def _parse_line(self, line: str) -> List[Tuple[str, str]]:
+        line = line.strip()
+        if not line:
+            return []
         
-        Args:
-            address: 完整地址字串，例如：
-                    "106231台灣台北市大安區信義路四段265巷24號"
-                    "106台灣台北市大安區敦化南路二段11巷7號1樓"
-            
-        Returns:
-            Tuple[str, str]: (縣市, 行政區)，若無法解析則返回空字串
-        """
-        # 移除郵遞區號（3-6位數字）和「台灣」
-        clean_address = re.sub(r'^\d{3,6}|台灣', '', address)
+        # Determine current section based on HTML h1 tags
+        for header, section in self.SECTION_HEADERS:
+            if header in line:
+                completed = self._complete_current_section()
+                self.current_section = section
+                return completed
         
-        # 尋找縣市
-        city_match = re.search(CITY_PATTERN, clean_address)
-        city = city_match.group(1) if city_match else ""
+        # 只收集非空行且不是 h1 標籤的內容
+        if self.current_section and not line.startswith('<h1>'):
+            self.sections[self.current_section].append(line)
         
-        # 移除縣市名稱，只留下地址後半部
-        if city:
-            clean_address = clean_address.replace(city, '')
+        return []
+
+
+class CoreService:
+    def __init__(
+        self,
+        catch_limit: int = 1,
+        search_keyword: str = "美甲",
+        google_map_helper: Optional[GoogleMapHelper] = None,
+        outscraper_helper: Optional[OutscraperHelper] = None,
+        felo_scraper: Optional[FeloScraper] = None,
+        chatgpt_helper: Optional[ChatGPTHelper] = None,
+    ):
+        """外部服務的 helper 可以替換 (例如 core.replay 的重播版本)，未指定時建立實際的 helper"""
+        self.catch_limit = catch_limit
+        self.search_keyword = search_keyword
         
-        # 尋找行政區
-        district_match = re.search(DISTRICT_PATTERN, clean_address)
-        district = district_match.group(1) if district_match else ""
+        self.google_map_helper = google_map_helper or GoogleMapHelper()
+        self.outscraper_helper = outscraper_helper or OutscraperHelper()
+        self.felo_scraper = felo_scraper or FeloScraper()
+        self.chatgpt_helper = chatgpt_helper or ChatGPTHelper()
+        self.summary_parser = AISummaryParser()
+        self.prompt_compactor = PromptCompactor()
+        self.shop_writer = ShopBatchWriter()
         
-        return city, district
+    def _parse_address(self, address: str) -> Tuple[str, str]:
+        """解析地址，將其分為縣市和行政區，名稱統一為正式寫法 (臺北市、臺中市...)"""
+        return parse_address(address)
 
-    def _get_all_shop_data(self, search_query: str) -> List[PlaceDetail]:
+    def _get_all_shop_data(
+        self,
+        search_query: str,
+        skip_place: Optional[Callable[[dict], bool]] = None,
+    ) -> List[PlaceDetail]:
         """Fetch shop data from Google Maps API."""
-        return self.google_map_helper.search_places(
-            query=search_query,
-            catch_limit=self.catch_limit
-        )
+        with crawl_metrics.stage(CrawlStage.SEARCH):
+            return self.google_map_helper.search_places(
+                query=search_query,
+                catch_limit=self.catch_limit,
+                skip_place=skip_place,
+            )
 
-    def _get_shop_review(self, shop_name: str) -> str:
+    def _get_shop_reviews(self, shop_name: str) -> List[str]:
         """Fetch and process shop reviews."""
         try:
             _, data = self.outscraper_helper.get_map_review(shop_name)
             reviews: List[Dict] = data.get("留言", [])
-            return "\n".join(review.get("評論", "") for review in reviews if review.get("評論"))
+            return [review.get("評論") for review in reviews if review.get("評論")]
         except Exception as e:
             logger.error(f"Error fetching reviews for {shop_name}: {str(e)}")
-            return ""
+            return []
 
     def _get_shop_price_and_service(self, shop_name: str) -> str:
         """Fetch shop price and service information."""
@@ -187,66 +256,6 @@ class CoreService:
             總評論數: {shop_data.user_ratings_total}
         """
 
-    def _process_shop_tags(self, ai_tag_response: str) -> List[ShopTag]:
-        """Process and create shop tags from AI response."""
-        tags = self.chatgpt_helper.convert_tag_response(ai_tag_response)
-        shop_tags = []
-        
-        for tag_data in tags:
-            try:
-                tag, _ = ShopTag.objects.get_or_create(
-                    name=tag_data['name'],
-                    type=tag_data['type'],
-                    defaults={
-                        'emoji': tag_data['emoji'],
-                        'description': tag_data['description']
-                    }
-                )
-                shop_tags.append(tag)
-            except Exception as e:
-                logger.error(f"Error creating tag {tag_data['name']}: {str(e)}")
-                
-        return shop_tags
-
-    def _create_shop(
-        self,
-        shop_data: PlaceDetail,
-        shop_review: str,
-        price_min: int,
-        price_max: int,
-        price_and_service: str,
-        summary: ShopSummary,
-        tags: List[ShopTag]
-    ) -> Shop:
-        """Create shop database entry with all collected information."""
-        # 解析地址
-        city, district = self._parse_address(shop_data.address)
-
-        shop, is_created = Shop.objects.update_or_create(
-            name=shop_data.name,
-            defaults={
-                'address': shop_data.address,
-                'city': city,
-                'district': district,
-                'phone': shop_data.phone,
-                'website': shop_data.website,
-                'rating': shop_data.rating,
-                'rating_count': shop_data.user_ratings_total,
-                'reviews': shop_review,
-                'price_and_service': price_and_service,
-                'core_features': summary.core_features,
-                'review_summary': summary.review_summary,
-                'recommended_uses': summary.recommended_uses,
-                'price_min': price_min,
-                'price_max': price_max,
-            }
-        )
-        
-        logger.info(f"[Core] 店家 {shop_data.name} {'新增' if is_created else '更新'} 成功")
-
-        shop.tags.set(tags)
-        return shop
-    
     def _gen_price_min_and_max(
         self,
         price_and_service: str
@@ -271,73 +280,176 @@ class CoreService:
         
         return int(price_min.group(1)), int(price_max.group(1))
 
-    def _process_single_shop(
-        self,
-        shop_data: PlaceDetail,
-        index: int,
-        total: int
-    ) -> Optional[Shop]:
-        """Process a single shop's data collection and storage."""
-        try:
-            # Collect shop information
-            shop_basic_info = self._gen_shop_basic_info(shop_data)
-            price_and_service = self._get_shop_price_and_service(shop_data.name)
-            shop_review = self._get_shop_review(shop_data.name)
-            
-            # 產出最低價格和最高價格
-            price_min, price_max = self._gen_price_min_and_max(price_and_service)
-            
-            # Generate AI summaries
-            shop_info = f"""
-                店家基本資訊:{shop_basic_info},
-                店家評論:{shop_review},
-                店家價格與服務:{price_and_service},
-            """
-            
-            ai_summary = self.chatgpt_helper.chat(
-                user_input=shop_info,
-                system_setting=SUMMARY_PROMPT,
-            )
+    def _gen_summary(self, shop_name: str, shop_info: str) -> ShopSummary:
+        """以串流方式產生 AI 摘要，每個區段完成時即記錄"""
+        parser = StreamingSummaryParser()
+        
+        for chunk in self.chatgpt_helper.chat_stream(
+            user_input=shop_info,
+            system_setting=SUMMARY_PROMPT,
+        ):
+            for section, _ in parser.feed(chunk):
+                logger.info(f"[Core] 店家 {shop_name} 摘要區段 {section} 完成")
+        
+        for section, _ in parser.close():
+            logger.info(f"[Core] 店家 {shop_name} 摘要區段 {section} 完成")
+        
+        return parser.summary
 
-            summary = self.summary_parser.parse_summary(ai_summary)
+    def _gen_shop_info(self, shop_data: PlaceDetail, outputs: Dict) -> str:
+        """組成送給 LLM 的店家資訊 (壓縮後)"""
+        compaction = self.prompt_compactor.compact_shop_info(
+            basic_info=self._gen_shop_basic_info(shop_data),
+            reviews=outputs[CrawlStage.REVIEW],
+            price_and_service=outputs[CrawlStage.PRICE_AND_SERVICE],
+        )
+        logger.info(f"[Core] 店家 {shop_data.name} prompt 壓縮: {compaction}")
+        
+        return compaction.text
+
+    def run_shop_stage(self, stage: CrawlStage, shop_data: PlaceDetail, outputs: Dict):
+        """執行單一店家的單一階段，回傳可 JSON 序列化的結果
+        
+        Args:
+            stage: 要執行的階段
+            shop_data: Google Map 店家資料
+            outputs: 先前階段的結果，key 為 CrawlStage
             
+        Returns:
+            該階段的結果，SAVE 階段回傳這次批次寫入的 Shop ID (批次未滿時為空)
+        """
+        if stage == CrawlStage.PRICE_AND_SERVICE:
+            return self._get_shop_price_and_service(shop_data.name)
+        
+        if stage == CrawlStage.REVIEW:
+            return self._get_shop_reviews(shop_data.name)
+        
+        if stage == CrawlStage.PRICE_RANGE:
+            # 產出最低價格和最高價格
+            return list(self._gen_price_min_and_max(outputs[CrawlStage.PRICE_AND_SERVICE]))
+        
+        if stage == CrawlStage.SUMMARY:
+            shop_info = self._gen_shop_info(shop_data, outputs)
+            return asdict(self._gen_summary(shop_data.name, shop_info))
+        
+        if stage == CrawlStage.TAG:
+            shop_info = self._gen_shop_info(shop_data, outputs)
             ai_tag = self.chatgpt_helper.chat(
                 user_input=shop_info,
                 system_setting=TAG_PROMPT,
             )
-            shop_tags = self._process_shop_tags(ai_tag)
-            
-            # Create shop entry
-            shop = self._create_shop(
-                shop_data=shop_data,
-                shop_review=shop_review,
-                price_min=price_min,
-                price_max=price_max,
-                price_and_service=price_and_service,
-                summary=summary,
-                tags=shop_tags
+            # 只保留能對應到既有標籤的結果
+            shop_tags = ShopTagRegistry.get().match_tags(
+                self.chatgpt_helper.convert_tag_response(ai_tag)
             )
+            return [{'type': tag.type, 'name': tag.name} for tag in shop_tags]
+        
+        if stage == CrawlStage.SAVE:
+            # 加入批次寫入，批次滿了才會真正寫入資料庫
+            city, district = self._parse_address(shop_data.address)
+            price_min, price_max = outputs[CrawlStage.PRICE_RANGE]
+            summary = ShopSummary(**outputs[CrawlStage.SUMMARY])
             
-            # 照片ForeignKey
-            bulk_create_list = [
-                ShopPhoto(
-                    shop=shop,
-                    image_path=photo_url
+            return self.shop_writer.add(
+                ShopRecord(
+                    shop_data=shop_data,
+                    city=city,
+                    district=district,
+                    shop_review="\n".join(outputs[CrawlStage.REVIEW]),
+                    price_min=price_min,
+                    price_max=price_max,
+                    price_and_service=outputs[CrawlStage.PRICE_AND_SERVICE],
+                    core_features=summary.core_features,
+                    review_summary=summary.review_summary,
+                    recommended_uses=summary.recommended_uses,
+                    tags=outputs[CrawlStage.TAG],
                 )
-                for photo_url in shop_data.photos
-            ]
-            ShopPhoto.objects.bulk_create(bulk_create_list)
+            )
+        
+        raise ValueError(f"Unknown shop stage: {stage}")
+
+    def load_checkpoints(self, shop_data: PlaceDetail) -> Dict[CrawlStage, Any]:
+        """讀取店家尚未過期的各階段結果"""
+        expired_at = timezone.now() - timedelta(days=settings.CRAWL_ARTIFACT_TTL_DAYS)
+        artifacts = CrawlArtifact.objects.filter(
+            shop_key=get_shop_key(shop_data),
+            stage__in=SHOP_STAGES,
+            updated_at__gte=expired_at,
+        )
+        
+        return {
+            CrawlStage(artifact.stage): artifact.data
+            for artifact in artifacts
+        }
+
+    def save_checkpoint(self, shop_data: PlaceDetail, stage: CrawlStage, data: Any) -> None:
+        CrawlArtifact.objects.update_or_create(
+            shop_key=get_shop_key(shop_data),
+            stage=stage,
+            defaults={
+                'shop_name': shop_data.name,
+                'data': data,
+            }
+        )
+
+    def run_checkpointed_stage(
+        self,
+        stage: CrawlStage,
+        shop_data: PlaceDetail,
+        outputs: Dict[CrawlStage, Any]
+    ):
+        """已有 checkpoint 的階段直接沿用，否則執行並寫入 checkpoint
+        
+        SAVE 階段每次都會執行，確保資料庫內容與 checkpoint 一致。
+        """
+        if stage in outputs and stage != CrawlStage.SAVE:
+            logger.info(f"[Core] 店家 {shop_data.name} 階段 {stage.label} 沿用 checkpoint")
+            crawl_metrics.checkpoint_hit(stage)
+            return outputs[stage]
+        
+        with crawl_metrics.stage(stage, get_shop_key(shop_data), shop_data.name):
+            output = self.run_shop_stage(stage, shop_data, outputs)
+        
+        if stage != CrawlStage.SAVE:
+            self.save_checkpoint(shop_data, stage, output)
+        
+        return output
+
+    def _process_single_shop(
+        self,
+        shop_data: PlaceDetail,
+        index: int,
+        total: int
+    ) -> bool:
+        """Process a single shop's data collection and queue it for storage."""
+        try:
+            self.save_checkpoint(shop_data, CrawlStage.PLACE_DETAIL, asdict(shop_data))
+            
+            # 從第一個缺少 checkpoint 的階段開始執行
+            outputs = self.load_checkpoints(shop_data)
+            for stage in SHOP_STAGES:
+                outputs[stage] = self.run_checkpointed_stage(stage, shop_data, outputs)
             
-            logger.info(f"\033[92m 店家資訊: {shop.name} 抓取成功! 進度: {index}/{total} \033[0m")
-            return shop
+            logger.info(f"\033[92m 店家資訊: {shop_data.name} 抓取成功! 進度: {index}/{total} \033[0m")
+            crawl_metrics.shop_done(get_shop_key(shop_data), True, shop_data.name)
+            return True
             
         except Exception as e:
             logger.error(f"Error processing shop {shop_data.name}: {str(e)}", exc_info=True)
-            return None
+            crawl_metrics.shop_done(get_shop_key(shop_data), False, shop_data.name)
+            return False
+
+    def is_shop_crawled(self, shop_name: str) -> bool:
+        """店家與照片都已存在時不需要重新抓取"""
+        shop_exist = Shop.objects.filter(name=shop_name).exists()
+        shop_photo_exist = ShopPhoto.objects.filter(shop__name=shop_name).exists()
+        
+        return shop_exist and shop_photo_exist
 
     def main(self, search_region: str) -> None:
         """Main execution flow for shop data collection."""
         start_time = time.time()
+        crawl_metrics.reset()
         logger.info(f"[Core] 開始抓取 {search_region} 的店家資訊")
         
         try:
@@ -354,17 +466,82 @@ class CoreService:
             
             # Process shops
             for index, shop_data in enumerate(all_shop_data[:self.catch_limit], start=1):
-                shop_exist = Shop.objects.filter(name=shop_data.name).exists()
-                shop_photo_exist = ShopPhoto.objects.filter(shop__name=shop_data.name).exists()
-                
-                if shop_exist and shop_photo_exist:
+                if self.is_shop_crawled(shop_data.name):
                     logger.info(f"\033[91m [Core] 店家 {shop_data.name} 已存在，跳過 \033[0m")
                     continue
                 
                 self._process_single_shop(shop_data, index, total_progress)
+            
+            # 寫入剩餘未滿一個批次的店家
+            self.shop_writer.flush()
                 
             execution_time = time.time() - start_time
             logger.info(f"[Core] 抓取 {search_query} 的店家資訊完成, 共花費 {execution_time:.2f} 秒")
         except Exception as e:
             logger.error(f"[Core] 處理過程發生錯誤: {str(e)}", exc_info=True)
             raise
+        finally:
+            self.write_metrics(crawl_metrics.report_name("crawl"))
+
+    def write_metrics(self, name: str) -> str:
+        """輸出本次執行的 JSON 報告 (與有設定時的 Prometheus textfile)，回傳報告路徑"""
+        report_path = crawl_metrics.write_report(name)
+        crawl_metrics.write_prometheus(name)
+
+        report = crawl_metrics.report()
+        logger.info(
+            f"[Core] 執行報告: {report_path} "
+            f"店家 {report['shops']['succeeded']} 成功 / {report['shops']['failed']} 失敗, "
+            f"LLM 費用 ${report['llm_cost_usd']:.4f}"
+        )
+        return report_path
+
+
+
+class ShopSummaryRegenerator:
+    """依照資料庫中既有的店家資料重新產生 AI 摘要 (後台使用)
+    
+    不需要重新爬取 Felo / Outscraper，因此不會初始化 CoreService 的爬蟲工具。
+    """
+    def __init__(self):
+        self.chatgpt_helper = ChatGPTHelper()
+        self.prompt_compactor = PromptCompactor()
+
+    def _gen_shop_basic_info(self, shop: Shop) -> str:
+        return f"""
+            店家名稱: {shop.name}
+            地址: {shop.address}
+            評分: {shop.rating}
+            網站: {shop.website}
+            店家電話: {shop.phone}
+            總評論數: {shop.review_count}
+        """
+
+    def stream(self, shop: Shop) -> Iterator[Tuple[str, str]]:
+        """重新產生摘要，逐段回傳 (區段名稱, 內容)，全部完成後寫回店家
+
+        Yields:
+            Tuple[str, str]: 完成的區段名稱與內容
+        """
+        compaction = self.prompt_compactor.compact_shop_info(
+            basic_info=self._gen_shop_basic_info(shop),
+            reviews=(shop.reviews or "").splitlines(),
+            price_and_service=shop.price_and_service or "",
+        )
+        parser = StreamingSummaryParser()
+        
+        for chunk in self.chatgpt_helper.chat_stream(
+            user_input=compaction.text,
+            system_setting=SUMMARY_PROMPT,
+        ):
+            yield from parser.feed(chunk)
+        
+        yield from parser.close()
+        
+        summary = parser.summary
+        shop.core_features = summary.core_features
+        shop.review_summary = summary.review_summary
+        shop.recommended_uses = summary.recommended_uses
+        shop.save(update_fields=['core_features', 'review_summary', 'recommended_uses', 'updated_at'])
+        
+        logger.info(f"[Core] 店家 {shop.name} 摘要重新產生完成")
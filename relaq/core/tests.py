@@ -1,3 +1,124 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import CrawlStage, CrawlTask, CrawlTaskStatus
+from core.queue import CrawlQueue
+from googlemap.models import PlaceDetail
+
+
+def make_place(name: str = "範例美甲", place_id: str = "place-1") -> PlaceDetail:
+    return PlaceDetail(
+        name=name,
+        address="臺北市大安區復興南路一段1號",
+        rating=4.5,
+        website="",
+        phone="0212345678",
+        user_ratings_total=10,
+        opening_hours={},
+        place_id=place_id,
+    )
+
+
+@override_settings(CRAWL_TASK_MAX_ATTEMPTS=2, CRAWL_TASK_BACKOFF_SECONDS=30, CRAWL_TASK_LEASE_SECONDS=300)
+class CrawlQueueTests(TestCase):
+    """SAVE 階段不使用外部服務，不受 ProviderBudget 的同時執行數與額度影響"""
+
+    def setUp(self):
+        self.task = CrawlQueue.enqueue_shop_stage(CrawlStage.SAVE, make_place(), "臺北市", "美甲")
+        self.worker_a = CrawlQueue("worker-a")
+        self.worker_b = CrawlQueue("worker-b")
+
+    def expire_lease(self):
+        CrawlTask.objects.filter(id=self.task.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_running_task_is_not_claimed_before_lease_expires(self):
+        self.assertEqual(self.worker_a.claim().id, self.task.id)
+        self.assertIsNone(self.worker_b.claim())
+
+    def test_claim_after_lease_expires(self):
+        self.worker_a.claim()
+        self.expire_lease()
+
+        task = self.worker_b.claim()
+        self.assertEqual(task.id, self.task.id)
+        self.assertEqual(task.lease_owner, "worker-b")
+        self.assertEqual(task.attempts, 2)
+
+        # 原本的 worker 已失去租約，完成時不會改動任務
+        self.worker_a.complete(task)
+        self.assertEqual(CrawlTask.objects.get(id=task.id).status, CrawlTaskStatus.RUNNING)
+        self.assertFalse(self.worker_a.heartbeat(task))
+
+    def test_expired_lease_at_max_attempts_is_marked_failed(self):
+        self.worker_a.claim()
+        self.expire_lease()
+        self.worker_b.claim()
+        self.expire_lease()
+
+        with self.assertLogs("core.queue", level="ERROR"):
+            self.assertIsNone(self.worker_a.claim())
+        self.assertEqual(CrawlTask.objects.get(id=self.task.id).status, CrawlTaskStatus.FAILED)
+
+    def test_fail_retries_with_backoff(self):
+        task = self.worker_a.claim()
+        before = timezone.now()
+        with self.assertLogs("core.queue", level="WARNING"):
+            self.worker_a.fail(task, "timeout")
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, CrawlTaskStatus.PENDING)
+        self.assertEqual(task.last_error, "timeout")
+        self.assertIsNone(task.lease_expires_at)
+        # 第一次失敗等待 CRAWL_TASK_BACKOFF_SECONDS (含 ±20% 抖動)
+        self.assertGreaterEqual(task.available_at, before + timedelta(seconds=24))
+        self.assertLessEqual(task.available_at, timezone.now() + timedelta(seconds=36))
+        self.assertIsNone(self.worker_b.claim())
+
+    def test_fail_at_max_attempts_marks_failed(self):
+        self.worker_a.claim()
+        self.expire_lease()
+        task = self.worker_b.claim()
+        with self.assertLogs("core.queue", level="ERROR"):
+            self.worker_b.fail(task, "timeout")
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, CrawlTaskStatus.FAILED)
+        self.assertEqual(task.last_error, "timeout")
+        self.assertIsNone(self.worker_a.claim())
+
+    def test_fail_by_other_worker_is_ignored(self):
+        task = self.worker_a.claim()
+        self.worker_b.fail(task, "timeout")
+        self.assertEqual(CrawlTask.objects.get(id=task.id).status, CrawlTaskStatus.RUNNING)
+
+    def test_enqueue_shop_stage_requeues_finished_tasks(self):
+        for status in (CrawlTaskStatus.DONE, CrawlTaskStatus.FAILED):
+            with self.subTest(status=status):
+                CrawlTask.objects.filter(id=self.task.id).update(
+                    status=status,
+                    attempts=2,
+                    last_error="timeout",
+                )
+                place = make_place(name="範例美甲 (新名稱)")
+
+                task = CrawlQueue.enqueue_shop_stage(CrawlStage.SAVE, place, "新北市", "美睫")
+
+                self.assertEqual(task.id, self.task.id)
+                self.assertEqual(task.status, CrawlTaskStatus.PENDING)
+                self.assertEqual(task.attempts, 0)
+                self.assertEqual(task.last_error, "")
+                self.assertEqual((task.region, task.keyword, task.shop_name), ("新北市", "美睫", place.name))
+                self.assertEqual(task.payload["place"]["name"], place.name)
+                self.assertEqual(CrawlTask.objects.count(), 1)
+
+    def test_enqueue_shop_stage_keeps_active_tasks(self):
+        self.worker_a.claim()
+        with self.assertLogs("core.queue", level="INFO"):
+            self.assertIsNone(CrawlQueue.enqueue_shop_stage(CrawlStage.SAVE, make_place(), "臺北市", "美甲"))
+
+        task = CrawlTask.objects.get(id=self.task.id)
+        self.assertEqual(task.status, CrawlTaskStatus.RUNNING)
+        self.assertEqual(task.lease_owner, "worker-a")
+        self.assertTrue(CrawlQueue.is_place_enqueued("place-1"))
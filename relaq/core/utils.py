@@ -2,6 +2,7 @@ import os
 import platform
 
 from django.conf import settings
+from django.http import JsonResponse
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -75,4 +76,19 @@ class APIUtils:
             "data": data
         }
 
-        return Response(response_data, status=status or HTTP_200_OK)
\ No newline at end of file
+        return Response(response_data, status=status or HTTP_200_OK)
+
+    @staticmethod
+    def gen_json_response(code_enum: ResponseCode, data=None, msg=None, status=None) -> JsonResponse:
+        """與 gen_response 相同格式，給不經過 DRF 的 async views 使用"""
+        response_data = {
+            "code": code_enum.code,
+            "msg": msg or code_enum.message,
+            "data": data
+        }
+
+        return JsonResponse(
+            response_data,
+            status=status or HTTP_200_OK,
+            json_dumps_params={"ensure_ascii": False},
+        )
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+
+from core.metrics import api_metrics
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Prometheus 指標，需帶 Authorization: Bearer <METRICS_TOKEN>，未設定 token 時只在 DEBUG 可讀取"""
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        return HttpResponseForbidden()
+
+    return HttpResponse(api_metrics.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
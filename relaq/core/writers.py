@@ -0,0 +1,175 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import transaction
+
+from cms.models import Shop, ShopPhoto
+from cms.bitmap_index import ShopBitmapIndex
+from cms.cards import ShopCardService
+from cms.facets import ShopFacetService
+from cms.geo import get_geohash
+from cms.localities import get_locality_codes
+from cms.tag_registry import ShopTagRegistry
+from googlemap.models import PlaceDetail
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ShopRecord:
+    """一間店家爬取完成、等待寫入資料庫的資料"""
+    shop_data: PlaceDetail
+    city: str
+    district: str
+    shop_review: str
+    price_min: int
+    price_max: int
+    price_and_service: str
+    core_features: str
+    review_summary: str
+    recommended_uses: str
+    tags: List[Dict] = field(default_factory=list)
+
+
+class ShopBatchWriter:
+    """批次寫入店家資料
+
+    收集完成的店家，達到批次大小或呼叫 flush 時在單一 transaction 中：
+    1. 以 bulk_create(update_conflicts=True) 依店名 upsert 店家
+    2. 以 ShopTagRegistry 找出標籤 ID (不存在的標籤不會新增)
+    3. 直接批次寫入店家與標籤的關聯表、店家照片
+    提交後只重算這批店家原本與新的標籤 / 縣市 / 行政區的分面數量，縮短寫入鎖的時間。
+    """
+    UPDATE_FIELDS = [
+        'address',
+        'city',
+        'district',
+        'city_code',
+        'district_code',
+        'latitude',
+        'longitude',
+        'geohash',
+        'phone',
+        'website',
+        'rating',
+        'review_count',
+        'reviews',
+        'price_and_service',
+        'core_features',
+        'review_summary',
+        'recommended_uses',
+        'price_min',
+        'price_max',
+        'updated_at',
+    ]
+
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or settings.SHOP_WRITE_BATCH_SIZE
+        self.pending: Dict[str, ShopRecord] = {}
+
+    def add(self, record: ShopRecord) -> List[int]:
+        """加入一間店家，批次已滿時寫入並回傳寫入的店家 ID"""
+        # 同一批次中的同名店家以最後一筆為準
+        self.pending[record.shop_data.name] = record
+
+        if len(self.pending) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def _build_shop(self, record: ShopRecord) -> Shop:
+        shop_data = record.shop_data
+        city_code, district_code = get_locality_codes(record.city, record.district)
+        return Shop(
+            name=shop_data.name,
+            address=shop_data.address,
+            city=record.city,
+            district=record.district,
+            city_code=city_code,
+            district_code=district_code,
+            latitude=shop_data.lat,
+            longitude=shop_data.lng,
+            geohash=get_geohash(shop_data.lat, shop_data.lng),
+            phone=shop_data.phone,
+            website=shop_data.website,
+            rating=shop_data.rating,
+            review_count=shop_data.user_ratings_total,
+            reviews=record.shop_review,
+            price_and_service=record.price_and_service,
+            core_features=record.core_features,
+            review_summary=record.review_summary,
+            recommended_uses=record.recommended_uses,
+            price_min=record.price_min,
+            price_max=record.price_max,
+        )
+
+    def flush(self) -> List[int]:
+        """寫入所有待寫入的店家，回傳店家 ID"""
+        if not self.pending:
+            return []
+
+        records = list(self.pending.values())
+
+        tag_registry = ShopTagRegistry.get()
+        names = [record.shop_data.name for record in records]
+        shops = [self._build_shop(record) for record in records]
+        new_tags = {
+            record.shop_data.name: tag_registry.match_tags(record.tags)
+            for record in records
+        }
+
+        with transaction.atomic():
+            # 受影響的分面：店家原本與這次寫入的標籤 / 縣市 / 行政區
+            old_localities = list(
+                Shop.objects.filter(name__in=names).values_list('city', 'district')
+            )
+            Shop.objects.bulk_create(
+                shops,
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=self.UPDATE_FIELDS,
+            )
+            shop_ids = dict(
+                Shop.objects.filter(name__in=names).values_list('name', 'id')
+            )
+
+            # 標籤與照片以這次的結果為準，重試時不會重複寫入
+            ShopTagRelation = Shop.tags.through
+            old_tag_ids = set(
+                ShopTagRelation.objects.filter(shop_id__in=shop_ids.values()).values_list('shoptag_id', flat=True)
+            )
+            ShopTagRelation.objects.filter(shop_id__in=shop_ids.values()).delete()
+            ShopPhoto.objects.filter(shop_id__in=shop_ids.values()).delete()
+
+            ShopTagRelation.objects.bulk_create(
+                [
+                    ShopTagRelation(shop_id=shop_ids[name], shoptag_id=tag.id)
+                    for name, tags in new_tags.items()
+                    for tag in tags
+                ],
+                ignore_conflicts=True,
+            )
+            ShopPhoto.objects.bulk_create([
+                ShopPhoto(shop_id=shop_ids[record.shop_data.name], image_path=photo_url)
+                for record in records
+                for photo_url in record.shop_data.photos
+            ])
+
+            # bulk_create 不會觸發 signals，提交後重建列表卡片
+            ShopCardService.refresh_on_commit(shop_ids.values())
+
+        # 交易提交後才清空，寫入失敗時保留批次，下次 flush 會重新寫入
+        self.pending = {}
+
+        # 提交後只重算受影響的分面數量，不在寫入交易中對整個資料表 GROUP BY
+        ShopFacetService.refresh_tags(old_tag_ids | {tag.id for tags in new_tags.values() for tag in tags})
+        ShopFacetService.refresh_localities(
+            cities={city for city, _ in old_localities} | {shop.city for shop in shops},
+            districts={district for _, district in old_localities} | {shop.district for shop in shops},
+        )
+        ShopBitmapIndex.invalidate()
+
+        logger.info(f"[Writer] 批次寫入 {len(records)} 間店家完成")
+        return list(shop_ids.values())
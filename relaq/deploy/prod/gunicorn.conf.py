@@ -0,0 +1,66 @@
+"""正式環境 gunicorn 設定
+
+    gunicorn -c deploy/prod/gunicorn.conf.py relaq.wsgi
+
+所有設定都可用環境變數覆寫：
+- GUNICORN_WORKER_CLASS: gthread (預設) / sync / uvicorn.workers.UvicornWorker (搭配 relaq.asgi)
+- GUNICORN_WORKERS: 預設 CPU 數 * 2 + 1
+- GUNICORN_THREADS: gthread 每個 worker 的執行緒數，預設 4 (大於 1 時 gunicorn 會將 sync 改用 gthread，
+  改用 sync 需同時設為 1)
+- GUNICORN_KEEPALIVE: 與 nginx 之間保持連線的秒數，只有 gthread 與 uvicorn 會保持連線，
+  sync worker 每個請求後都會關閉連線，使用 sync 時 nginx upstream 的 keepalive 沒有作用
+- API_METRICS_DIR: 各 worker 的 API 指標合併目錄 (預設在 worker_tmp_dir 下)，啟動時清空
+
+平滑重啟：送 HUP 給 master 會依序啟動新 worker 再關閉舊 worker；
+更新程式碼時 (preload 模式下 HUP 不會重新載入程式) 改送 USR2 再送 QUIT 給舊 master。
+"""
+import multiprocessing
+import os
+import shutil
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# worker 數量依 CPU 數量決定；API 多為 SQLite 查詢與記憶體索引，CPU bound 為主
+# gthread 才能與 nginx 保持連線，執行緒數不需太多，閒置的 keep-alive 連線不佔用執行緒
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# 先在 master 載入 Django，fork 後 worker 以 copy-on-write 共用程式碼與唯讀資料，啟動也較快
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+# 前面有 nginx 時保持連線可以省去每個請求重新建立 TCP 連線 (sync worker 不支援)
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# 定期重啟 worker 避免記憶體持續成長，加上 jitter 避免所有 worker 同時重啟
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+# 使用記憶體檔案系統存放 worker heartbeat，避免磁碟 I/O 卡住時誤判 worker 逾時
+worker_tmp_dir = os.getenv("GUNICORN_WORKER_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+# 各 worker 的 API 指標寫入同一個目錄，/metrics 合併後輸出 (Django 設定 API_METRICS_DIR)
+os.environ.setdefault(
+    "API_METRICS_DIR",
+    os.path.join(worker_tmp_dir or "/tmp", "relaq_api_metrics"),
+)
+
+# 請求 log 由 RequestLoggingMiddleware 負責
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # preload 時 master 載入過程若開過資料庫連線，不能讓多個 worker 共用同一個連線
+    from django.db import connections
+
+    connections.close_all()
+
+
+def on_starting(server):
+    # 上次執行留下的 worker 指標不計入，counter 從 0 開始
+    shutil.rmtree(os.environ["API_METRICS_DIR"], ignore_errors=True)
@@ -7,6 +7,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from core.metrics import crawl_metrics
 from core.utils import SeleniumHelper
 
 
@@ -119,6 +120,7 @@ class FeloScraper:
             except Exception as e:
                 logger.error(f"[Felo] 抓取失敗 (嘗試 {attempt + 1}/{max_retries}): {str(e)}")
                 if attempt < max_retries - 1:
+                    crawl_metrics.retry("FELO")
                     logger.info(f"[Felo] 等待 {retry_delay} 秒後重試...")
                     time.sleep(retry_delay)
                     # 重新初始化 driver
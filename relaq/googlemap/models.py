@@ -1,4 +1,5 @@
 from dataclasses import dataclass, field
+from typing import Optional
 
 
 @dataclass
@@ -11,6 +12,9 @@ class PlaceDetail:
     user_ratings_total: int
     opening_hours: dict
     photos: list[str] = field(default_factory=list)
+    place_id: str = ""
+    lat: Optional[float] = None
+    lng: Optional[float] = None
 
 @dataclass
 class Place:
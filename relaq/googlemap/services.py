@@ -5,12 +5,16 @@ import os
 import requests
 from urllib.parse import urljoin
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
 
 import googlemaps
+from googlemaps.exceptions import ApiError
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 
+from core.metrics import crawl_metrics
 from googlemap.models import PlaceDetail
 
 
@@ -23,6 +27,19 @@ class GoogleMapHelper:
     MAX_PHOTO_HEIGHT = 800  # 照片最大高度
     MAX_PHOTO_WIDTH = 800   # 照片最大寬度
     PHOTOS_STORAGE_PATH = 'place_photos/'  # 照片儲存路徑
+    PAGE_TOKEN_RETRIES = 10  # next_page_token 生效前的重試次數
+    PAGE_TOKEN_RETRY_INTERVAL = 0.5  # next_page_token 重試間隔 (秒)
+    # Place Details 預設欄位遮罩，座標直接使用文字搜尋結果中的 geometry
+    DETAIL_FIELDS = [
+        "name",
+        "formatted_address",
+        "rating",
+        "website",
+        "formatted_phone_number",
+        "user_ratings_total",
+        "opening_hours",
+        "photo",
+    ]
 
     def __init__(self):
         super().__init__()
@@ -35,9 +52,11 @@ class GoogleMapHelper:
             temp_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={self.MAX_PHOTO_WIDTH}&maxheight={self.MAX_PHOTO_HEIGHT}&photo_reference={photo_ref}&key={settings.GOOGLE_MAP_API_KEY}"
             
             # 下載照片
-            response = requests.get(temp_url)
+            with crawl_metrics.request("GOOGLE_PHOTO"):
+                response = requests.get(temp_url)
             if response.status_code != 200:
                 return None
+            crawl_metrics.downloaded("GOOGLE_PHOTO", len(response.content))
 
             # 生成唯一的檔案名
             file_extension = 'jpg'  # Google Places Photos 通常是 JPEG 格式
@@ -53,106 +72,158 @@ class GoogleMapHelper:
             logger.error(f"下載照片失敗: {str(e)}")
             return None
 
+    def _fetch_page(self, query: str, page_token: Optional[str] = None) -> dict:
+        """取得一頁文字搜尋結果
+
+        next_page_token 發出後需要一小段時間才會生效，生效前 API 會回傳 INVALID_REQUEST，
+        這裡以短間隔重試取代固定等待。
+        """
+        request_params = {
+            "query": query,
+            "language": self.LANGUAGE,
+            "region": self.REGION
+        }
+        if not page_token:
+            with crawl_metrics.request("GOOGLE"):
+                return self.client.places(**request_params)
+
+        request_params["page_token"] = page_token
+        for attempt in range(1, self.PAGE_TOKEN_RETRIES + 1):
+            try:
+                with crawl_metrics.request("GOOGLE"):
+                    return self.client.places(**request_params)
+            except ApiError as e:
+                if e.status != "INVALID_REQUEST" or attempt == self.PAGE_TOKEN_RETRIES:
+                    raise
+                crawl_metrics.retry("GOOGLE")
+                logger.info(f"Google Map API next_page_token 尚未生效，{self.PAGE_TOKEN_RETRY_INTERVAL} 秒後重試 ({attempt})")
+                time.sleep(self.PAGE_TOKEN_RETRY_INTERVAL)
+
+    def _fetch_place_detail(self, place: dict, fields: list[str]) -> Optional[PlaceDetail]:
+        """取得單一地點的詳細資訊並下載照片，失敗時回傳 None"""
+        place_id = place["place_id"]
+
+        try:
+            with crawl_metrics.request("GOOGLE"):
+                place_details = self.client.place(
+                    place_id=place_id,
+                    language=self.LANGUAGE,
+                    fields=fields
+                )
+
+            search_result: dict = place_details["result"]
+            location = (
+                search_result.get("geometry") or place.get("geometry") or {}
+            ).get("location", {})
+            phone = search_result.get("formatted_phone_number", "")
+            if phone:
+                phone = phone.replace(" ", "")
+
+            # 處理照片 - 下載並保存到我們的伺服器
+            photos = []
+            photo_references = search_result.get("photos", [])
+            place_name = self.convert_shop_name(search_result.get("name") or place["name"])
+
+            for photo in photo_references:
+                try:
+                    photo_ref = photo.get("photo_reference")
+                    if photo_ref:
+                        permanent_url = self.download_and_save_photo(photo_ref, place_name)
+                        if permanent_url:
+                            photos.append(permanent_url)
+                except Exception as e:
+                    logger.error(f"獲取照片失敗: {str(e)}")
+                    continue
+
+            # 欄位遮罩沒有要求的欄位以文字搜尋結果補上
+            return PlaceDetail(
+                name=place_name,
+                address=search_result.get("formatted_address") or place.get("formatted_address", ""),
+                rating=search_result.get("rating", place.get("rating", 0)),
+                website=search_result.get("website", ""),
+                user_ratings_total=search_result.get("user_ratings_total", place.get("user_ratings_total", 0)),
+                phone=phone,
+                opening_hours=search_result.get("opening_hours", ""),
+                photos=photos,
+                place_id=place_id,
+                lat=location.get("lat"),
+                lng=location.get("lng"),
+            )
+        except Exception as e:
+            logger.error(f"處理地點 {place_id} 時發生錯誤: {str(e)}")
+            return None
+
     def search_places(
         self,
         query: str,
         catch_limit: int = 20,  # 預設值改為 20，與外部 CATCH_LIMIT 保持一致
+        fields: Optional[list[str]] = None,
+        skip_place: Optional[Callable[[dict], bool]] = None,
     ) -> list[PlaceDetail]:
+        """搜尋地點並取得詳細資訊
+
+        每一頁的地點詳細資訊以執行緒池平行取得，同時在背景預先請求下一頁。
+
+        Args:
+            query: 搜尋字串
+            catch_limit: 最多回傳的地點數量
+            fields: Place Details 的欄位遮罩，只請求需要的欄位以降低費用，
+                    預設為 settings.GOOGLE_MAP_DETAIL_FIELDS
+            skip_place: 傳入文字搜尋結果，回傳 True 的地點不取詳細資訊也不計入數量
+        """
         logger.info(f"Google Map API 搜尋地點: {query} 開始，限制數量: {catch_limit}")
 
-        places = []
-        next_page_token = None
-        
-        while len(places) < catch_limit:
-            # 構建請求參數
-            request_params = {
-                "query": query,
-                "language": self.LANGUAGE,
-                "region": self.REGION
-            }
-            
-            # 如果有 next_page_token，添加到參數中
-            if next_page_token:
-                request_params["page_token"] = next_page_token
-            
-            # 發送請求
-            places_result = self.client.places(**request_params)
-            
-            # 處理搜尋結果
-            for place in places_result["results"]:
-                if len(places) >= catch_limit:
-                    break
-                    
-                place_id = place["place_id"]
-                
-                try:
-                    # 準備所需的欄位列表
-                    fields = [
-                        "name",
-                        "formatted_address",
-                        "rating",
-                        "website",
-                        "formatted_phone_number",
-                        "user_ratings_total",
-                        "opening_hours",
-                        "photo"
-                    ]
-                    
-                    # 一次性獲取所有需要的資訊
-                    place_details = self.client.place(
-                        place_id=place_id,
-                        language=self.LANGUAGE,
-                        fields=fields
-                    )
-                    
-                    search_result: dict = place_details["result"]
-                    phone = search_result.get("formatted_phone_number", "")
-                    if phone:
-                        phone = phone.replace(" ", "")
-                    
-                    # 處理照片 - 下載並保存到我們的伺服器
-                    photos = []
-                    photo_references = search_result.get("photos", [])
-                    place_name = self.convert_shop_name(search_result["name"])
-                    
-                    for photo in photo_references:
-                        try:
-                            photo_ref = photo.get("photo_reference")
-                            if photo_ref:
-                                permanent_url = self.download_and_save_photo(photo_ref, place_name)
-                                if permanent_url:
-                                    photos.append(permanent_url)
-                        except Exception as e:
-                            logger.error(f"獲取照片失敗: {str(e)}")
-                            continue
-                    
-                    places.append(
-                        PlaceDetail(
-                            name=place_name,
-                            address=search_result["formatted_address"],
-                            rating=search_result.get("rating", 0),
-                            website=search_result.get("website", ""),
-                            user_ratings_total=search_result.get("user_ratings_total", 0),
-                            phone=phone,
-                            opening_hours=search_result.get("opening_hours", ""),
-                            photos=photos
-                        )
-                    )
-                except Exception as e:
-                    logger.error(f"處理地點 {place_id} 時發生錯誤: {str(e)}")
-                    continue
-            
-            # 檢查是否有下一頁
-            next_page_token = places_result.get("next_page_token")
-            if not next_page_token:
-                break
-                
-            # 等待一下再請求下一頁（避免 rate limit）
-            time.sleep(2)
-        
+        fields = fields or settings.GOOGLE_MAP_DETAIL_FIELDS or self.DETAIL_FIELDS
+        places: list[PlaceDetail] = []
+
+        with ThreadPoolExecutor(max_workers=settings.GOOGLE_MAP_DETAIL_WORKERS) as detail_executor, \
+                ThreadPoolExecutor(max_workers=1) as page_executor:
+            page_future = page_executor.submit(self._fetch_page, query)
+            remaining = catch_limit
+
+            while page_future is not None:
+                places_result = page_future.result()
+                page_places = [
+                    place for place in places_result["results"]
+                    if skip_place is None or not skip_place(place)
+                ][:remaining]
+
+                # 本頁全部成功也不足數量時，先在背景請求下一頁，與本頁的詳細資訊重疊進行
+                next_page_token = places_result.get("next_page_token")
+                page_future = (
+                    page_executor.submit(self._fetch_page, query, next_page_token)
+                    if next_page_token and len(page_places) < remaining else None
+                )
+
+                detail_futures = [
+                    detail_executor.submit(self._fetch_place_detail, place, fields)
+                    for place in page_places
+                ]
+                page_details = [
+                    place_detail
+                    for place_detail in (future.result() for future in detail_futures)
+                    if place_detail is not None
+                ]
+                places.extend(page_details)
+                # 只計算成功取得詳細資訊的地點
+                remaining -= len(page_details)
+
+                # 有地點取得失敗而數量不足時，再請求下一頁補足
+                if page_future is None and next_page_token and remaining > 0:
+                    page_future = page_executor.submit(self._fetch_page, query, next_page_token)
+
         logger.info(f"Google Map API 搜尋地點: {query} 結束，共找到 {len(places)} 個地點")
         return places
 
+    def geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        """取得地址的經緯度，找不到時回傳 None"""
+        results = self.client.geocode(address, language=self.LANGUAGE, region=self.REGION)
+        if not results:
+            return None
+
+        location = results[0]["geometry"]["location"]
+        return location["lat"], location["lng"]
+
     def convert_shop_name(self, shop_name: str) -> str:
         safe_name = re.sub(r'[/\\:*?"<>|]', '', shop_name)
         safe_name = safe_name.replace(' ', '_')
@@ -3,6 +3,8 @@ import requests
 
 from django.conf import settings
 
+from core.metrics import crawl_metrics
+
 
 class OutscraperHelper:
     API_PATH = {
@@ -28,11 +30,12 @@ class OutscraperHelper:
             "async": "true"
         }
 
-        response = requests.get(
-            self.API_PATH["MAPS_REVIEWS"],
-            params=query_params,
-            headers={"X-API-KEY": settings.OUTSCRAPER_API_KEY}
-        )
+        with crawl_metrics.request("OUTSCRAPER"):
+            response = requests.get(
+                self.API_PATH["MAPS_REVIEWS"],
+                params=query_params,
+                headers={"X-API-KEY": settings.OUTSCRAPER_API_KEY}
+            )
 
         if response.ok:
             response_json: dict = response.json()
@@ -66,7 +69,9 @@ class OutscraperHelper:
         self,
         results_location: str
     ) -> tuple[bool, dict]:
-        response: requests.Response = requests.get(results_location)
+        with crawl_metrics.request("OUTSCRAPER"):
+            response: requests.Response = requests.get(results_location)
+        crawl_metrics.downloaded("OUTSCRAPER", len(response.content))
         if response.ok:
             resp_data: list[dict] = response.json().get("data")
 
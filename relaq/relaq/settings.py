@@ -16,7 +16,7 @@ load_dotenv(dotenv_path=dotenv_path)
 SECRET_KEY = 'django-insecure-#%+v(9*022+x()--5bfy#l-twba-fn#dhto#ls_t2%0kue(pgc'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = ["*"]
 
@@ -59,7 +59,10 @@ CORS_ALLOW_CREDENTIALS = True
 
 MIDDLEWARE = [
     # Project middleware
+    'core.middleware.metrics.MetricsMiddleware',
     'core.middleware.request_logging.RequestLoggingMiddleware',
+    'core.middleware.sql_profiling.SqlProfilingMiddleware',
+    'core.middleware.db_routing.ReplicaRoutingMiddleware',
 
     # CORS middleware
     'corsheaders.middleware.CorsMiddleware',
@@ -98,12 +101,93 @@ WSGI_APPLICATION = 'relaq.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# 資料庫：預設 SQLite (開發)，DATABASE_ENGINE=postgres 時改用 PostgreSQL
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgres':
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv('POSTGRES_DB', 'relaq'),
+            "USER": os.getenv('POSTGRES_USER', 'relaq'),
+            "PASSWORD": os.getenv('POSTGRES_PASSWORD', ''),
+            "HOST": os.getenv('POSTGRES_HOST', 'localhost'),
+            "PORT": os.getenv('POSTGRES_PORT', '5432'),
+            # 連線保留秒數 (持續連線)，使用連線池時必須為 0
+            "CONN_MAX_AGE": int(os.getenv('POSTGRES_CONN_MAX_AGE', 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
     }
-}
+    # psycopg 連線池 (每個 worker process 一個池)，適合 ASGI / 多執行緒 worker
+    if os.getenv('POSTGRES_POOL', 'False') == 'True':
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv('POSTGRES_POOL_MIN_SIZE', 2)),
+            "max_size": int(os.getenv('POSTGRES_POOL_MAX_SIZE', 10)),
+            "timeout": int(os.getenv('POSTGRES_POOL_TIMEOUT', 10)),
+        }
+
+    # 唯讀副本 (streaming replication)，以逗號分隔 host[:port]，帳號密碼與 primary 相同；
+    # 連線逾時讓無法連線的副本很快被標記為不可用，不會卡住請求
+    REPLICA_CONNECT_TIMEOUT_SECONDS = int(os.getenv('REPLICA_CONNECT_TIMEOUT_SECONDS', 3))
+    for index, replica in enumerate(filter(None, os.getenv('POSTGRES_REPLICAS', '').split(','))):
+        replica_host, _, replica_port = replica.strip().partition(':')
+        DATABASES[f"replica_{index}"] = {
+            **DATABASES["default"],
+            "HOST": replica_host,
+            "PORT": replica_port or DATABASES["default"]["PORT"],
+            "OPTIONS": {**DATABASES["default"]["OPTIONS"], "connect_timeout": REPLICA_CONNECT_TIMEOUT_SECONDS},
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    # SQLite 效能設定，每個連線建立時執行：
+    # WAL 讓讀取不會被寫入阻擋，synchronous=NORMAL 在 WAL 下只有斷電時可能遺失最後的交易，
+    # 寫入交易以 BEGIN IMMEDIATE 開始，鎖競爭時由 busy_timeout 等待而不是直接回傳 database is locked
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    # 讀取改走另一個唯讀連線 (core.db_routers.ReadWriteRouter)
+    SQLITE_READ_CONNECTION = os.getenv('SQLITE_READ_CONNECTION', 'False') == 'True'
+
+    SQLITE_PRAGMAS = (
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};"
+        "PRAGMA synchronous=NORMAL;"
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};"
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};"
+        "PRAGMA temp_store=MEMORY;"
+    )
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                # journal_mode 會寫入資料庫檔案，只需要在可寫入的連線設定
+                "init_command": "PRAGMA journal_mode=WAL;" + SQLITE_PRAGMAS,
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    }
+    if SQLITE_READ_CONNECTION:
+        DATABASES["read"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+            "OPTIONS": {
+                "init_command": SQLITE_PRAGMAS + "PRAGMA query_only=ON;",
+            },
+            "TEST": {"MIRROR": "default"},
+        }
+        DATABASE_ROUTERS = ["core.db_routers.ReadWriteRouter"]
+
+# 唯讀副本路由 (core.db_routers.ReplicaRouter)：只有 DATABASE_REPLICA_APPS 中的 API 讀取走副本，
+# 爬蟲與後台一律使用 primary；請求中有寫入時，同一個瀏覽器在 REPLICA_STICKY_SECONDS 秒內改讀 primary
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith("replica_")]
+DATABASE_REPLICA_APPS = ['cms']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 15))
+REPLICA_HEALTH_CHECK_SECONDS = int(os.getenv('REPLICA_HEALTH_CHECK_SECONDS', 10))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 30))
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
 
 
 # Password validation
@@ -160,6 +244,82 @@ PERPLEXITY_API_KEY = os.getenv('PERPLEXITY_API_KEY')
 # Catch Limit
 CATCH_LIMIT = int(os.getenv('CATCH_LIMIT'))
 
+# Google Map 設定
+# 平行取得地點詳細資訊 (含照片下載) 的執行緒數量
+GOOGLE_MAP_DETAIL_WORKERS = int(os.getenv('GOOGLE_MAP_DETAIL_WORKERS', 8))
+# Place Details 欄位遮罩 (以逗號分隔)，未設定時使用 GoogleMapHelper.DETAIL_FIELDS
+GOOGLE_MAP_DETAIL_FIELDS = [
+    field.strip()
+    for field in os.getenv('GOOGLE_MAP_DETAIL_FIELDS', '').split(',')
+    if field.strip()
+]
+
+# LLM prompt 壓縮設定
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 4000))
+REVIEW_SIMILARITY_THRESHOLD = float(os.getenv('REVIEW_SIMILARITY_THRESHOLD', 0.8))
+
+# 爬蟲任務佇列設定
+CRAWL_TASK_LEASE_SECONDS = int(os.getenv('CRAWL_TASK_LEASE_SECONDS', 300))
+CRAWL_TASK_MAX_ATTEMPTS = int(os.getenv('CRAWL_TASK_MAX_ATTEMPTS', 5))
+CRAWL_TASK_BACKOFF_SECONDS = int(os.getenv('CRAWL_TASK_BACKOFF_SECONDS', 30))
+CRAWL_TASK_BACKOFF_MAX_SECONDS = int(os.getenv('CRAWL_TASK_BACKOFF_MAX_SECONDS', 3600))
+CRAWL_WORKER_POLL_SECONDS = int(os.getenv('CRAWL_WORKER_POLL_SECONDS', 5))
+CRAWL_ARTIFACT_TTL_DAYS = int(os.getenv('CRAWL_ARTIFACT_TTL_DAYS', 7))
+
+# 各外部服務同時執行的任務上限與每日呼叫次數額度 (跨所有 worker 計算)
+CRAWL_PROVIDER_CONCURRENCY = {
+    'GOOGLE': int(os.getenv('GOOGLE_MAP_CONCURRENCY', 2)),
+    'OUTSCRAPER': int(os.getenv('OUTSCRAPER_CONCURRENCY', 2)),
+    'FELO': int(os.getenv('FELO_CONCURRENCY', 1)),
+    'OPENAI': int(os.getenv('OPENAI_CONCURRENCY', 4)),
+}
+CRAWL_PROVIDER_DAILY_QUOTA = {
+    'GOOGLE': int(os.getenv('GOOGLE_MAP_DAILY_QUOTA', 5000)),
+    'OUTSCRAPER': int(os.getenv('OUTSCRAPER_DAILY_QUOTA', 1000)),
+    'FELO': int(os.getenv('FELO_DAILY_QUOTA', 500)),
+    'OPENAI': int(os.getenv('OPENAI_DAILY_QUOTA', 3000)),
+}
+
+# 爬蟲執行報告 (JSON) 輸出目錄，以及 Prometheus textfile collector 目錄 (未設定時不輸出 .prom)
+CRAWL_METRICS_REPORT_DIR = os.getenv('CRAWL_METRICS_REPORT_DIR', os.path.join(BASE_DIR, 'logs', 'crawl_reports'))
+CRAWL_METRICS_PROMETHEUS_DIR = os.getenv('CRAWL_METRICS_PROMETHEUS_DIR', '')
+
+# API 指標 (/metrics)，設定 METRICS_TOKEN 時需帶 Authorization: Bearer <token>，未設定時只在 DEBUG 可讀取
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# 多個 worker process 時各 worker 定期將指標寫入此目錄，/metrics 合併後輸出 (未設定時只回報處理請求的 worker)
+API_METRICS_DIR = os.getenv('API_METRICS_DIR', '')
+API_METRICS_WRITE_INTERVAL_SECONDS = float(os.getenv('API_METRICS_WRITE_INTERVAL_SECONDS', 1))
+
+# CMS 唯讀 API 改用 async views (ASGI 部署時啟用)，首頁 / 文章 / 店家詳情的快取秒數 (0 為不快取)
+CMS_ASYNC_VIEWS = os.getenv('CMS_ASYNC_VIEWS', 'False') == 'True'
+CMS_CACHE_SECONDS = int(os.getenv('CMS_CACHE_SECONDS', 60))
+
+# SQL 分析 (X-Profile-SQL header 或抽樣啟用，抽樣的請求只寫入 log)，未設定 token 時 header 只在 DEBUG 有效
+SQL_PROFILE_TOKEN = os.getenv('SQL_PROFILE_TOKEN', '')
+SQL_PROFILE_SAMPLE_RATE = float(os.getenv('SQL_PROFILE_SAMPLE_RATE', 0))
+SQL_PROFILE_SLOW_MS = float(os.getenv('SQL_PROFILE_SLOW_MS', 100))
+SQL_PROFILE_MAX_QUERIES = int(os.getenv('SQL_PROFILE_MAX_QUERIES', 1000))
+SQL_PROFILE_MAX_EXPLAINS = int(os.getenv('SQL_PROFILE_MAX_EXPLAINS', 3))
+
+# LLM 每百萬 token 價格 (美元)：(prompt, completion)
+LLM_TOKEN_PRICES = {
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4': (30.0, 60.0),
+    'gpt-3.5-turbo': (0.5, 1.5),
+}
+
+# 店家批次寫入數量
+SHOP_WRITE_BATCH_SIZE = int(os.getenv('SHOP_WRITE_BATCH_SIZE', 20))
+
+# 記憶體標籤表重新載入間隔 (秒)，同一個 process 內的異動會立即生效
+TAG_REGISTRY_TTL_SECONDS = int(os.getenv('TAG_REGISTRY_TTL_SECONDS', 300))
+
+# 記憶體店家位元索引重新載入間隔 (秒)，同一個 process 內的異動會立即生效
+SHOP_BITMAP_INDEX_TTL_SECONDS = int(os.getenv('SHOP_BITMAP_INDEX_TTL_SECONDS', 60))
+
 # admin settings
 ADMIN_SITE_HEADER = "Relaq CMS"
 ADMIN_SITE_TITLE = "Relaq CMS"
@@ -283,6 +443,20 @@ LOGGING = {
     }
 }
 
+# 以 QueueHandler / QueueListener 在背景執行緒寫 log，佇列長度 0 為不限 (超過時丟棄)
+LOG_QUEUE_ENABLED = os.getenv('LOG_QUEUE_ENABLED', 'True') == 'True'
+LOG_QUEUE_MAX_SIZE = int(os.getenv('LOG_QUEUE_MAX_SIZE', 10000))
+
+# 請求 log 設定
+# 抽樣比例 (0 ~ 1)，錯誤與慢請求一律記錄
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv('REQUEST_LOG_SAMPLE_RATE', 1.0))
+REQUEST_LOG_SLOW_SECONDS = float(os.getenv('REQUEST_LOG_SLOW_SECONDS', 1.0))
+# 只記錄這些 Content-Type 的 body，最多記錄 REQUEST_LOG_BODY_MAX_BYTES，
+# 超過 REQUEST_LOG_BODY_READ_MAX_BYTES 的 body 不讀取只記錄長度
+REQUEST_LOG_BODY_CONTENT_TYPES = ('application/json', 'application/x-www-form-urlencoded', 'text/')
+REQUEST_LOG_BODY_MAX_BYTES = int(os.getenv('REQUEST_LOG_BODY_MAX_BYTES', 1024))
+REQUEST_LOG_BODY_READ_MAX_BYTES = int(os.getenv('REQUEST_LOG_BODY_READ_MAX_BYTES', 64 * 1024))
+
 # Google Map Photo Size
 MAX_PHOTO_WIDTH = int(os.getenv('MAX_PHOTO_WIDTH'))
 MAX_PHOTO_HEIGHT = int(os.getenv('MAX_PHOTO_HEIGHT'))
@@ -23,6 +23,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from core.constants import ResponseCode
+from core.views import metrics_view
 
 
 schema_view = get_schema_view(
@@ -40,12 +41,13 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     
     # 應用 URL
     path('', include('cms.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
 
-# 在開發環境中提供媒體文件
+# 在開發環境中提供媒體文件，正式環境由 nginx 以 sendfile 直接提供 (deploy/prod/nginx.conf)
 if settings.DEBUG:    
     urlpatterns.extend(static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
     urlpatterns.extend(static(settings.STATIC_URL, document_root=settings.STATIC_ROOT))